@@ -3,13 +3,16 @@ Script de benchmark - Mede performance das operações críticas de matching e b
 Testa: tempo de execução de count_files e load_files_paged
 """
 
-from database.database import FileIndexer
-from database.search import SearchEngine
 import time
 import sys
 import os
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.database.database import FileIndexer  # noqa: E402
+from src.database.search import SearchEngine  # noqa: E402
 
 
 def benchmark_matching():
@@ -28,10 +31,10 @@ def benchmark_matching():
 
     try:
         print('📊 Benchmark: count_files')
-        start = time.time()
+        start = time.perf_counter()
         count = indexer.count_files(
             source, search_term, filter_type, folder_id, advanced_filters)
-        elapsed = time.time() - start
+        elapsed = time.perf_counter() - start
         print(f'✅ Count: {count}, Tempo: {elapsed:.4f}s')
 
     except Exception as e:
@@ -40,10 +43,10 @@ def benchmark_matching():
 
     try:
         print('📊 Benchmark: load_files_paged')
-        start = time.time()
+        start = time.perf_counter()
         files = search_engine.load_files_paged(
             source, 0, 100, search_term, 'name_asc', filter_type, folder_id, advanced_filters)
-        elapsed = time.time() - start
+        elapsed = time.perf_counter() - start
         print(f'✅ Arquivos: {len(files)}, Tempo: {elapsed:.4f}s')
         return True
 
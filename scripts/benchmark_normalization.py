@@ -0,0 +1,127 @@
+"""
+Script de benchmark - Mede a vazão da normalização de nomes
+Compara as implementações antigas (loop por caractere com unicodedata) com
+src/utils/normalization.py em nomes ASCII e acentuados, e confere que as
+duas geram exatamente as mesmas chaves.
+
+Uso:
+    python scripts/benchmark_normalization.py --names 200000
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+import unicodedata
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.utils import normalization  # noqa: E402
+
+
+def legacy_normalize_text(text):
+    if not text:
+        return ""
+    allowed_symbols = {'<', '>', '&', '#', '@'}
+    return ''.join(
+        c for c in unicodedata.normalize('NFD', text.lower().strip())
+        if unicodedata.category(c) != 'Mn' or c in allowed_symbols
+    )
+
+
+def legacy_normalize_aggressive(name):
+    if not name:
+        return ''
+    name_wo_ext, ext = os.path.splitext(name)
+    name_norm = unicodedata.normalize('NFD', name_wo_ext)
+    name_no_accents = ''.join(
+        c for c in name_norm if unicodedata.category(c) != 'Mn')
+    table = str.maketrans('', '', string.punctuation + string.whitespace)
+    return name_no_accents.translate(table).lower()
+
+
+WORDS_ACCENTED = ['Celebração', 'Coração', 'São José', 'Páscoa', 'Formação',
+                  'Comunhão', 'Procissão', 'Vigília', 'Bênção', 'Ñandú']
+WORDS_ASCII = ['IMG', 'DSC', 'Missa', 'Retiro', 'Natal', 'Coral', 'Festa',
+               'Encontro', 'Palestra', 'Jubileu']
+
+
+def build_names(total, accented_ratio, seed=42):
+    rng = random.Random(seed)
+    names = []
+    for i in range(total):
+        words = WORDS_ACCENTED if rng.random() < accented_ratio else WORDS_ASCII
+        names.append(
+            f"{rng.choice(words)}_{rng.choice(words)} - {i:06d} (#{rng.randint(1, 9)}).{rng.choice(['JPG', 'cr2', 'mp4'])}")
+    return names
+
+
+def time_call(func, names):
+    start = time.perf_counter()
+    for name in names:
+        func(name)
+    return time.perf_counter() - start
+
+
+def check_equivalence():
+    samples = [chr(cp) for cp in range(0x20, 0x3000)
+               if unicodedata.category(chr(cp)) not in ('Cs', 'Cn')]
+    samples += ['á̧b', 'ཱིུ', '  Ação  .TXT', '',
+                'ﬁle.name', 'İstanbul.jpg', '각']
+    mismatches = 0
+    for text in samples + [''.join(samples[i:i + 7]) for i in range(0, len(samples), 7)]:
+        if normalization.normalize_text(text) != legacy_normalize_text(text):
+            mismatches += 1
+        if normalization.normalize_aggressive(text) != legacy_normalize_aggressive(text):
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Microbenchmark da normalização de nomes')
+    parser.add_argument('--names', type=int, default=200000)
+    args = parser.parse_args()
+
+    mismatches = check_equivalence()
+    if mismatches:
+        print(f"❌ {mismatches} divergências entre a normalização antiga e a nova")
+        return False
+    print("✅ Normalização nova equivalente à antiga")
+
+    for label, ratio in (('ASCII', 0.0), ('misto 30% acentuado', 0.3), ('acentuado', 1.0)):
+        names = build_names(args.names, ratio)
+        print(f"\n📊 {args.names:,} nomes ({label})")
+        for kind, legacy, current in (
+            ('normalize_text', legacy_normalize_text, normalization.normalize_text),
+            ('normalize_aggressive', legacy_normalize_aggressive,
+             normalization.normalize_aggressive),
+        ):
+            current.cache_clear()
+            legacy_time = time_call(legacy, names)
+            cold_time = time_call(current, names)
+            warm_time = time_call(current, names)
+            print(
+                f"  {kind:<21} antigo {args.names / legacy_time:>12,.0f}/s | novo {args.names / cold_time:>12,.0f}/s "
+                f"({legacy_time / cold_time:4.1f}x) | memoizado {args.names / warm_time:>12,.0f}/s ({legacy_time / warm_time:4.1f}x)")
+
+        normalization.normalize_text.cache_clear()
+        start = time.perf_counter()
+        normalization.normalize_many(names, 'text')
+        batch_time = time.perf_counter() - start
+        print(
+            f"  {'normalize_many':<21} {args.names / batch_time:>12,.0f}/s")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        success = main()
+        sys.exit(0 if success else 1)
+    except Exception as e:
+        print(f"❌ Erro fatal no benchmark: {e}")
+        sys.exit(1)
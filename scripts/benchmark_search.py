@@ -0,0 +1,353 @@
+"""
+Script de benchmark - Suíte de benchmark da busca
+Gera um corpus sintético em português (acentos, símbolos #/@ e pastas por ano)
+em 10k/100k/1M arquivos e reproduz um conjunto de consultas (prefixo, frase, OR,
+exclusão, filtros e páginas profundas), reportando p50/p95/p99 de latência e
+linhas materializadas por consulta. O resultado pode ser salvo em JSON para
+comparação entre execuções.
+
+Uso:
+    python scripts/benchmark_search.py --scale 100k --output data/bench_100k.json
+    python scripts/benchmark_search.py --scale 100k --reuse --compare data/bench_100k.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.database.database import FileIndexer  # noqa: E402
+from src.database.search import SearchEngine  # noqa: E402
+from src.utils.normalization import normalize_aggressive  # noqa: E402
+
+SCALES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+WORDS = [
+    'missa', 'natal', 'páscoa', 'formação', 'coração', 'retiro', 'juventude',
+    'catequese', 'batismo', 'crisma', 'comunhão', 'procissão', 'adoração',
+    'música', 'coral', 'família', 'encontro', 'celebração', 'oração', 'São José',
+    'Nossa Senhora', 'peregrinação', 'missão', 'vocação', 'acólitos', 'liturgia',
+    'festa', 'quermesse', 'reunião', 'palestra', 'apresentação', 'ensaio',
+    'jubileu', 'aniversário', 'bênção', 'vigília', 'semana santa', 'campanha',
+]
+SYMBOLS = ['#natal', '#pascoa', '#retiro', '@joao', '@maria', '@pastoral']
+EXTENSIONS = ['.jpg', '.jpeg', '.png', '.heic', '.cr2', '.mp4', '.mov',
+              '.pdf', '.docx', '.pptx', '.mp3', '.wav']
+MIME_TYPES = {
+    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png',
+    '.heic': 'image/heic', '.cr2': 'image/x-canon-cr2', '.mp4': 'video/mp4',
+    '.mov': 'video/quicktime', '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+    '.mp3': 'audio/mpeg', '.wav': 'audio/wav',
+}
+YEARS = list(range(2012, 2026))
+EVENTS_PER_YEAR = 40
+
+QUERY_MIX = [
+    {'name': 'prefixo_curto', 'kind': 'prefix', 'term': 'for'},
+    {'name': 'prefixo_acentuado', 'kind': 'prefix', 'term': 'coraç'},
+    {'name': 'palavra_comum', 'kind': 'prefix', 'term': 'missa'},
+    {'name': 'frase', 'kind': 'phrase', 'term': '"semana santa"'},
+    {'name': 'or', 'kind': 'or', 'term': 'retiro or vigilia'},
+    {'name': 'exclusao', 'kind': 'exclusion', 'term': 'festa -natal'},
+    {'name': 'simbolo_hashtag', 'kind': 'symbol', 'term': '#natal'},
+    {'name': 'simbolo_arroba', 'kind': 'symbol', 'term': '@maria'},
+    {'name': 'filtro_favoritos', 'kind': 'filter', 'term': 'batismo is:starred'},
+    {'name': 'filtro_data', 'kind': 'filter',
+     'term': 'encontro createdafter:2020-01-01'},
+    {'name': 'filtro_categoria', 'kind': 'filter', 'term': 'coral',
+     'advanced_filters': {'category': 'images'}},
+    {'name': 'filtro_extensao', 'kind': 'filter', 'term': 'liturgia',
+     'advanced_filters': {'extension': '.pdf'}},
+    {'name': 'pagina_profunda', 'kind': 'deep_page', 'term': 'celebracao',
+     'page_fraction': 0.8},
+    {'name': 'pagina_final', 'kind': 'deep_page', 'term': 'missa',
+     'page_fraction': 1.0},
+    {'name': 'navegacao_pasta', 'kind': 'browse', 'term': None,
+     'folder': True},
+    {'name': 'facetas', 'kind': 'facets', 'term': 'missa'},
+]
+
+
+@contextlib.contextmanager
+def quiet():
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+class CountingCursor:
+    """Envolve o cursor do indexador contando as linhas materializadas."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.rows = 0
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self.rows += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self.rows += 1
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self.rows += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+def generate_corpus(db_path, total, seed=42):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    indexer = FileIndexer(db_path)
+    normalizer = SearchEngine(None)
+    rng = random.Random(seed)
+    print(f"🏗️ Gerando corpus sintético com {total:,} arquivos em {db_path}...")
+    start = time.perf_counter()
+
+    folders = []
+    folder_rows = []
+    for year in YEARS:
+        year_id = f"folder-{year}"
+        folder_rows.append((year_id, str(year), f"G:/Banco de Imagens/{year}", 'folder',
+                            'local', '', None, None, 0, 0, 0, None, None, 0,
+                            str(year), str(year)))
+        for event in range(EVENTS_PER_YEAR):
+            words = rng.sample(WORDS, 2)
+            name = f"{year} - {words[0].title()} {words[1]} {event + 1:02d}"
+            folder_id = f"folder-{year}-{event}"
+            folder_rows.append((folder_id, name, f"G:/Banco de Imagens/{year}/{name}",
+                                'folder', 'local', '', None, None, 0, 0, 0, year_id,
+                                None, 0, normalizer.normalize_text(name),
+                                normalize_aggressive(name)))
+            folders.append((folder_id, year, name))
+
+    insert_sql = '''
+        INSERT INTO files (file_id, name, path, mimeType, source, description, thumbnailLink, thumbnailPath, size, modifiedTime, createdTime, parentId, webContentLink, starred, name_normalized, name_aggressive)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+    indexer.cursor.executemany(insert_sql, folder_rows)
+
+    batch = []
+    for i in range(total):
+        folder_id, year, folder_name = folders[rng.randrange(len(folders))]
+        words = rng.sample(WORDS, rng.randint(1, 3))
+        ext = rng.choice(EXTENSIONS)
+        base = ' '.join(words)
+        if rng.random() < 0.15:
+            base += f" {rng.choice(SYMBOLS)}"
+        name = f"{base} {i:07d}{ext}"
+        description = ''
+        if rng.random() < 0.4:
+            description = f"{' '.join(rng.sample(WORDS, 3))} {rng.choice(SYMBOLS)}"
+        source = 'drive' if rng.random() < 0.3 else 'local'
+        created = int(time.mktime(datetime.datetime(
+            year, rng.randint(1, 12), rng.randint(1, 28)).timetuple()))
+        file_id = f"drive-{i}" if source == 'drive' else f"local-{i}"
+        batch.append((file_id, name, f"G:/Banco de Imagens/{year}/{folder_name}/{name}",
+                      MIME_TYPES[ext], source, description, None, None,
+                      rng.randint(10_000, 50_000_000), created + rng.randint(0, 86400 * 30),
+                      created, folder_id, None, 1 if rng.random() < 0.05 else 0,
+                      normalizer.normalize_text(name), normalize_aggressive(name)))
+        if len(batch) >= 10_000:
+            indexer.cursor.executemany(insert_sql, batch)
+            batch = []
+            print(f"  📊 {i + 1:,}/{total:,} arquivos gerados...")
+    if batch:
+        indexer.cursor.executemany(insert_sql, batch)
+    indexer.conn.commit()
+
+    with quiet():
+        indexer.rebuild_search_index_with_normalization()
+    indexer.cursor.execute("ANALYZE")
+    indexer.conn.commit()
+    print(
+        f"✅ Corpus gerado em {time.perf_counter() - start:.1f}s")
+    indexer.close()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def resolve_page(indexer, query):
+    if 'page_fraction' not in query:
+        return query.get('page', 0)
+    with quiet():
+        total = indexer.count_files(query.get('source'), query.get(
+            'term'), 'all', None, query.get('advanced_filters'))
+    last_page = max(0, (total - 1) // 50)
+    return int(last_page * query['page_fraction'])
+
+
+def run_query(indexer, search_engine, query, page):
+    term = query.get('term')
+    source = query.get('source')
+    advanced_filters = query.get('advanced_filters')
+    folder_id = 'folder-2019-0' if query.get('folder') else None
+
+    if query['kind'] == 'facets':
+        result = search_engine.search_with_facets(
+            term, page, 50, 'name_asc', advanced_filters)
+        return len(result['files'])
+
+    files = search_engine.load_files_paged(
+        source, page, 50, term, 'name_asc', 'all', folder_id, advanced_filters)
+    indexer.count_files(source, term, 'all', folder_id, advanced_filters)
+    return len(files)
+
+
+def benchmark_queries(db_path, iterations):
+    indexer = FileIndexer(db_path)
+    search_engine = SearchEngine(indexer)
+    counting_cursor = CountingCursor(indexer.cursor)
+    indexer.cursor = counting_cursor
+    results = []
+
+    try:
+        for query in QUERY_MIX:
+            latencies = []
+            rows_materialized = []
+            returned = 0
+            page = resolve_page(indexer, query)
+            for _ in range(iterations):
+                search_engine._paged_cache.clear()
+                indexer._count_cache.clear()
+                counting_cursor.rows = 0
+                start = time.perf_counter()
+                with quiet():
+                    returned = run_query(
+                        indexer, search_engine, query, page)
+                latencies.append((time.perf_counter() - start) * 1000)
+                rows_materialized.append(counting_cursor.rows)
+
+            latencies.sort()
+            entry = {
+                'name': query['name'],
+                'kind': query['kind'],
+                'term': query.get('term'),
+                'page': page,
+                'iterations': iterations,
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'rows_materialized': max(rows_materialized),
+                'rows_returned': returned,
+            }
+            results.append(entry)
+            print(
+                f"  🔎 {entry['name']:<20} p50={entry['p50_ms']:>9.2f}ms p95={entry['p95_ms']:>9.2f}ms "
+                f"p99={entry['p99_ms']:>9.2f}ms linhas={entry['rows_materialized']:>9,} retornadas={returned}")
+    finally:
+        indexer.cursor = counting_cursor._cursor
+        indexer.close()
+    return results
+
+
+def compare_results(previous_path, results):
+    try:
+        with open(previous_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except Exception as e:
+        print(f"⚠️ Não foi possível ler o resultado anterior {previous_path}: {e}")
+        return
+    previous_by_name = {q['name']: q for q in previous.get('queries', [])}
+    print(f"\n📈 Comparação com {previous_path} ({previous.get('timestamp')}):")
+    for entry in results:
+        old = previous_by_name.get(entry['name'])
+        if not old:
+            continue
+        delta = entry['p95_ms'] - old['p95_ms']
+        ratio = (entry['p95_ms'] / old['p95_ms']) if old['p95_ms'] else 0
+        marker = '🔺' if ratio > 1.1 else ('🔻' if ratio and ratio < 0.9 else '▪️')
+        print(
+            f"  {marker} {entry['name']:<20} p95 {old['p95_ms']:.2f}ms -> {entry['p95_ms']:.2f}ms ({delta:+.2f}ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark de latência da busca do VoxImago.MB')
+    parser.add_argument('--scale', choices=sorted(SCALES), default='10k')
+    parser.add_argument('--db', default=None,
+                        help='Banco do corpus (padrão: data/benchmark_search_<scale>.db)')
+    parser.add_argument('--reuse', action='store_true',
+                        help='Reutiliza o corpus existente em vez de gerá-lo de novo')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=None,
+                        help='Arquivo JSON para salvar o resultado')
+    parser.add_argument('--compare', default=None,
+                        help='JSON de uma execução anterior para comparar o p95')
+    args = parser.parse_args()
+
+    db_path = args.db or os.path.join(
+        'data', f"benchmark_search_{args.scale}.db")
+    total = SCALES[args.scale]
+    if not (args.reuse and os.path.exists(db_path)):
+        generate_corpus(db_path, total, args.seed)
+
+    print(
+        f"\n📊 Executando {len(QUERY_MIX)} consultas x {args.iterations} iterações ({args.scale})...")
+    results = benchmark_queries(db_path, args.iterations)
+
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'scale': args.scale,
+        'total_files': total,
+        'iterations': args.iterations,
+        'seed': args.seed,
+        'sqlite_version': sqlite3.sqlite_version,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'queries': results,
+    }
+    if args.compare:
+        compare_results(args.compare, results)
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultado salvo em {args.output}")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        success = main()
+        sys.exit(0 if success else 1)
+    except Exception as e:
+        print(f"❌ Erro fatal no benchmark: {e}")
+        sys.exit(1)
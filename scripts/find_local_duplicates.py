@@ -0,0 +1,60 @@
+"""
+Script para encontrar duplicatas no índice - Equivalente local do find_drive_duplicates.py
+Agrupa por tamanho no banco, confirma com hash amostrado e só calcula o MD5 completo
+nas colisões (usando o cache file_hashes). Os grupos são gravados à medida que saem.
+
+Uso:
+    python scripts/find_local_duplicates.py --source local --output local_duplicados.txt
+    python scripts/find_local_duplicates.py --source drive --output drive_duplicados_ids.txt
+"""
+
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.database.database import FileIndexer  # noqa: E402
+from src.services.duplicates import DuplicateFinder  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Busca de arquivos duplicados no índice local ou do Drive')
+    parser.add_argument('--db', default='data/file_index.db')
+    parser.add_argument('--source', choices=('local', 'drive'), default='local')
+    parser.add_argument('--min-size', type=int, default=1)
+    parser.add_argument('--disk-concurrency', type=int, default=2)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    indexer = FileIndexer(args.db)
+    finder = DuplicateFinder(indexer, args.disk_concurrency)
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    groups = finder.iter_local_duplicates(
+        args.min_size) if args.source == 'local' else finder.iter_drive_duplicates()
+    try:
+        for key, group in groups:
+            output.write(f"# {key} ({len(group)} arquivos)\n")
+            for file_id, path in group:
+                output.write(f"{file_id}\t{path}\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(
+        f"📊 {finder.stats['duplicate_groups']:,} grupos duplicados, {finder.stats['wasted_bytes'] / (1024 ** 3):.2f} GB redundantes",
+        file=sys.stderr)
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        success = main()
+        sys.exit(0 if success else 1)
+    except Exception as e:
+        print(f"❌ Erro fatal: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,70 @@
+"""
+Script para encontrar imagens quase duplicadas - Agrupa fotos locais por hash perceptual
+Calcula os hashes que faltam a partir das miniaturas de 256px e lista os grupos
+com distância de Hamming até --distance, ou as imagens semelhantes a --file-id.
+
+Uso:
+    python scripts/find_similar_images.py --db data/file_index.db --distance 3
+    python scripts/find_similar_images.py --file-id <id> --distance 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.database.database import FileIndexer  # noqa: E402
+from src.services.perceptual_hash import HASH_KINDS, PerceptualHashService  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Busca de imagens quase duplicadas por hash perceptual')
+    parser.add_argument('--db', default='data/file_index.db')
+    parser.add_argument('--distance', type=int, default=3)
+    parser.add_argument('--hash', choices=HASH_KINDS, default='phash')
+    parser.add_argument('--file-id')
+    parser.add_argument('--skip-update', action='store_true')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    indexer = FileIndexer(args.db)
+    service = PerceptualHashService(indexer)
+
+    if not args.skip_update:
+        start_time = time.perf_counter()
+        computed = service.update_hashes(service.local_image_items())
+        print(
+            f"🖼️ {computed:,} hashes perceptuais calculados em {time.perf_counter() - start_time:.1f}s")
+
+    if args.file_id:
+        similar = service.find_similar(
+            args.file_id, args.distance, args.hash)
+        print(f"🔍 {len(similar)} imagens semelhantes a {args.file_id}")
+        for file_id, distance in similar[:args.limit]:
+            print(f"  {distance:2d}  {file_id}")
+        return True
+
+    clusters = service.duplicate_clusters(args.distance, args.hash)
+    clusters.sort(key=len, reverse=True)
+    print(f"📊 {len(clusters):,} grupos de imagens quase duplicadas")
+    for i, group in enumerate(clusters[:args.limit]):
+        indexer.cursor.execute(
+            f"SELECT path FROM files WHERE file_id IN ({','.join('?' for _ in group)})", group)
+        print(f"\nGrupo {i + 1} ({len(group)} imagens):")
+        for (path,) in indexer.cursor.fetchall():
+            print(f"  {path}")
+    return True
+
+
+if __name__ == '__main__':
+    try:
+        success = main()
+        sys.exit(0 if success else 1)
+    except Exception as e:
+        print(f"❌ Erro fatal: {e}")
+        sys.exit(1)
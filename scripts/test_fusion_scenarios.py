@@ -6,7 +6,6 @@ Testa: diferentes cenários de fusão de metadados e resolução de conflitos
 import os
 import sys
 from database.database import FileIndexer
-from database.search import SearchEngine
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 src_path = os.path.abspath(os.path.join(
@@ -153,8 +152,8 @@ class FusionTestScenarios:
                              drive_item.get('webContentLink', ''), local_id)
                         )
                         self.indexer.cursor.execute(
-                            "UPDATE search_index SET description = ?, normalized_description = ? WHERE file_id = ?",
-                            (drive_item['description'], SearchEngine(None).normalize_text(
+                            "UPDATE search_index SET description = ? WHERE file_id = ?",
+                            (FileIndexer.search_index_text(
                                 drive_item['description']), local_id)
                         )
                     fusion_results['successful_fusions'] += 1
@@ -3,7 +3,6 @@ Script de teste de preservação - Valida que descrições locais são mantidas
 Testa: preservação de metadados locais quando há conflito com dados do Drive
 """
 
-from database.search import SearchEngine
 from database.database import FileIndexer
 import os
 import sys
@@ -43,9 +42,8 @@ indexer.cursor.execute(
     ("Drive description here", local_item['id'])
 )
 indexer.cursor.execute(
-    "UPDATE search_index SET description = ?, normalized_description = ? WHERE file_id = ?",
-    ("Drive description here", SearchEngine(None).normalize_text(
-        "Drive description here"), local_item['id'])
+    "UPDATE search_index SET description = ? WHERE file_id = ?",
+    (FileIndexer.search_index_text("Drive description here"), local_item['id'])
 )
 indexer.conn.commit()
 
@@ -62,9 +60,9 @@ indexer.cursor.execute(
     "SELECT description FROM files WHERE file_id = ?", (local_item['id'],))
 print('After rescan:', indexer.cursor.fetchone()[0])
 
-# Also verify search_index normalized_description preserved
+# Also verify search_index description preserved
 indexer.cursor.execute(
-    "SELECT description, normalized_description FROM search_index WHERE file_id = ?", (local_item['id'],))
+    "SELECT description FROM search_index WHERE file_id = ?", (local_item['id'],))
 print('Search index:', indexer.cursor.fetchone())
 
 indexer.close()
@@ -4,6 +4,7 @@ Pacote de banco de dados do VoxImago.MB
 Inclui módulos para:
 - Gerenciamento do banco SQLite (database.py)
 - Mecanismo de busca full-text e filtros (search.py)
+- Índice de nomes em memória para filtro instantâneo (name_index.py)
 
 Utilize este pacote para todas as operações de persistência, indexação e pesquisa de arquivos.
 """
\ No newline at end of file
@@ -10,6 +10,7 @@ Responsável por:
 import unicodedata
 import sqlite3
 from src.database.search import SearchEngine
+from src.utils.normalization import normalize_text, normalize_aggressive
 import os
 import time
 import shutil
@@ -17,6 +18,9 @@ import mimetypes
 
 THUMBNAIL_CACHE_DIR = "thumbnail_cache"
 
+FTS_NATIVE_DIACRITICS = sqlite3.sqlite_version_info >= (3, 45, 0)
+SEARCH_INDEX_TOKENIZER = "trigram remove_diacritics 1" if FTS_NATIVE_DIACRITICS else "trigram"
+
 
 class FileIndexer:
 
@@ -51,17 +55,42 @@ class FileIndexer:
         self._create_tables()
         self._count_cache = {}
         self._paged_cache = {}
+        self.write_generation = 0
         self._auto_rebuild_search_index()
 
+    @classmethod
+    def open_reader(cls, db_name):
+        """Conexão extra para leitura em outra thread, sem criar tabelas nem migrar."""
+        return cls._open_thread_indexer(db_name)
+
+    @classmethod
+    def open_writer(cls, db_name):
+        """Conexão extra para gravações curtas em outra thread (WAL, espera de 30s pelo lock)."""
+        return cls._open_thread_indexer(db_name)
+
+    @classmethod
+    def _open_thread_indexer(cls, db_name):
+        indexer = cls.__new__(cls)
+        indexer.db_name = db_name
+        indexer.conn = open_db_for_thread(db_name)
+        indexer.cursor = indexer.conn.cursor()
+        indexer._count_cache = {}
+        indexer._paged_cache = {}
+        indexer.write_generation = 0
+        return indexer
+
     def _auto_rebuild_search_index(self):
         try:
             self.cursor.execute("PRAGMA table_info(search_index)")
             columns = [row[1] for row in self.cursor.fetchall()]
-            expected = {'name', 'description', 'normalized_name',
-                        'normalized_description', 'file_id', 'source'}
-            if not expected.issubset(set(columns)):
+            self.cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'search_index'")
+            row = self.cursor.fetchone()
+            table_sql = row[0] if row else ''
+            expected = {'name', 'description', 'file_id', 'source'}
+            if set(columns) != expected or f'tokenize="{SEARCH_INDEX_TOKENIZER}"' not in table_sql:
                 print(
-                    "🔄 Recriando índice de busca para compatibilidade com busca híbrida...")
+                    f"🔄 Recriando índice de busca com tokenizer '{SEARCH_INDEX_TOKENIZER}' (sem colunas normalizadas duplicadas)...")
                 self.rebuild_search_index_with_normalization()
 
             self._populate_normalized_columns()
@@ -90,13 +119,11 @@ class FileIndexer:
                     "SELECT file_id, name FROM files WHERE name_normalized IS NULL OR name_aggressive IS NULL")
                 files_to_update = self.cursor.fetchall()
 
-                from src.drive.match import normalize_aggressive
                 updates = []
 
                 for file_id, name in files_to_update:
                     if name:
-                        name_normalized = SearchEngine(
-                            None).normalize_text(name)
+                        name_normalized = normalize_text(name)
                         name_aggressive = normalize_aggressive(name)
                         updates.append(
                             (name_normalized, name_aggressive, file_id))
@@ -143,17 +170,7 @@ class FileIndexer:
         ''')
 
         self._migrate_add_normalized_columns()
-        self.cursor.execute('''
-                            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
-                                name,
-                                description,
-                                normalized_name,
-                                normalized_description,
-                                file_id UNINDEXED,
-                                source UNINDEXED,
-                                tokenize="trigram"
-                            )
-                            ''')
+        self._create_search_index_table()
         self.cursor.execute(
             'CREATE INDEX IF NOT EXISTS idx_files_source ON files(source)')
         self.cursor.execute(
@@ -171,6 +188,105 @@ class FileIndexer:
         self.cursor.execute(
             'CREATE INDEX IF NOT EXISTS idx_files_size ON files(size)')
 
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS saved_searches (
+                search_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE,
+                search_term TEXT,
+                explorer_special INTEGER DEFAULT 0,
+                created_at INTEGER,
+                refreshed_at INTEGER
+            )
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS saved_search_results (
+                search_id INTEGER,
+                file_id TEXT,
+                PRIMARY KEY (search_id, file_id)
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_saved_search_results_file ON saved_search_results(file_id)')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime REAL,
+                md5 TEXT,
+                sample_hash TEXT,
+                hashed_at INTEGER
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fusion_state (
+                drive_id TEXT PRIMARY KEY,
+                local_id TEXT,
+                drive_modified INTEGER,
+                desc_hash TEXT,
+                local_generation INTEGER,
+                fused_at INTEGER
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_fusion_state_local ON fusion_state(local_id) WHERE local_id IS NOT NULL')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS link_hydrations (
+                file_id TEXT PRIMARY KEY,
+                hydrated_at INTEGER
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS drive_folders (
+                folder_id TEXT PRIMARY KEY,
+                name TEXT,
+                parent_id TEXT,
+                drive_id TEXT,
+                modified_time TEXT,
+                synced_at INTEGER
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_drive_folders_parent ON drive_folders(parent_id)')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_checkpoints (
+                signature TEXT NOT NULL,
+                partition INTEGER NOT NULL,
+                page_token TEXT,
+                completed INTEGER NOT NULL DEFAULT 0,
+                files_processed INTEGER NOT NULL DEFAULT 0,
+                fusion_count INTEGER NOT NULL DEFAULT 0,
+                start_page_token TEXT,
+                updated_at INTEGER,
+                PRIMARY KEY (signature, partition)
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS image_hashes (
+                file_id TEXT PRIMARY KEY,
+                file_key TEXT,
+                ahash INTEGER,
+                dhash INTEGER,
+                phash INTEGER,
+                hashed_at INTEGER
+            ) WITHOUT ROWID
+        ''')
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fusion_events (
+                event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                drive_id TEXT,
+                local_id TEXT,
+                phase TEXT,
+                ms REAL,
+                created_at INTEGER
+            )
+        ''')
+
         self._create_performance_indices()
 
         self.cursor.execute("PRAGMA mmap_size=268435456")
@@ -181,6 +297,23 @@ class FileIndexer:
         self.conn.commit()
         print("índice de resultados com trigram criado")
 
+    def _create_search_index_table(self, table_name='search_index'):
+        self.cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table_name} USING fts5(
+                name,
+                description,
+                file_id UNINDEXED,
+                source UNINDEXED,
+                tokenize="{SEARCH_INDEX_TOKENIZER}"
+            )
+        ''')
+
+    @staticmethod
+    def search_index_text(text):
+        if FTS_NATIVE_DIACRITICS:
+            return text or ''
+        return normalize_text(text)
+
     def _migrate_add_normalized_columns(self):
         try:
             self.cursor.execute("PRAGMA table_info(files)")
@@ -196,6 +329,11 @@ class FileIndexer:
                 self.cursor.execute(
                     "ALTER TABLE files ADD COLUMN name_aggressive TEXT")
 
+            if 'md5Checksum' not in columns:
+                print("🔄 Adicionando coluna md5Checksum...")
+                self.cursor.execute(
+                    "ALTER TABLE files ADD COLUMN md5Checksum TEXT")
+
             self.conn.commit()
             print("✅ Migração de colunas concluída")
 
@@ -218,6 +356,10 @@ class FileIndexer:
                     'CREATE INDEX IF NOT EXISTS idx_files_name_aggressive ON files(name_aggressive) WHERE source="local"')
                 print("📊 Índice name_aggressive criado")
 
+            if 'md5Checksum' in columns:
+                self.cursor.execute(
+                    'CREATE INDEX IF NOT EXISTS idx_files_md5Checksum ON files(md5Checksum) WHERE md5Checksum IS NOT NULL')
+
             self.cursor.execute(
                 'CREATE INDEX IF NOT EXISTS idx_files_name_lower_local ON files(LOWER(name)) WHERE source="local"')
             self.cursor.execute(
@@ -236,25 +378,34 @@ class FileIndexer:
                 file_ids = [(item.get('id'),) for item in files_list]
 
                 existing_desc = {}
+                existing_links = {}
                 if file_ids:
                     placeholders = ','.join('?' for _ in file_ids)
                     try:
                         self.cursor.execute(
-                            f"SELECT file_id, description FROM files WHERE file_id IN ({placeholders})",
+                            f"SELECT file_id, description, thumbnailLink, webContentLink FROM files WHERE file_id IN ({placeholders})",
                             [fid for (fid,) in file_ids]
                         )
-                        existing_desc = {row[0]: row[1]
-                                         for row in self.cursor.fetchall()}
+                        for row in self.cursor.fetchall():
+                            existing_desc[row[0]] = row[1]
+                            existing_links[row[0]] = (row[2], row[3])
                     except Exception:
                         existing_desc = {}
+                        existing_links = {}
 
                 if file_ids:
                     self.cursor.executemany(
                         "DELETE FROM files WHERE file_id = ?", file_ids)
+                    # file_id não é indexado no FTS: um DELETE por id varreria o índice inteiro a cada arquivo.
+                    self.cursor.execute(
+                        "CREATE TEMP TABLE IF NOT EXISTS batch_file_ids (file_id TEXT PRIMARY KEY)")
+                    self.cursor.execute("DELETE FROM temp.batch_file_ids")
                     self.cursor.executemany(
-                        "DELETE FROM search_index WHERE file_id = ?", file_ids)
+                        "INSERT OR IGNORE INTO temp.batch_file_ids VALUES (?)", file_ids)
+                    self.cursor.execute(
+                        "DELETE FROM search_index WHERE file_id IN (SELECT file_id FROM temp.batch_file_ids)")
+                    self.cursor.execute("DELETE FROM temp.batch_file_ids")
 
-                from src.drive.match import normalize_aggressive
                 data_files = []
                 for item in files_list:
                     fid = item.get('id')
@@ -265,10 +416,13 @@ class FileIndexer:
                         effective_desc = incoming_desc
 
                     name = item.get('name', '')
-                    name_normalized = SearchEngine(
-                        None).normalize_text(name) if name else ''
+                    name_normalized = normalize_text(name) if name else ''
                     name_aggressive = normalize_aggressive(
                         name) if name else ''
+                    # Links ausentes (None) vêm de listagens enxutas: mantém os já hidratados.
+                    old_thumbnail, old_link = existing_links.get(fid, (None, None))
+                    thumbnail_link = item.get('thumbnailLink')
+                    web_content_link = item.get('webContentLink')
 
                     data_files.append((
                         fid,
@@ -277,20 +431,21 @@ class FileIndexer:
                         item.get('mimeType'),
                         item.get('source'),
                         effective_desc,
-                        item.get('thumbnailLink'),
+                        old_thumbnail if thumbnail_link is None else thumbnail_link,
                         item.get('thumbnailPath'),
                         item.get('size', 0),
                         item.get('modifiedTime'),
                         item.get('createdTime'),
                         item.get('parentId'),
-                        item.get('webContentLink'),
+                        old_link if web_content_link is None else web_content_link,
                         0,
                         name_normalized,
-                        name_aggressive
+                        name_aggressive,
+                        item.get('md5Checksum')
                     ))
                 if data_files:
                     self.cursor.executemany(
-                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", data_files)
+                        "INSERT OR REPLACE INTO files (file_id, name, path, mimeType, source, description, thumbnailLink, thumbnailPath, size, modifiedTime, createdTime, parentId, webContentLink, starred, name_normalized, name_aggressive, md5Checksum) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", data_files)
 
                 data_search_index = []
                 for item in files_list:
@@ -302,24 +457,57 @@ class FileIndexer:
                     else:
                         effective_desc = incoming_desc
                     data_search_index.append((
-                        name_val,
-                        effective_desc,
-                        SearchEngine(None).normalize_text(name_val),
-                        SearchEngine(None).normalize_text(effective_desc),
+                        self.search_index_text(name_val),
+                        self.search_index_text(effective_desc),
                         fid,
                         item.get('source')
                     ))
                 if data_search_index:
                     self.cursor.executemany(
-                        "INSERT OR REPLACE INTO search_index VALUES (?, ?, ?, ?, ?, ?)", data_search_index)
+                        "INSERT OR REPLACE INTO search_index VALUES (?, ?, ?, ?)", data_search_index)
+                    self._refresh_saved_search_results(data_search_index)
 
                 if simulate_error:
                     raise ValueError("Simulating an error for rollback")
+            self.write_generation += 1
 
         except Exception as e:
             print(f"Erro ao salvar arquivos em lote, rollback acionado: {e}")
             raise
 
+    def _refresh_saved_search_results(self, search_rows):
+        if not search_rows:
+            return
+        self.cursor.execute(
+            "SELECT search_id, search_term, explorer_special FROM saved_searches")
+        saved_searches = self.cursor.fetchall()
+        if not saved_searches:
+            return
+
+        file_ids = [(row[2],) for row in search_rows]
+        self.cursor.executemany(
+            "DELETE FROM saved_search_results WHERE file_id = ?", file_ids)
+
+        self._create_search_index_table('temp.saved_search_probe')
+        self.cursor.execute("DELETE FROM temp.saved_search_probe")
+        self.cursor.executemany(
+            "INSERT INTO temp.saved_search_probe VALUES (?, ?, ?, ?)", search_rows)
+
+        search_engine = SearchEngine(None)
+        for search_id, search_term, explorer_special in saved_searches:
+            fts_query, _ = search_engine._build_fts_query(search_term)
+            if not fts_query:
+                continue
+            query = "INSERT OR IGNORE INTO saved_search_results SELECT ?, file_id FROM temp.saved_search_probe WHERE saved_search_probe MATCH ?"
+            if explorer_special:
+                query += " AND source = 'local'"
+            try:
+                self.cursor.execute(query, (search_id, fts_query))
+            except sqlite3.OperationalError as e:
+                print(
+                    f"⚠️ Erro ao atualizar busca salva '{search_term}': {e}")
+        self.cursor.execute("DELETE FROM temp.saved_search_probe")
+
     def count_files(self, source, search_term=None, filter_type=None, folder_id=None, advanced_filters=None):
         self.ensure_conn()
         cache_key = (source, search_term, filter_type,
@@ -330,7 +518,8 @@ class FileIndexer:
         where_clauses = []
         file_ids = None
         if search_term:
-            quoted_search_term = search_term.strip().replace('"', '""')
+            quoted_search_term = SearchEngine(None).normalize_text(
+                search_term).replace('"', '""')
             query_term = f'"{quoted_search_term}*"'
             query = "SELECT DISTINCT file_id FROM search_index WHERE search_index MATCH ?"
             self.cursor.execute(query, (query_term,))
@@ -481,17 +670,7 @@ class FileIndexer:
         try:
             print("🔄 Iniciando reconstrução do índice com normalização...")
             self.cursor.execute('DROP TABLE IF EXISTS search_index')
-            self.cursor.execute('''
-                    CREATE VIRTUAL TABLE search_index USING fts5(
-                        name,
-                        description,
-                        normalized_name,
-                        normalized_description,
-                        file_id UNINDEXED,
-                        source UNINDEXED,
-                        tokenize="trigram"
-                    )
-                    ''')
+            self._create_search_index_table()
 
             self.cursor.execute(
                 'SELECT file_id, name, description, source FROM files')
@@ -505,17 +684,15 @@ class FileIndexer:
                 description = description or ""
 
                 batch_data.append((
-                    name,
-                    description,
-                    SearchEngine(None).normalize_text(name),
-                    SearchEngine(None).normalize_text(description),
+                    self.search_index_text(name),
+                    self.search_index_text(description),
                     file_id,
                     source
                 ))
 
                 if len(batch_data) >= 1000:
                     self.cursor.executemany(
-                        "INSERT INTO search_index VALUES (?, ?, ?, ?, ?, ?)",
+                        "INSERT INTO search_index VALUES (?, ?, ?, ?)",
                         batch_data
                     )
                     batch_data = []
@@ -524,7 +701,7 @@ class FileIndexer:
 
             if batch_data:
                 self.cursor.executemany(
-                    "INSERT INTO search_index VALUES (?, ?, ?, ?, ?, ?)",
+                    "INSERT INTO search_index VALUES (?, ?, ?, ?)",
                     batch_data
                 )
 
@@ -562,9 +739,10 @@ class FileIndexer:
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         ''', (file_id, name, path, mimeType, source, description, thumbnailLink, thumbnailPath, size, modifiedTime, createdTime, parentId, webContentLink, starred))
         self.conn.commit()
-        self.cursor.execute('INSERT OR REPLACE INTO search_index (name, description, normalized_name, normalized_description, file_id, source) VALUES (?, ?, ?, ?, ?, ?)',
-                            (name, description, SearchEngine(None).normalize_text(name), SearchEngine(None).normalize_text(description), file_id, source))
+        self.cursor.execute('INSERT OR REPLACE INTO search_index (name, description, file_id, source) VALUES (?, ?, ?, ?)',
+                            (self.search_index_text(name), self.search_index_text(description), file_id, source))
         self.conn.commit()
+        self.write_generation += 1
 
     def toggle_starred(self, file_id):
         self.ensure_conn()
@@ -602,15 +780,49 @@ class FileIndexer:
     def clear_source(self, source: str):
         self.ensure_conn()
         try:
+            self.cursor.execute(
+                "DELETE FROM saved_search_results WHERE file_id IN (SELECT file_id FROM files WHERE source = ?)", (source,))
             self.cursor.execute(
                 "DELETE FROM files WHERE source = ?", (source,))
             self.cursor.execute(
                 "DELETE FROM search_index WHERE source = ?", (source,))
+            if source == 'drive':
+                self.cursor.execute("DELETE FROM fusion_state")
+                self.cursor.execute("DELETE FROM drive_folders")
+                self.cursor.execute("DELETE FROM sync_checkpoints")
+                self.cursor.execute(
+                    "DELETE FROM sync_state WHERE key LIKE 'drive_folders_%'")
+                self.cursor.execute(
+                    "DELETE FROM sync_state WHERE key LIKE 'drive_changes_token:%'")
+            elif source == 'local':
+                self.bump_local_generation(commit=False)
             self.conn.commit()
+            self.write_generation += 1
         except Exception:
             self.conn.rollback()
             raise
 
+    def delete_files(self, file_ids, source='drive', commit=True):
+        self.ensure_conn()
+        file_ids = [file_id for file_id in file_ids if file_id]
+        for i in range(0, len(file_ids), 500):
+            batch = file_ids[i:i + 500]
+            placeholders = ','.join('?' for _ in batch)
+            self.cursor.execute(
+                f"DELETE FROM saved_search_results WHERE file_id IN (SELECT file_id FROM files WHERE source = ? AND file_id IN ({placeholders}))",
+                [source] + batch)
+            self.cursor.execute(
+                f"DELETE FROM files WHERE source = ? AND file_id IN ({placeholders})", [source] + batch)
+            self.cursor.execute(
+                f"DELETE FROM search_index WHERE source = ? AND file_id IN ({placeholders})", [source] + batch)
+            if source == 'drive':
+                self.cursor.execute(
+                    f"DELETE FROM fusion_state WHERE drive_id IN ({placeholders})", batch)
+        if file_ids:
+            self.write_generation += 1
+        if commit:
+            self.conn.commit()
+
     def update_thumbnail_path(self, file_id: str, thumbnail_path: str | None):
         self.ensure_conn()
         self.cursor.execute(
@@ -627,9 +839,157 @@ class FileIndexer:
             (desc, thumbnailLink, webContentLink, file_id),
         )
         self.cursor.execute(
-            "UPDATE search_index SET description = ?, normalized_description = ? WHERE file_id = ?",
-            (desc, SearchEngine(None).normalize_text(desc), file_id),
+            "UPDATE search_index SET description = ? WHERE file_id = ?",
+            (self.search_index_text(desc), file_id),
         )
+        self.cursor.execute(
+            "SELECT name, source FROM files WHERE file_id = ?", (file_id,))
+        row = self.cursor.fetchone()
+        if row:
+            self._refresh_saved_search_results([(
+                self.search_index_text(row[0]),
+                self.search_index_text(desc),
+                file_id,
+                row[1]
+            )])
+        self.write_generation += 1
+        if commit:
+            self.conn.commit()
+
+    def update_links(self, rows, commit=True):
+        """rows: (file_id, thumbnailLink, webContentLink) vindos da hidratação sob demanda."""
+        self.ensure_conn()
+        self.cursor.executemany(
+            "UPDATE files SET thumbnailLink = COALESCE(?, thumbnailLink), webContentLink = COALESCE(?, webContentLink) WHERE file_id = ?",
+            [(thumbnail_link, web_content_link, file_id) for file_id, thumbnail_link, web_content_link in rows])
+        now = int(time.time())
+        self.cursor.executemany(
+            "INSERT OR REPLACE INTO link_hydrations (file_id, hydrated_at) VALUES (?, ?)",
+            [(file_id, now) for file_id, _, _ in rows])
+        if commit:
+            self.conn.commit()
+
+    def update_descriptions(self, rows, commit=False):
+        """rows: (file_id, description, thumbnailLink, webContentLink); o FTS é atualizado numa só passada."""
+        self.ensure_conn()
+        rows = [(file_id, description or '', thumbnailLink, webContentLink)
+                for file_id, description, thumbnailLink, webContentLink in rows]
+        if not rows:
+            return
+        self.cursor.executemany(
+            "UPDATE files SET description = ?, thumbnailLink = COALESCE(?, thumbnailLink), webContentLink = COALESCE(?, webContentLink) WHERE file_id = ?",
+            [(desc, thumbnailLink, webContentLink, file_id)
+             for file_id, desc, thumbnailLink, webContentLink in rows])
+        self.cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS fused_descriptions (file_id TEXT PRIMARY KEY, description TEXT)")
+        self.cursor.execute("DELETE FROM temp.fused_descriptions")
+        self.cursor.executemany(
+            "INSERT OR REPLACE INTO temp.fused_descriptions VALUES (?, ?)",
+            [(file_id, self.search_index_text(desc)) for file_id, desc, _, _ in rows])
+        self.cursor.execute('''
+            UPDATE search_index SET description = (
+                SELECT d.description FROM temp.fused_descriptions d WHERE d.file_id = search_index.file_id)
+            WHERE file_id IN (SELECT file_id FROM temp.fused_descriptions)
+        ''')
+        self.cursor.execute('''
+            SELECT f.name, d.description, f.file_id, f.source
+            FROM temp.fused_descriptions d JOIN files f ON f.file_id = d.file_id
+        ''')
+        search_rows = [(self.search_index_text(name), desc_text, file_id, source)
+                       for name, desc_text, file_id, source in self.cursor.fetchall()]
+        self._refresh_saved_search_results(search_rows)
+        self.cursor.execute("DELETE FROM temp.fused_descriptions")
+        self.write_generation += 1
+        if commit:
+            self.conn.commit()
+
+    def get_state(self, key, default=None):
+        self.ensure_conn()
+        self.cursor.execute(
+            "SELECT value FROM sync_state WHERE key = ?", (key,))
+        row = self.cursor.fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value, commit=True):
+        self.ensure_conn()
+        self.cursor.execute(
+            "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+        if commit:
+            self.conn.commit()
+
+    def get_sync_checkpoints(self, signature, max_age=None):
+        """Devolve {partição: (page_token, concluída, arquivos, fusões, start_page_token)}."""
+        self.ensure_conn()
+        if max_age is not None:
+            self.cursor.execute(
+                "DELETE FROM sync_checkpoints WHERE updated_at < ?", (int(time.time()) - max_age,))
+        self.cursor.execute(
+            "SELECT partition, page_token, completed, files_processed, fusion_count, start_page_token "
+            "FROM sync_checkpoints WHERE signature = ?", (signature,))
+        return {row[0]: tuple(row[1:]) for row in self.cursor.fetchall()}
+
+    def save_sync_checkpoints(self, signature, checkpoints, start_page_token=None, commit=False):
+        self.ensure_conn()
+        now = int(time.time())
+        self.cursor.executemany(
+            "INSERT OR REPLACE INTO sync_checkpoints (signature, partition, page_token, completed, files_processed, "
+            "fusion_count, start_page_token, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(signature, partition, page_token, int(completed), files_processed, fusion_count, start_page_token, now)
+             for partition, (page_token, completed, files_processed, fusion_count) in checkpoints.items()])
+        if commit:
+            self.conn.commit()
+
+    def clear_sync_checkpoints(self, signature, commit=True):
+        self.ensure_conn()
+        self.cursor.execute(
+            "DELETE FROM sync_checkpoints WHERE signature = ?", (signature,))
+        if commit:
+            self.conn.commit()
+
+    def get_local_generation(self):
+        return int(self.get_state('local_scan_generation', 0))
+
+    def bump_local_generation(self, commit=True):
+        generation = self.get_local_generation() + 1
+        self.set_state('local_scan_generation', generation, commit=commit)
+        return generation
+
+    def get_fused_drive_id(self, local_id):
+        self.ensure_conn()
+        self.cursor.execute(
+            "SELECT drive_id FROM fusion_state WHERE local_id = ? LIMIT 1", (local_id,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def get_links_hydrated_at(self, file_id):
+        self.ensure_conn()
+        self.cursor.execute(
+            "SELECT hydrated_at FROM link_hydrations WHERE file_id = ?", (file_id,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def get_fusion_states(self, drive_ids):
+        self.ensure_conn()
+        states = {}
+        drive_ids = list(drive_ids)
+        for i in range(0, len(drive_ids), 500):
+            batch = drive_ids[i:i + 500]
+            placeholders = ','.join('?' for _ in batch)
+            self.cursor.execute(
+                f"SELECT drive_id, local_id, drive_modified, desc_hash, local_generation FROM fusion_state WHERE drive_id IN ({placeholders})",
+                batch)
+            for drive_id, local_id, drive_modified, desc_hash, local_generation in self.cursor.fetchall():
+                states[drive_id] = (local_id, drive_modified,
+                                    desc_hash, local_generation)
+        return states
+
+    def save_fusion_states(self, rows, commit=False):
+        """rows: (drive_id, local_id, drive_modified, desc_hash, local_generation)"""
+        self.ensure_conn()
+        now = int(time.time())
+        self.cursor.executemany(
+            "INSERT OR REPLACE INTO fusion_state (drive_id, local_id, drive_modified, desc_hash, local_generation, fused_at) VALUES (?, ?, ?, ?, ?, ?)",
+            [row + (now,) for row in rows])
         if commit:
             self.conn.commit()
 
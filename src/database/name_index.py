@@ -0,0 +1,126 @@
+"""
+Módulo name_index do VoxImago.MB
+
+Responsável por:
+- Manter em memória os nomes normalizados da pasta/visão atual
+- Filtrar por substring a cada tecla digitada sem consultar o SQLite
+- Limitar o uso de memória e invalidar as visões após escritas do indexador
+"""
+
+from collections import OrderedDict
+from src.database.search import SearchEngine
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class HotNameIndex:
+
+    def __init__(self, indexer, max_entries=200000, max_views=4, max_bytes=64 * 1024 * 1024):
+        self.indexer = indexer
+        self.max_entries = max_entries
+        self.max_views = max_views
+        self.max_bytes = max_bytes
+        self._views = OrderedDict()
+        self._normalizer = SearchEngine(None)
+
+    def invalidate(self):
+        self._views.clear()
+
+    def _current_version(self):
+        self.indexer.ensure_conn()
+        data_version = self.indexer.conn.execute(
+            "PRAGMA data_version").fetchone()[0]
+        return (getattr(self.indexer, 'write_generation', 0), data_version)
+
+    def prepare(self, source, folder_id):
+        key = (source, folder_id)
+        version = self._current_version()
+        view = self._views.get(key)
+        if view is not None and view['version'] == version:
+            self._views.move_to_end(key)
+            return view
+
+        where_clauses = []
+        params = []
+        if source:
+            where_clauses.append("source = ?")
+            params.append(source)
+        if folder_id:
+            where_clauses.append("parentId = ?")
+            params.append(folder_id)
+        else:
+            where_clauses.append("(parentId IS NULL OR parentId = '')")
+        params.append(self.max_entries + 1)
+        self.indexer.cursor.execute(
+            f"SELECT file_id, name FROM files WHERE {' AND '.join(where_clauses)} ORDER BY name COLLATE NOCASE LIMIT ?",
+            params)
+        rows = self.indexer.cursor.fetchall()
+        if len(rows) > self.max_entries:
+            print(
+                f"⚠️ Visão com mais de {self.max_entries:,} itens, filtro instantâneo desativado")
+            self._views.pop(key, None)
+            return None
+
+        file_ids = [row[0] for row in rows]
+        names = [self._normalizer.normalize_text(row[1]) for row in rows]
+        if np is not None:
+            names_array = np.array(names) if names else np.array([], dtype=str)
+            if names_array.nbytes > self.max_bytes:
+                print(
+                    f"⚠️ Visão excede {self.max_bytes // (1024 * 1024)}MB, filtro instantâneo desativado")
+                self._views.pop(key, None)
+                return None
+            view = {
+                'version': version,
+                'ids': np.array(file_ids, dtype=object),
+                'names': names_array,
+                'last_term': '',
+                'last_rows': None,
+            }
+        else:
+            view = {
+                'version': version,
+                'ids': file_ids,
+                'names': names,
+                'last_term': '',
+                'last_rows': None,
+            }
+
+        self._views[key] = view
+        self._views.move_to_end(key)
+        while len(self._views) > self.max_views:
+            self._views.popitem(last=False)
+        return view
+
+    def filter(self, source, folder_id, text, limit=None):
+        # prepare() reaproveita a visão enquanto write_generation e PRAGMA data_version não mudam.
+        view = self.prepare(source, folder_id)
+        if view is None:
+            return None
+
+        term = self._normalizer.normalize_text(text)
+        if not term:
+            matched = view['ids'] if np is None else view['ids'].tolist()
+            return matched[:limit] if limit else matched
+
+        if np is not None:
+            candidates = None
+            if view['last_term'] and view['last_term'] in term:
+                candidates = view['last_rows']
+            if candidates is None:
+                rows = np.flatnonzero(np.char.find(view['names'], term) >= 0)
+            else:
+                rows = candidates[np.char.find(
+                    view['names'][candidates], term) >= 0]
+            view['last_term'] = term
+            view['last_rows'] = rows
+            if limit:
+                rows = rows[:limit]
+            return view['ids'][rows].tolist()
+
+        matched = [file_id for file_id, name in zip(
+            view['ids'], view['names']) if term in name]
+        return matched[:limit] if limit else matched
@@ -5,12 +5,31 @@ Responsável por:
 - Implementar o mecanismo de busca full-text (FTS5) no banco SQLite
 - Normalizar e interpretar termos de busca
 - Fornecer a classe SearchEngine para consultas, filtros e paginação
+- Calcular total de resultados e facetas (fonte, categoria, extensão, ano, favoritos)
 """
 
 import re
-import unicodedata
 import sqlite3
 import time
+from src.utils.normalization import normalize_text
+
+CATEGORY_EXTENSIONS = {
+    'images': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.ico', '.tiff', '.heic', '.arw', '.cr2', '.nef', '.dng', '.raf', '.orf', '.srw'],
+    'videos': ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.mkv', '.webm', '.m4v', '.3gp'],
+    'documents': ['.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt', '.xls', '.xlsx', '.ppt', '.pptx'],
+    'audios': ['.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a']
+}
+
+RESULT_SORT_MAP = {
+    'name_asc': 'f.name COLLATE NOCASE ASC',
+    'name_desc': 'f.name COLLATE NOCASE DESC',
+    'size_asc': 'f.size ASC',
+    'size_desc': 'f.size DESC',
+    'created_desc': 'f.createdTime DESC',
+    'created_asc': 'f.createdTime ASC',
+    'modified_desc': 'f.modifiedTime DESC',
+    'modified_asc': 'f.modifiedTime ASC'
+}
 
 
 class SearchEngine:
@@ -63,33 +82,92 @@ class SearchEngine:
         return terms, exclude_terms, or_groups, filters
 
     def normalize_text(self, text):
-        if not text:
-            return ""
-        allowed_symbols = {'<', '>', '&', '#', '@'}
-        normalized = ''.join(
-            c for c in unicodedata.normalize('NFD', text.lower().strip())
-            if unicodedata.category(c) != 'Mn' or c in allowed_symbols
-        )
-        return normalized
+        return normalize_text(text)
 
     def remove_accents(self, text):
         return self.normalize_text(text)
 
+    def _build_fts_query(self, search_term):
+        norm_search_term = self.normalize_text(search_term)
+        terms, exclude_terms, or_groups, extra_filters = self.parse_search_query(
+            norm_search_term)
+
+        def quote_if_short_or_symbol(term):
+            return f'"{term}"' if len(term) <= 4 or re.match(r'^[<&#@]', term) else term
+        valid_terms = [quote_if_short_or_symbol(t.strip()) for t in (or_groups if or_groups else terms) if t and t.strip(
+        ) and t.strip().upper() not in ['OR', 'AND'] and not t.startswith('-')]
+        if not valid_terms and not exclude_terms:
+            return None, extra_filters
+        if or_groups:
+            fts_query = ' OR '.join(valid_terms)
+        else:
+            fts_query = ' '.join(valid_terms)
+        if exclude_terms:
+            for t in exclude_terms:
+                fts_query += f' NOT "{t}"'
+        if not fts_query.strip():
+            return None, extra_filters
+        return fts_query, extra_filters
+
+    def _build_search_filter_clauses(self, extra_filters, advanced_filters):
+        filter_clauses = []
+        filter_params = []
+        if extra_filters.get('is_starred'):
+            filter_clauses.append("starred = 1")
+        if extra_filters.get('created_before'):
+            filter_clauses.append("createdTime <= ?")
+            filter_params.append(
+                int(time.mktime(extra_filters['created_before'].timetuple())))
+        if extra_filters.get('created_after'):
+            filter_clauses.append("createdTime >= ?")
+            filter_params.append(
+                int(time.mktime(extra_filters['created_after'].timetuple())))
+
+        if advanced_filters:
+            if advanced_filters.get('category'):
+                category = advanced_filters['category']
+                if category in CATEGORY_EXTENSIONS:
+                    ext_conditions = []
+                    for ext in CATEGORY_EXTENSIONS[category]:
+                        ext_conditions.append("name LIKE ?")
+                        filter_params.append(f"%{ext}")
+                    if ext_conditions:
+                        filter_clauses.append(
+                            f"({' OR '.join(ext_conditions)})")
+
+            if advanced_filters.get('extension'):
+                filter_clauses.append("name LIKE ?")
+                filter_params.append(f"%{advanced_filters['extension']}")
+                filter_clauses.append("mimeType != 'folder'")
+                filter_clauses.append(
+                    "mimeType != 'application/vnd.google-apps.folder'")
+
+            if advanced_filters.get('is_starred'):
+                filter_clauses.append("starred = 1")
+
+            if advanced_filters.get('created_before'):
+                filter_clauses.append("createdTime <= ?")
+                filter_params.append(
+                    int(time.mktime(advanced_filters['created_before'].timetuple())))
+
+            if advanced_filters.get('created_after'):
+                filter_clauses.append("createdTime >= ?")
+                filter_params.append(
+                    int(time.mktime(advanced_filters['created_after'].timetuple())))
+        return filter_clauses, filter_params
+
     def get_search_suggestions(self, search_term, search_all_sources, limit=10):
         self.indexer.ensure_conn()
         self.indexer.cursor.execute("PRAGMA synchronous=OFF")
 
-        quoted_term = search_term.strip().replace('"', '""')
+        quoted_term = self.normalize_text(search_term).replace('"', '""')
         query_term = f'"{quoted_term}*"'
 
         if search_all_sources:
-            query = "SELECT name FROM search_index WHERE search_index MATCH ? OR normalized_name MATCH ? OR normalized_description MATCH ? ORDER BY rank LIMIT ?"
-            self.indexer.cursor.execute(
-                query, (query_term, query_term, query_term, limit))
+            query = "SELECT f.name FROM search_index s JOIN files f ON f.file_id = s.file_id WHERE search_index MATCH ? ORDER BY s.rank LIMIT ?"
         else:
-            query = "SELECT name FROM search_index WHERE (search_index MATCH ? OR normalized_name MATCH ? OR normalized_description MATCH ?) AND source = 'local' ORDER BY rank LIMIT ?"
-            self.indexer.cursor.execute(
-                query, (query_term, query_term, query_term, limit))
+            query = "SELECT f.name FROM search_index s JOIN files f ON f.file_id = s.file_id WHERE search_index MATCH ? AND s.source = 'local' ORDER BY s.rank LIMIT ?"
+        self.indexer.cursor.execute(query, (query_term, limit))
 
         suggestions = [row[0] for row in self.indexer.cursor.fetchall()]
 
@@ -117,35 +195,17 @@ class SearchEngine:
         files_where_clauses = []
         files_params = []
         if search_term:
-            norm_search_term = self.normalize_text(search_term)
             print(
-                f"Termo original: '{search_term}' -> Normalizado: '{norm_search_term}'")
-            terms, exclude_terms, or_groups, extra_filters = self.parse_search_query(
-                norm_search_term)
-
-            def quote_if_short_or_symbol(term):
-                return f'"{term}"' if len(term) <= 4 or re.match(r'^[<&#@]', term) else term
-            valid_terms = [quote_if_short_or_symbol(t.strip()) for t in (or_groups if or_groups else terms) if t and t.strip(
-            ) and t.strip().upper() not in ['OR', 'AND'] and not t.startswith('-')]
-            if not valid_terms and not exclude_terms:
-                self._paged_cache[cache_key] = []
-                return []
-            if or_groups:
-                fts_query = ' OR '.join(valid_terms)
-            else:
-                fts_query = ' '.join(valid_terms)
-            if exclude_terms:
-                for t in exclude_terms:
-                    fts_query += f' NOT "{t}"'
-            if not fts_query.strip():
+                f"Termo original: '{search_term}' -> Normalizado: '{self.normalize_text(search_term)}'")
+            fts_query, extra_filters = self._build_fts_query(search_term)
+            if not fts_query:
                 self._paged_cache[cache_key] = []
                 return []
             if explorer_special:
-                query = f"SELECT DISTINCT file_id FROM search_index WHERE (search_index MATCH ? OR normalized_name MATCH ? OR normalized_description MATCH ?) AND source = 'local' ORDER BY rank"
-                params = (fts_query, fts_query, fts_query)
+                query = "SELECT DISTINCT file_id FROM search_index WHERE search_index MATCH ? AND source = 'local' ORDER BY rank"
             else:
-                query = f"SELECT DISTINCT file_id FROM search_index WHERE search_index MATCH ? OR normalized_name MATCH ? OR normalized_description MATCH ? ORDER BY rank"
-                params = (fts_query, fts_query, fts_query)
+                query = "SELECT DISTINCT file_id FROM search_index WHERE search_index MATCH ? ORDER BY rank"
+            params = (fts_query,)
             try:
                 self.indexer.cursor.execute(query, params)
                 file_ids_to_fetch = [row[0]
@@ -161,58 +221,9 @@ class SearchEngine:
                 return []
             placeholders = ','.join('?' for _ in file_ids_to_fetch)
             details_query = f"SELECT file_id, name, path, mimeType, source, description, thumbnailLink, thumbnailPath, size, modifiedTime, createdTime, parentId, starred, webContentLink FROM files WHERE file_id IN ({placeholders})"
-            filter_clauses = []
-            filter_params = list(file_ids_to_fetch)
-            if extra_filters.get('is_starred'):
-                filter_clauses.append("starred = 1")
-            if extra_filters.get('created_before'):
-                filter_clauses.append("createdTime <= ?")
-                filter_params.append(
-                    int(time.mktime(extra_filters['created_before'].timetuple())))
-            if extra_filters.get('created_after'):
-                filter_clauses.append("createdTime >= ?")
-                filter_params.append(
-                    int(time.mktime(extra_filters['created_after'].timetuple())))
-
-            if advanced_filters:
-                if advanced_filters.get('category'):
-                    category = advanced_filters['category']
-                    if category != '':
-                        category_extensions = {
-                            'images': ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp', '.svg', '.ico', '.tiff', '.heic', '.arw', '.cr2', '.nef', '.dng', '.raf', '.orf', '.srw'],
-                            'videos': ['.mp4', '.avi', '.mov', '.wmv', '.flv', '.mkv', '.webm', '.m4v', '.3gp'],
-                            'documents': ['.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt', '.xls', '.xlsx', '.ppt', '.pptx'],
-                            'audios': ['.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma', '.m4a']
-                        }
-                        if category in category_extensions:
-                            extensions = category_extensions[category]
-                            ext_conditions = []
-                            for ext in extensions:
-                                ext_conditions.append("name LIKE ?")
-                                filter_params.append(f"%{ext}")
-                            if ext_conditions:
-                                filter_clauses.append(
-                                    f"({' OR '.join(ext_conditions)})")
-
-                if advanced_filters.get('extension'):
-                    filter_clauses.append("name LIKE ?")
-                    filter_params.append(f"%{advanced_filters['extension']}")
-                    filter_clauses.append("mimeType != 'folder'")
-                    filter_clauses.append(
-                        "mimeType != 'application/vnd.google-apps.folder'")
-
-                if advanced_filters.get('is_starred'):
-                    filter_clauses.append("starred = 1")
-
-                if advanced_filters.get('created_before'):
-                    filter_clauses.append("createdTime <= ?")
-                    filter_params.append(
-                        int(time.mktime(advanced_filters['created_before'].timetuple())))
-
-                if advanced_filters.get('created_after'):
-                    filter_clauses.append("createdTime >= ?")
-                    filter_params.append(
-                        int(time.mktime(advanced_filters['created_after'].timetuple())))
+            filter_clauses, extra_params = self._build_search_filter_clauses(
+                extra_filters, advanced_filters)
+            filter_params = list(file_ids_to_fetch) + extra_params
 
             if filter_clauses:
                 details_query += " AND " + " AND ".join(filter_clauses)
@@ -343,6 +354,160 @@ class SearchEngine:
             self._paged_cache[cache_key] = files
             return files
 
+    def search_with_facets(self, search_term, page=0, page_size=50, sort_by='name_asc', advanced_filters=None, explorer_special=False):
+        result = {'files': [], 'total': 0, 'facets': {
+            'source': {}, 'category': {}, 'extension': {}, 'year': {}, 'starred': {}}}
+        self.indexer.ensure_conn()
+        if self.indexer.conn is None or not search_term:
+            return result
+        cache_key = ('facets', page, page_size, search_term,
+                     sort_by, str(advanced_filters), explorer_special)
+        if cache_key in self._paged_cache:
+            return self._paged_cache[cache_key]
+        fts_query, extra_filters = self._build_fts_query(search_term)
+        if not fts_query:
+            self._paged_cache[cache_key] = result
+            return result
+
+        cursor = self.indexer.cursor
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS search_hits (file_id TEXT PRIMARY KEY)")
+        cursor.execute("DELETE FROM temp.search_hits")
+        fts_where = "search_index MATCH ?"
+        if explorer_special:
+            fts_where += " AND source = 'local'"
+        try:
+            cursor.execute(
+                f"INSERT OR IGNORE INTO temp.search_hits SELECT file_id FROM search_index WHERE {fts_where}",
+                (fts_query,))
+        except sqlite3.OperationalError as e:
+            print(f"Erro na consulta FTS: {e}")
+            print(f"Consulta problemática: {fts_query}")
+            self._paged_cache[cache_key] = result
+            return result
+
+        filter_clauses, filter_params = self._build_search_filter_clauses(
+            extra_filters, advanced_filters)
+        hits_where = " AND ".join(filter_clauses) if filter_clauses else "1"
+        hits_from = f"FROM temp.search_hits h JOIN files f ON f.file_id = h.file_id WHERE {hits_where}"
+
+        facets_query = f"""
+            WITH hits AS (SELECT f.source, f.name, f.createdTime, f.starred {hits_from})
+            SELECT 'source', source, COUNT(*) FROM hits GROUP BY 2
+            UNION ALL
+            SELECT 'extension', CASE WHEN instr(name, '.') > 0
+                THEN LOWER('.' || REPLACE(name, RTRIM(name, REPLACE(name, '.', '')), ''))
+                ELSE '' END, COUNT(*) FROM hits GROUP BY 2
+            UNION ALL
+            SELECT 'year', CASE WHEN createdTime > 0
+                THEN strftime('%Y', createdTime, 'unixepoch') END, COUNT(*) FROM hits GROUP BY 2
+            UNION ALL
+            SELECT 'starred', starred, COUNT(*) FROM hits GROUP BY 2
+        """
+        cursor.execute(facets_query, filter_params)
+        facets = result['facets']
+        for facet, value, count in cursor.fetchall():
+            if facet == 'starred':
+                value = bool(value)
+            facets[facet][value] = facets[facet].get(value, 0) + count
+
+        for ext, count in facets['extension'].items():
+            category = next((cat for cat, extensions in CATEGORY_EXTENSIONS.items()
+                             if ext in extensions), 'others')
+            facets['category'][category] = facets['category'].get(
+                category, 0) + count
+        result['total'] = sum(facets['source'].values())
+
+        order_by_clause = RESULT_SORT_MAP.get(
+            sort_by, RESULT_SORT_MAP['name_asc'])
+        if result['total']:
+            cursor.execute(
+                f"SELECT f.file_id, f.name, f.path, f.mimeType, f.source, f.description, f.thumbnailLink, f.thumbnailPath, f.size, f.modifiedTime, f.createdTime, f.parentId, f.starred, f.webContentLink {hits_from} ORDER BY {order_by_clause} LIMIT ? OFFSET ?",
+                filter_params + [page_size, page * page_size])
+            result['files'] = self.indexer._build_file_objects_from_search(
+                cursor.fetchall())
+        self._paged_cache[cache_key] = result
+        return result
+
+    def save_search(self, name, search_term, explorer_special=False):
+        self.indexer.ensure_conn()
+        fts_query, _ = self._build_fts_query(search_term)
+        if not fts_query:
+            return None
+        cursor = self.indexer.cursor
+        now = int(time.time())
+        fts_where = "search_index MATCH ?"
+        if explorer_special:
+            fts_where += " AND source = 'local'"
+        try:
+            with self.indexer.conn:
+                cursor.execute(
+                    "SELECT search_id FROM saved_searches WHERE name = ?", (name,))
+                row = cursor.fetchone()
+                if row:
+                    search_id = row[0]
+                    cursor.execute(
+                        "UPDATE saved_searches SET search_term = ?, explorer_special = ?, refreshed_at = ? WHERE search_id = ?",
+                        (search_term, 1 if explorer_special else 0, now, search_id))
+                    cursor.execute(
+                        "DELETE FROM saved_search_results WHERE search_id = ?", (search_id,))
+                else:
+                    cursor.execute(
+                        "INSERT INTO saved_searches (name, search_term, explorer_special, created_at, refreshed_at) VALUES (?, ?, ?, ?, ?)",
+                        (name, search_term, 1 if explorer_special else 0, now, now))
+                    search_id = cursor.lastrowid
+                cursor.execute(
+                    f"INSERT OR IGNORE INTO saved_search_results SELECT ?, file_id FROM search_index WHERE {fts_where}",
+                    (search_id, fts_query))
+        except sqlite3.OperationalError as e:
+            print(f"Erro ao salvar busca '{name}': {e}")
+            return None
+        return search_id
+
+    def list_saved_searches(self):
+        self.indexer.ensure_conn()
+        self.indexer.cursor.execute("""
+            SELECT s.search_id, s.name, s.search_term, s.refreshed_at, COUNT(r.file_id)
+            FROM saved_searches s LEFT JOIN saved_search_results r ON r.search_id = s.search_id
+            GROUP BY s.search_id ORDER BY s.name COLLATE NOCASE
+        """)
+        return [
+            {
+                'id': row[0],
+                'name': row[1],
+                'search_term': row[2],
+                'refreshed_at': row[3],
+                'count': row[4],
+            } for row in self.indexer.cursor.fetchall()
+        ]
+
+    def delete_saved_search(self, search_id):
+        self.indexer.ensure_conn()
+        with self.indexer.conn:
+            self.indexer.cursor.execute(
+                "DELETE FROM saved_search_results WHERE search_id = ?", (search_id,))
+            self.indexer.cursor.execute(
+                "DELETE FROM saved_searches WHERE search_id = ?", (search_id,))
+
+    def load_saved_search_paged(self, search_id, page, page_size, sort_by='name_asc', advanced_filters=None):
+        self.indexer.ensure_conn()
+        cursor = self.indexer.cursor
+        cursor.execute(
+            "SELECT search_term FROM saved_searches WHERE search_id = ?", (search_id,))
+        row = cursor.fetchone()
+        if not row:
+            return []
+        _, extra_filters = self._build_fts_query(row[0])
+        filter_clauses, filter_params = self._build_search_filter_clauses(
+            extra_filters, advanced_filters)
+        where = " AND ".join(["r.search_id = ?"] + filter_clauses)
+        order_by_clause = RESULT_SORT_MAP.get(
+            sort_by, RESULT_SORT_MAP['name_asc'])
+        cursor.execute(
+            f"SELECT f.file_id, f.name, f.path, f.mimeType, f.source, f.description, f.thumbnailLink, f.thumbnailPath, f.size, f.modifiedTime, f.createdTime, f.parentId, f.starred, f.webContentLink FROM saved_search_results r JOIN files f ON f.file_id = r.file_id WHERE {where} ORDER BY {order_by_clause} LIMIT ? OFFSET ?",
+            [search_id] + filter_params + [page_size, page * page_size])
+        return self.indexer._build_file_objects_from_search(cursor.fetchall())
+
     def debug_search_normalization(self, search_term):
         if not search_term:
             print("\n⚠️ DEBUG: Nenhum termo de busca fornecido")
@@ -0,0 +1,252 @@
+"""
+Módulo concurrent_listing
+
+Este módulo faz a listagem concorrente de arquivos do Google Drive no VoxImago.MB.
+A consulta é dividida em partições independentes (blocos de pastas), e cada partição
+é paginada por um pool limitado de threads. Cada thread usa o seu próprio objeto
+service, porque o googleapiclient não é thread-safe. As páginas chegam a um único
+consumidor (fusão e gravação no banco) por uma fila limitada.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .drive_service import DriveService, DEFAULT_FIELD_PROFILE
+from .request_executor import classify_error
+
+FOLDERS_PER_PARTITION = 40
+MAX_QUERY_LENGTH = 4000
+MAX_LISTING_WORKERS = 4
+PAGE_QUEUE_SIZE = 8
+MAX_PAGES_PER_PARTITION = 300
+MAX_CONSECUTIVE_ERRORS = 3
+MAX_EMPTY_PAGES = 3
+MAX_SAME_TOKEN = 5
+_PARTITION_DONE = object()
+
+
+class ListedPage(list):
+    """Página de arquivos com a partição de origem e o token da página seguinte (None no fim)."""
+
+    def __init__(self, files, partition=None, next_page_token=None):
+        super().__init__(files)
+        self.partition = partition
+        self.next_page_token = next_page_token
+
+    def derive(self, files):
+        return ListedPage(files, self.partition, self.next_page_token)
+
+
+def service_credentials(service):
+    return getattr(getattr(service, '_http', None), 'credentials', None)
+
+
+def build_thread_service(service):
+    credentials = service_credentials(service)
+    if credentials is None:
+        return service
+    from googleapiclient.discovery import build
+    return build('drive', 'v3', credentials=credentials, cache_discovery=False)
+
+
+def partition_folder_queries(folder_ids, chunk_size=FOLDERS_PER_PARTITION, max_length=MAX_QUERY_LENGTH):
+    """Divide as pastas em consultas com no máximo chunk_size pastas e max_length caracteres."""
+    prefix = "trashed = false and ("
+    queries = []
+    conditions = []
+    length = len(prefix) + 1
+    for folder_id in folder_ids:
+        condition = f"'{folder_id}' in parents"
+        if conditions and (len(conditions) >= chunk_size or length + len(condition) + 4 > max_length):
+            queries.append(f"{prefix}{' or '.join(conditions)})")
+            conditions = []
+            length = len(prefix) + 1
+        conditions.append(condition)
+        length += len(condition) + 4
+    if conditions:
+        queries.append(f"{prefix}{' or '.join(conditions)})")
+    return queries
+
+
+class ConcurrentLister:
+
+    def __init__(self, service, max_workers=MAX_LISTING_WORKERS, queue_size=PAGE_QUEUE_SIZE,
+                 service_factory=build_thread_service, fields_profile=DEFAULT_FIELD_PROFILE):
+        self.service = service
+        self.fields_profile = fields_profile
+        self.service_factory = service_factory
+        # Sem credenciais não há como criar um service por thread: lista em série.
+        if service_factory is build_thread_service and service_credentials(service) is None:
+            max_workers = 1
+        self.max_workers = max(1, max_workers)
+        self.queue_size = queue_size
+        self.stop_event = threading.Event()
+        self.complete = False
+        self.stats = {}
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+    def _drive_service(self):
+        drive_service = getattr(self._local, 'drive_service', None)
+        if drive_service is None:
+            drive_service = DriveService(self.service_factory(self.service))
+            self._local.drive_service = drive_service
+        return drive_service
+
+    def _put(self, pages, item):
+        while not self.stop_event.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _record(self, api_ms, files):
+        with self._stats_lock:
+            self.stats['pages'] = self.stats.get('pages', 0) + 1
+            self.stats['files'] = self.stats.get('files', 0) + files
+            self.stats['api_ms'] = self.stats.get('api_ms', 0.0) + api_ms
+
+    def _list_partition(self, index, partition, pages, page_size, page_token=None):
+        base_q, is_shared_drive_sync, shared_drive_id = partition
+        resume_token = page_token
+        last_page_token = None
+        same_token_count = 0
+        consecutive_errors = 0
+        empty_pages_count = 0
+
+        for page_count in range(1, MAX_PAGES_PER_PARTITION + 1):
+            if self.stop_event.is_set():
+                return False
+            if page_token is not None and page_token == last_page_token:
+                same_token_count += 1
+                logging.warning(
+                    f"⚠️ Token repetido #{same_token_count}: {page_token}")
+                if same_token_count >= MAX_SAME_TOKEN:
+                    logging.error(
+                        "🚨 Token repetido 5x - encerrando partição para evitar loop infinito!")
+                    return False
+            else:
+                same_token_count = 0
+            last_page_token = page_token
+
+            page_start_time = time.perf_counter()
+            try:
+                response = self._drive_service().list_files_paginated(
+                    base_q=base_q,
+                    is_shared_drive_sync=is_shared_drive_sync,
+                    shared_drive_id=shared_drive_id,
+                    page_token=page_token,
+                    page_size=page_size,
+                    fields_profile=self.fields_profile
+                )
+                consecutive_errors = 0
+            except Exception as api_error:
+                # O executor já repetiu os erros transitórios; aqui só resta esperar mais um pouco.
+                consecutive_errors += 1
+                logging.error(
+                    f"❌ Erro na API do Google Drive (página {page_count}, tentativa {consecutive_errors}): {api_error}")
+                retryable, _, retry_after = classify_error(api_error)
+                status = getattr(getattr(api_error, 'resp', None), 'status', None)
+                if resume_token and page_token == resume_token and status == 400:
+                    logging.warning(
+                        "⚠️ Token do checkpoint recusado, listando a partição desde o início")
+                    page_token = last_page_token = resume_token = None
+                    consecutive_errors = 0
+                    continue
+                if not retryable or consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+                    logging.error(
+                        "🚨 Erro definitivo ou muitos erros consecutivos na API, abortando partição")
+                    return False
+                executor = self._drive_service().executor
+                time.sleep(executor.backoff_delay(
+                    executor.max_retries + consecutive_errors, retry_after))
+                continue
+
+            files_page = response.get('files', [])
+            self._record((time.perf_counter() - page_start_time)
+                         * 1000, len(files_page))
+            page_token = response.get('nextPageToken', None)
+
+            if files_page:
+                empty_pages_count = 0
+                if not self._put(pages, ListedPage(files_page, index, page_token)):
+                    return False
+            else:
+                empty_pages_count += 1
+                if empty_pages_count >= MAX_EMPTY_PAGES:
+                    logging.info(
+                        "🔚 Muitas páginas vazias consecutivas - encerrando partição")
+                    return False
+
+            if not page_token:
+                return True
+
+        logging.warning(
+            f"⚠️ Partição atingiu o limite de {MAX_PAGES_PER_PARTITION} páginas")
+        return False
+
+    def _run_partition(self, index, partition, pages, page_size, page_token=None):
+        try:
+            complete = self._list_partition(
+                index, partition, pages, page_size, page_token)
+        except Exception as e:
+            logging.error(f"❌ Erro inesperado na listagem da partição: {e}")
+            complete = False
+        self._put(pages, (_PARTITION_DONE, complete))
+
+    def stop(self):
+        self.stop_event.set()
+
+    def stream(self, partitions, page_size=1000, resume_tokens=None):
+        """Gera as páginas (ListedPage) de todas as partições na ordem em que chegam.
+
+        resume_tokens mapeia o índice da partição para o token de onde retomar;
+        partições mapeadas para None já foram concluídas e são puladas.
+        """
+        self.stop_event.clear()
+        self.complete = True
+        resume_tokens = resume_tokens or {}
+        pending = [(index, partition) for index, partition in enumerate(partitions)
+                   if index not in resume_tokens or resume_tokens[index] is not None]
+        self.stats = {'partitions': len(pending), 'pages': 0,
+                      'files': 0, 'api_ms': 0.0}
+        if not pending:
+            return
+        start_time = time.perf_counter()
+        pages = queue.Queue(maxsize=self.queue_size)
+        workers = min(self.max_workers, len(pending))
+        executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix='drive-list')
+        for index, partition in pending:
+            executor.submit(self._run_partition, index, partition, pages,
+                            page_size, resume_tokens.get(index))
+
+        remaining = len(pending)
+        try:
+            while remaining:
+                try:
+                    item = pages.get(timeout=0.5)
+                except queue.Empty:
+                    if self.stop_event.is_set():
+                        break
+                    continue
+                if isinstance(item, tuple) and item[0] is _PARTITION_DONE:
+                    remaining -= 1
+                    self.complete = self.complete and item[1]
+                    continue
+                yield item
+        finally:
+            if remaining:
+                self.complete = False
+            self.stop_event.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            elapsed = time.perf_counter() - start_time
+            logging.info(
+                f"📡 Listagem: {self.stats['files']:,} arquivos em {self.stats['pages']} páginas, "
+                f"{len(pending)} partições, {workers} workers | {elapsed:.1f}s "
+                f"(API somada {self.stats['api_ms'] / 1000:.1f}s)")
@@ -7,19 +7,27 @@ exibição de status de sincronização e interação do usuário com recursos d
 """
 
 import os
+import logging
 from PyQt6.QtWidgets import (
     QWidget, QLabel, QVBoxLayout, QPushButton, QMessageBox, QDialog, QDialogButtonBox, QCheckBox, QFileDialog, QScrollArea, QHBoxLayout
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from src.database.database import FileIndexer
 from src.utils.utils import load_settings, save_settings
 from .drive_service import DriveService
+from .concurrent_listing import build_thread_service
+from .folder_cache import DriveFolderCache, FOLDER_CACHE_MAX_AGE
 
 
 class DriveFolderDialog(QDialog):
-    def __init__(self, service, parent=None):
+    def __init__(self, service, parent=None, db_name='data/file_index.db'):
         super().__init__(parent)
         self.service = service
+        self.db_name = db_name
         self.drive_service = DriveService(service)
+        self.folder_cache = DriveFolderCache(
+            FileIndexer.open_reader(db_name), self.drive_service)
+        self.refresh_worker = None
         self.setWindowTitle("Selecionar Pastas do Google Drive")
         self.setModal(True)
         self.setFixedSize(500, 400)
@@ -44,7 +52,8 @@ class DriveFolderDialog(QDialog):
         self.main_layout.addWidget(self.scroll_area)
 
         self.refresh_button = QPushButton("🔄 Atualizar Lista de Pastas")
-        self.refresh_button.clicked.connect(self._load_folders)
+        self.refresh_button.clicked.connect(
+            lambda: self._load_folders(force=True))
 
         buttons_layout = QHBoxLayout()
         buttons_layout.addWidget(
@@ -59,6 +68,7 @@ class DriveFolderDialog(QDialog):
 
         self.folders_data = {}
         self.checkboxes = {}
+        self.section_labels = []
 
         self._load_saved_settings()
         self._load_folders()
@@ -87,114 +97,162 @@ class DriveFolderDialog(QDialog):
             settings['drive_folders'] = selected_folders
         save_settings(settings)
 
-    def _load_folders(self):
+    def _load_folders(self, force=False):
         try:
-            self.refresh_button.setEnabled(False)
-            self.refresh_button.setText("⏳ Carregando...")
-            for checkbox in self.checkboxes.values():
-                checkbox.setParent(None)
-                checkbox.deleteLater()
-            self.checkboxes.clear()
-            self.folders_data.clear()
-
-            personal_folders = []
-            folders = self.drive_service.get_folders_in_drive()
-            for folder in folders:
-                folder_id = folder['id']
-                folder_name = folder['name']
-                self.folders_data[folder_id] = {
-                    'name': folder_name,
-                    'parents': folder.get('parents', []),
+            tree = self.folder_cache.picker_tree()
+        except Exception as e:
+            logging.warning(f"⚠️ Cache de pastas indisponível: {e}")
+            tree = None
+        if tree is not None:
+            self._render_folders(tree)
+        self._start_refresh(force)
+
+    def _start_refresh(self, force=False):
+        if self.refresh_worker is not None and self.refresh_worker.isRunning():
+            return
+        self.refresh_button.setEnabled(False)
+        self.refresh_button.setText("⏳ Carregando...")
+        worker = DriveFolderTreeWorker(
+            self.service, self.db_name, max_age=0 if force else FOLDER_CACHE_MAX_AGE)
+        worker.folders_refreshed.connect(self._on_folders_refreshed)
+        worker.refresh_failed.connect(self._on_refresh_failed)
+        worker.finished.connect(lambda: DriveFolderTreeWorker.active.discard(worker))
+        DriveFolderTreeWorker.active.add(worker)
+        self.refresh_worker = worker
+        worker.start()
+
+    def _finish_refresh(self):
+        self.refresh_button.setEnabled(True)
+        self.refresh_button.setText("🔄 Atualizar Lista de Pastas")
+
+    def _on_folders_refreshed(self):
+        self._finish_refresh()
+        try:
+            tree = self.folder_cache.picker_tree()
+        except Exception as e:
+            self._on_refresh_failed(str(e))
+            return
+        if tree is not None:
+            self._render_folders(tree)
+
+    def _on_refresh_failed(self, error_msg):
+        self._finish_refresh()
+        if self.checkboxes:
+            print(f"⚠️ Falha ao atualizar pastas, usando o cache: {error_msg}")
+        else:
+            QMessageBox.warning(
+                self, "Erro", f"Erro ao carregar pastas: {error_msg}")
+
+    def done(self, result):
+        if self.refresh_worker is not None:
+            try:
+                self.refresh_worker.folders_refreshed.disconnect(
+                    self._on_folders_refreshed)
+                self.refresh_worker.refresh_failed.disconnect(
+                    self._on_refresh_failed)
+            except TypeError:
+                pass
+        self.folder_cache.indexer.close()
+        super().done(result)
+
+    def _add_checkbox(self, folder_id, text, checked_folders):
+        checkbox = QCheckBox(text)
+        if folder_id in checked_folders:
+            checkbox.setChecked(True)
+        self.checkboxes[folder_id] = checkbox
+        self.checkboxes_layout.addWidget(checkbox)
+
+    def _add_label(self, text, style):
+        label = QLabel(text)
+        label.setStyleSheet(style)
+        self.section_labels.append(label)
+        self.checkboxes_layout.addWidget(label)
+
+    def _render_folders(self, tree):
+        if self.checkboxes:
+            checked_folders = {folder_id for folder_id, checkbox in self.checkboxes.items()
+                               if checkbox.isChecked()}
+        else:
+            checked_folders = set(load_settings().get('drive_folders', []))
+        for widget in list(self.checkboxes.values()) + self.section_labels:
+            widget.setParent(None)
+            widget.deleteLater()
+        self.checkboxes.clear()
+        self.section_labels.clear()
+        self.folders_data.clear()
+
+        for folder in tree['personal']:
+            self.folders_data[folder['id']] = {
+                'name': folder['name'],
+                'parents': [tree['root_id']],
+                'shared': False,
+                'is_shared_drive': False,
+                'shared_drive_name': ''
+            }
+        for drive in tree['shared_drives']:
+            self.folders_data[drive['id']] = {
+                'name': drive['name'],
+                'parents': [],
+                'shared': False,
+                'is_drive_root': True,
+                'shared_drive_name': drive['name']
+            }
+            for folder in drive['folders']:
+                self.folders_data[folder['id']] = {
+                    'name': folder['name'],
+                    'parents': [drive['id']],
                     'shared': False,
-                    'is_shared_drive': False,
-                    'shared_drive_name': ''
+                    'is_shared_drive': True,
+                    'shared_drive_name': drive['name']
                 }
-                personal_folders.append((folder_id, folder_name))
-            shared_drive_roots = []
-            shared_drive_folders = {}
-            try:
-                shared_drives = self.drive_service.get_shared_drives()
-                print(f"🔍 Encontrados {len(shared_drives)} Shared Drives")
-                for drive in shared_drives:
-                    drive_id = drive['id']
-                    drive_name = drive['name']
-                    shared_drive_roots.append((drive_id, drive_name))
-                    self.folders_data[drive_id] = {
-                        'name': drive_name,
-                        'parents': [],
-                        'shared': False,
-                        'is_drive_root': True,
-                        'shared_drive_name': drive_name
-                    }
-                    try:
-                        drive_folders = self.drive_service.get_folders_in_drive(
-                            drive_id, drive_id)
-                        for folder in drive_folders:
-                            folder_id = folder['id']
-                            folder_name = folder['name']
-                            self.folders_data[folder_id] = {
-                                'name': folder_name,
-                                'parents': folder.get('parents', []),
-                                'shared': False,
-                                'is_shared_drive': True,
-                                'shared_drive_name': drive_name
-                            }
-                            if drive_name not in shared_drive_folders:
-                                shared_drive_folders[drive_name] = []
-                            shared_drive_folders[drive_name].append(
-                                (folder_id, folder_name))
-                    except Exception as e:
-                        print(
-                            f"⚠️ Erro ao buscar pastas do Shared Drive '{drive_name}': {e}")
-            except Exception as e:
-                print(f"⚠️ Não foi possível listar Shared Drives: {e}")
-
-            if personal_folders:
-                personal_label = QLabel("📁 Driver pessoal:")
-                personal_label.setStyleSheet(
-                    "font-weight: bold; margin-top: 10px;")
-                self.checkboxes_layout.addWidget(personal_label)
-                mydrive_root_id = 'root'
-                checkbox_root = QCheckBox("  📂 Meu Drive (completo)")
-                saved_folders = load_settings().get('drive_folders', [])
-                if mydrive_root_id in saved_folders:
-                    checkbox_root.setChecked(True)
-                self.checkboxes[mydrive_root_id] = checkbox_root
-                self.checkboxes_layout.addWidget(checkbox_root)
-                for folder_id, folder_name in sorted(personal_folders, key=lambda x: x[1].lower()):
-                    checkbox = QCheckBox(f"  📂 {folder_name}")
-                    if folder_id in saved_folders:
-                        checkbox.setChecked(True)
-                    self.checkboxes[folder_id] = checkbox
-                    self.checkboxes_layout.addWidget(checkbox)
-
-            if shared_drive_roots:
-                team_drives_label = QLabel("🏢 Shared Drives (Equipes):")
-                team_drives_label.setStyleSheet(
-                    "font-weight: bold; margin-top: 10px; color: #1976D2;")
-                self.checkboxes_layout.addWidget(team_drives_label)
-                for drive_id, drive_name in sorted(shared_drive_roots, key=lambda x: x[1].lower()):
-                    checkbox = QCheckBox(f"  🏢 {drive_name} (Drive completo)")
-                    saved_folders = load_settings().get('drive_folders', [])
-                    if drive_id in saved_folders:
-                        checkbox.setChecked(True)
-                    self.checkboxes[drive_id] = checkbox
-                    self.checkboxes_layout.addWidget(checkbox)
-                    if drive_name in shared_drive_folders:
-                        drive_label = QLabel(f"  📂 Pastas em {drive_name}:")
-                        drive_label.setStyleSheet(
-                            "font-weight: bold; margin-left: 20px; margin-top: 5px; font-size: 11px;")
-                        self.checkboxes_layout.addWidget(drive_label)
-                        for folder_id, folder_name in sorted(shared_drive_folders[drive_name], key=lambda x: x[1].lower()):
-                            checkbox = QCheckBox(f"    📂 {folder_name}")
-                            if folder_id in saved_folders:
-                                checkbox.setChecked(True)
-                            self.checkboxes[folder_id] = checkbox
-                            self.checkboxes_layout.addWidget(checkbox)
-
-            self.refresh_button.setEnabled(True)
-            self.refresh_button.setText("🔄 Atualizar Lista de Pastas")
+
+        if tree['personal']:
+            self._add_label("📁 Driver pessoal:",
+                            "font-weight: bold; margin-top: 10px;")
+            self._add_checkbox(
+                'root', "  📂 Meu Drive (completo)", checked_folders)
+            for folder in tree['personal']:
+                self._add_checkbox(
+                    folder['id'], f"  📂 {folder['name']}", checked_folders)
+
+        if tree['shared_drives']:
+            print(f"🔍 Encontrados {len(tree['shared_drives'])} Shared Drives")
+            self._add_label("🏢 Shared Drives (Equipes):",
+                            "font-weight: bold; margin-top: 10px; color: #1976D2;")
+            for drive in sorted(tree['shared_drives'], key=lambda x: x['name'].lower()):
+                self._add_checkbox(
+                    drive['id'], f"  🏢 {drive['name']} (Drive completo)", checked_folders)
+                if drive['folders']:
+                    self._add_label(f"  📂 Pastas em {drive['name']}:",
+                                    "font-weight: bold; margin-left: 20px; margin-top: 5px; font-size: 11px;")
+                    for folder in drive['folders']:
+                        self._add_checkbox(
+                            folder['id'], f"    📂 {folder['name']}", checked_folders)
+
+
+class DriveFolderTreeWorker(QThread):
+    folders_refreshed = pyqtSignal()
+    refresh_failed = pyqtSignal(str)
+    # Mantém o worker vivo mesmo se o diálogo fechar antes do fim da revalidação.
+    active = set()
+
+    def __init__(self, service, db_name, max_age=FOLDER_CACHE_MAX_AGE):
+        super().__init__()
+        self.service = service
+        self.db_name = db_name
+        self.max_age = max_age
+
+    def run(self):
+        indexer = None
+        try:
+            indexer = FileIndexer(self.db_name)
+            drive_service = DriveService(build_thread_service(self.service))
+            DriveFolderCache(indexer, drive_service).refresh_picker(
+                self.max_age)
+            self.folders_refreshed.emit()
         except Exception as e:
-            QMessageBox.warning(self, "Erro", f"Erro ao carregar pastas: {e}")
-            self.refresh_button.setEnabled(True)
-            self.refresh_button.setText("🔄 Atualizar Lista de Pastas")
+            logging.error(f"❌ Erro ao atualizar o cache de pastas do Drive: {e}")
+            self.refresh_failed.emit(str(e))
+        finally:
+            if indexer is not None:
+                indexer.close()
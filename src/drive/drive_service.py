@@ -8,18 +8,44 @@ listagem e manipulação de arquivos e pastas no Google Drive.
 
 import logging
 import time
+from collections import deque
 from datetime import datetime
 
+from .request_executor import get_default_executor
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+FOLDER_FIELDS = "nextPageToken, files(id, name, parents, modifiedTime, driveId)"
+BATCH_REQUEST_LIMIT = 100
+# 'lean' deixa de fora links (thumbnailLink expira); a descrição fica porque alimenta a fusão e a busca.
+FILE_FIELD_PROFILES = {
+    'lean': "id, name, mimeType, description, parents, modifiedTime, createdTime, size, md5Checksum",
+    'full': "id, name, mimeType, description, parents, modifiedTime, createdTime, size, md5Checksum, webViewLink, thumbnailLink",
+}
+DEFAULT_FIELD_PROFILE = 'lean'
+HYDRATION_FIELDS = "id, thumbnailLink, webViewLink"
+PARENTS_PER_QUERY = 40
+
 
 class DriveService:
 
-    def __init__(self, service):
+    def __init__(self, service, executor=None):
         self.service = service
+        self.executor = executor or get_default_executor()
+
+    def _execute(self, request, endpoint):
+        return self.executor.execute(request, endpoint)
 
     def get_shared_drives(self):
         try:
-            drives_response = self.service.drives().list().execute()
-            shared_drives = drives_response.get('drives', [])
+            shared_drives = []
+            page_token = None
+            while True:
+                drives_response = self._execute(self.service.drives().list(
+                    pageSize=100, pageToken=page_token), 'drives.list')
+                shared_drives.extend(drives_response.get('drives', []))
+                page_token = drives_response.get('nextPageToken')
+                if not page_token:
+                    break
             logging.info(f"🏢 Encontrados {len(shared_drives)} Shared Drives")
             return shared_drives
         except Exception as e:
@@ -34,24 +60,24 @@ class DriveService:
             while True:
                 if drive_id and drive_id != 'root':
                     query = f"'{parent_folder}' in parents and mimeType='application/vnd.google-apps.folder' and trashed=false"
-                    response = self.service.files().list(
+                    response = self._execute(self.service.files().list(
                         q=query,
-                        fields="nextPageToken, files(id, name, parents)",
-                        pageSize=50,
+                        fields=FOLDER_FIELDS,
+                        pageSize=1000,
                         pageToken=page_token,
                         includeItemsFromAllDrives=True,
                         supportsAllDrives=True,
                         corpora='drive',
                         driveId=drive_id
-                    ).execute()
+                    ), 'files.list')
                 else:
                     query = "mimeType='application/vnd.google-apps.folder' and trashed=false and 'root' in parents"
-                    response = self.service.files().list(
+                    response = self._execute(self.service.files().list(
                         q=query,
-                        fields="nextPageToken, files(id, name, parents)",
-                        pageSize=100,
+                        fields=FOLDER_FIELDS,
+                        pageSize=1000,
                         pageToken=page_token
-                    ).execute()
+                    ), 'files.list')
 
                 page_folders = response.get('files', [])
                 folders.extend(page_folders)
@@ -68,140 +94,243 @@ class DriveService:
             logging.error(f"❌ Erro ao buscar pastas do drive {drive_id}: {e}")
             return []
 
-    def get_all_subfolders_recursive(self, folder_id, shared_drive_id=None):
+    def _files_list_request(self, query, shared_drive_id, fields, page_token=None, page_size=1000):
+        if shared_drive_id:
+            return self.service.files().list(
+                q=query,
+                fields=fields,
+                pageSize=page_size,
+                pageToken=page_token,
+                corpora='drive',
+                driveId=shared_drive_id,
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True
+            )
+        return self.service.files().list(
+            q=query,
+            fields=fields,
+            pageSize=page_size,
+            pageToken=page_token,
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True
+        )
+
+    def _execute_batch(self, requests, endpoint='files.list'):
+        results = {}
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        if not hasattr(self.service, 'new_batch_http_request'):
+            for index, request in enumerate(requests):
+                try:
+                    callback(index, self._execute(request, endpoint), None)
+                except Exception as e:
+                    callback(index, None, e)
+            return results
+
+        def run_batch():
+            results.clear()
+            batch = self.service.new_batch_http_request(callback=callback)
+            for index, request in enumerate(requests):
+                batch.add(request, request_id=str(index))
+            batch.execute()
+
+        # Cada chamada dentro do lote conta na cota do Drive.
+        self.executor.call(run_batch, 'batch', tokens=len(requests))
+        return results
+
+    def batch_list_pages(self, pending, shared_drive_id, fields):
+        """Executa as consultas de pending (deque de (chave, query)) em lotes de até 100 por ida ao servidor.
+
+        Segue nextPageToken e tenta de novo até 3 vezes as que falharem; gera (chave, files)
+        à medida que as respostas chegam. Quem consome pode acrescentar consultas em pending.
+        """
+        jobs = deque((key, query, None, 0) for key, query in pending)
+        pending.clear()
+        round_trips = 0
+        while jobs or pending:
+            while pending:
+                key, query = pending.popleft()
+                jobs.append((key, query, None, 0))
+            chunk = [jobs.popleft() for _ in range(min(BATCH_REQUEST_LIMIT, len(jobs)))]
+            results = self._execute_batch([
+                self._files_list_request(query, shared_drive_id, fields, page_token)
+                for _, query, page_token, _ in chunk])
+            round_trips += 1
+            retry_delay = None
+            for index, (key, query, page_token, attempts) in enumerate(chunk):
+                response, exception = results.get(index, (None, None))
+                if exception is not None or response is None:
+                    retryable, retry_after = (True, None) if exception is None else \
+                        self.executor.report_failure(exception, self.executor.endpoint('files.list'))
+                    if retryable and attempts < 3:
+                        jobs.append((key, query, page_token, attempts + 1))
+                        retry_delay = max(retry_delay or 0, self.executor.backoff_delay(
+                            attempts, retry_after))
+                    else:
+                        logging.error(
+                            f"❌ Consulta em lote falhou após {attempts + 1} tentativas: {exception}")
+                    continue
+                next_page_token = response.get('nextPageToken')
+                if next_page_token:
+                    jobs.append((key, query, next_page_token, 0))
+                yield key, response.get('files', [])
+            if retry_delay:
+                time.sleep(retry_delay)
+        logging.info(f"📦 {round_trips} requisições em lote ao Drive")
+
+    def get_all_subfolders_recursive(self, folder_id, shared_drive_id=None, folder_records=None):
         all_folders = [folder_id]
-        folders_to_check = [folder_id]
+        seen = {folder_id}
+        pending = deque([(folder_id, self._subfolders_query([folder_id]))])
 
         logging.info(f"🔍 Coletando subpastas recursivamente de {folder_id}")
 
-        while folders_to_check:
-            current_folder = folders_to_check.pop(0)
-
-            try:
-                query = f"'{current_folder}' in parents and mimeType = 'application/vnd.google-apps.folder' and trashed = false"
-
-                if shared_drive_id:
-                    response = self.service.files().list(
-                        q=query,
-                        fields="files(id, name)",
-                        pageSize=1000,
-                        corpora='drive',
-                        driveId=shared_drive_id,
-                        includeItemsFromAllDrives=True,
-                        supportsAllDrives=True
-                    ).execute()
-                else:
-                    response = self.service.files().list(
-                        q=query,
-                        fields="files(id, name)",
-                        pageSize=1000,
-                        includeItemsFromAllDrives=True,
-                        supportsAllDrives=True
-                    ).execute()
-
-                subfolders = response.get('files', [])
-                for subfolder in subfolders:
-                    subfolder_id = subfolder['id']
-                    if subfolder_id not in all_folders:
-                        all_folders.append(subfolder_id)
-                        folders_to_check.append(subfolder_id)
-                        logging.info(
-                            f"📁 Encontrada subpasta: {subfolder.get('name', 'sem nome')} ({subfolder_id})")
-
-            except Exception as e:
-                logging.error(
-                    f"❌ Erro buscando subpastas de {current_folder}: {e}")
-                continue
+        for _, subfolders in self.batch_list_pages(pending, shared_drive_id, FOLDER_FIELDS):
+            frontier = []
+            for subfolder in subfolders:
+                subfolder_id = subfolder['id']
+                if subfolder_id in seen:
+                    continue
+                seen.add(subfolder_id)
+                all_folders.append(subfolder_id)
+                frontier.append(subfolder_id)
+                if folder_records is not None:
+                    folder_records.append(subfolder)
+                logging.debug(
+                    f"📁 Encontrada subpasta: {subfolder.get('name', 'sem nome')} ({subfolder_id})")
+            for i in range(0, len(frontier), PARENTS_PER_QUERY):
+                parent_ids = frontier[i:i + PARENTS_PER_QUERY]
+                pending.append(
+                    (parent_ids[0], self._subfolders_query(parent_ids)))
 
         logging.info(
             f"✅ Total de {len(all_folders)} pastas encontradas (incluindo subpastas)")
         return all_folders
 
+    @staticmethod
+    def _subfolders_query(parent_ids):
+        parents = ' or '.join(
+            f"'{parent_id}' in parents" for parent_id in parent_ids)
+        return f"({parents}) and mimeType = '{FOLDER_MIME_TYPE}' and trashed = false"
+
+    def list_top_level_folders(self, parent_ids):
+        """Pastas diretamente sob cada id de parent_ids (Meu Drive e raízes de Shared Drives), em lote."""
+        pending = deque(
+            (parent_id, f"'{parent_id}' in parents and mimeType = '{FOLDER_MIME_TYPE}' and trashed = false")
+            for parent_id in parent_ids)
+        folders = {parent_id: [] for parent_id in parent_ids}
+        for parent_id, page in self.batch_list_pages(pending, None, FOLDER_FIELDS):
+            folders[parent_id].extend(page)
+        return folders
+
+    def list_folders_modified_since(self, modified_since, shared_drive_id=None):
+        query = f"mimeType = '{FOLDER_MIME_TYPE}' and modifiedTime > '{modified_since}'"
+        pending = deque([(None, query)])
+        folders = []
+        for _, page in self.batch_list_pages(pending, shared_drive_id, FOLDER_FIELDS.replace('modifiedTime', 'modifiedTime, trashed')):
+            folders.extend(page)
+        return folders
+
     def count_files_in_folders(self, folder_ids, shared_drive_id=None):
-        total_files = 0
         logging.info(f"🔢 Contando arquivos em {len(folder_ids)} pastas...")
+        counts = {}
+        pending = deque(
+            (folder_id, f"'{folder_id}' in parents and mimeType != '{FOLDER_MIME_TYPE}' and trashed = false")
+            for folder_id in folder_ids)
+        for folder_id, files_page in self.batch_list_pages(pending, shared_drive_id, "nextPageToken, files(id)"):
+            counts[folder_id] = counts.get(folder_id, 0) + len(files_page)
+
+        for folder_id, files_count in counts.items():
+            if files_count > 0:
+                logging.debug(f"📁 Pasta {folder_id}: {files_count} arquivos")
+        total_files = sum(counts.values())
+        logging.info(f"📊 Total de arquivos: {total_files}")
+        return total_files
 
-        for folder_id in folder_ids:
-            try:
-                query = f"'{folder_id}' in parents and mimeType != 'application/vnd.google-apps.folder' and trashed = false"
-
-                if shared_drive_id:
-                    response = self.service.files().list(
-                        q=query,
-                        fields="files(id)",
-                        pageSize=1000,
-                        corpora='drive',
-                        driveId=shared_drive_id,
-                        includeItemsFromAllDrives=True,
-                        supportsAllDrives=True
-                    ).execute()
-                else:
-                    response = self.service.files().list(
-                        q=query,
-                        fields="files(id)",
-                        pageSize=1000,
-                        includeItemsFromAllDrives=True,
-                        supportsAllDrives=True
-                    ).execute()
+    @staticmethod
+    def file_fields(profile=DEFAULT_FIELD_PROFILE):
+        return FILE_FIELD_PROFILES.get(profile, FILE_FIELD_PROFILES[DEFAULT_FIELD_PROFILE])
 
-                files_count = len(response.get('files', []))
-                total_files += files_count
+    def list_files_paginated(self, base_q, is_shared_drive_sync, shared_drive_id, page_token=None, page_size=1000, recursive_folders=None, fields_override=None, fields_profile=DEFAULT_FIELD_PROFILE):
+        try:
+            fields = fields_override or f"nextPageToken, files({self.file_fields(fields_profile)})"
 
-                if files_count > 0:
-                    logging.info(
-                        f"📁 Pasta {folder_id}: {files_count} arquivos")
+            response = self._execute(self._files_list_request(
+                base_q, shared_drive_id if is_shared_drive_sync else None,
+                fields, page_token, page_size), 'files.list')
 
-            except Exception as e:
-                logging.error(f"❌ Erro contando arquivos em {folder_id}: {e}")
-                continue
+            return response
 
-        logging.info(f"📊 Total de arquivos: {total_files}")
-        return total_files
+        except Exception as e:
+            logging.error(f"❌ Erro na API do Google Drive: {e}")
+            raise e
 
-    def list_files_paginated(self, base_q, is_shared_drive_sync, shared_drive_id, page_token=None, page_size=1000, recursive_folders=None, fields_override=None):
+    def get_start_page_token(self, shared_drive_id=None):
         try:
-            fields = fields_override or "nextPageToken, files(id, name, mimeType, description, parents, modifiedTime, createdTime, size, webViewLink, thumbnailLink)"
-
-            if is_shared_drive_sync:
-                response = self.service.files().list(
-                    q=base_q,
-                    fields=fields,
-                    pageSize=page_size,
-                    pageToken=page_token,
-                    corpora='drive',
+            if shared_drive_id:
+                response = self._execute(self.service.changes().getStartPageToken(
                     driveId=shared_drive_id,
-                    includeItemsFromAllDrives=True,
                     supportsAllDrives=True
-                ).execute()
-            elif recursive_folders:
-                response = self.service.files().list(
-                    q=base_q,
-                    fields=fields,
-                    pageSize=page_size,
-                    pageToken=page_token,
-                    includeItemsFromAllDrives=True,
-                    supportsAllDrives=True
-                ).execute()
+                ), 'changes.getStartPageToken')
             else:
-                response = self.service.files().list(
-                    q=base_q,
-                    fields=fields,
-                    pageSize=page_size,
-                    pageToken=page_token,
-                    includeItemsFromAllDrives=True,
+                response = self._execute(self.service.changes().getStartPageToken(
                     supportsAllDrives=True
-                ).execute()
-
-            return response
-
+                ), 'changes.getStartPageToken')
+            return response.get('startPageToken')
         except Exception as e:
-            logging.error(f"❌ Erro na API do Google Drive: {e}")
-            raise e
+            logging.error(f"❌ Erro ao obter startPageToken: {e}")
+            return None
+
+    def list_changes(self, page_token, shared_drive_id=None, page_size=1000, fields_profile=DEFAULT_FIELD_PROFILE):
+        fields = f"nextPageToken, newStartPageToken, changes(fileId, removed, file({self.file_fields(fields_profile)}, trashed, driveId))"
+        if shared_drive_id:
+            return self._execute(self.service.changes().list(
+                pageToken=page_token,
+                pageSize=page_size,
+                fields=fields,
+                driveId=shared_drive_id,
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True
+            ), 'changes.list')
+        return self._execute(self.service.changes().list(
+            pageToken=page_token,
+            pageSize=page_size,
+            fields=fields,
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True
+        ), 'changes.list')
+
+    def get_files_metadata(self, file_ids, fields=HYDRATION_FIELDS):
+        """files().get em lotes de até 100; devolve {file_id: metadados} dos que responderam."""
+        file_ids = list(dict.fromkeys(file_ids))
+        metadata = {}
+        for i in range(0, len(file_ids), BATCH_REQUEST_LIMIT):
+            chunk = file_ids[i:i + BATCH_REQUEST_LIMIT]
+            results = self._execute_batch([
+                self.service.files().get(fileId=file_id, fields=fields, supportsAllDrives=True)
+                for file_id in chunk], 'files.get')
+            for index, file_id in enumerate(chunk):
+                response, exception = results.get(index, (None, None))
+                if exception is not None or response is None:
+                    logging.warning(
+                        f"⚠️ Falha ao obter metadados de {file_id}: {exception}")
+                    continue
+                metadata[file_id] = response
+        return metadata
+
+    def get_root_folder_id(self):
+        try:
+            return self._execute(self.service.files().get(fileId='root', fields='id'), 'files.get').get('id')
+        except Exception as e:
+            logging.error(f"❌ Erro ao obter a pasta raiz do Drive: {e}")
+            return None
 
     def test_api_connection(self):
         try:
-            test_response = self.service.files().list(
-                q="trashed = false", pageSize=1).execute()
+            test_response = self._execute(self.service.files().list(
+                q="trashed = false", pageSize=1), 'files.list')
             test_files = test_response.get('files', [])
             logging.info(
                 f"✅ Teste API: {len(test_files)} arquivo(s) encontrado(s)")
@@ -7,14 +7,33 @@ atualizar metadados e garantir a consistência entre o armazenamento local e a n
 """
 
 import os
+import json
 import time
+import hashlib
 import logging
 from datetime import datetime
 from src.database.database import open_db_for_thread, FileIndexer
 from src.database.search import SearchEngine
-from PyQt6.QtCore import QObject, pyqtSignal, QCoreApplication
-from src.drive.match import find_local_matches
-from .drive_service import DriveService
+from PyQt6.QtCore import QObject, pyqtSignal
+from src.drive.match import find_local_matches_bulk, LocalMatchIndex, MatchKeyPool, PARALLEL_MATCH_MIN_ITEMS
+from .drive_service import DriveService, DEFAULT_FIELD_PROFILE
+from .concurrent_listing import ConcurrentLister, partition_folder_queries, MAX_LISTING_WORKERS
+from .pipeline import StagedPipeline
+from .folder_cache import DriveFolderCache
+from .fusion_telemetry import FusionTelemetry
+from src.services.hashing import HashService
+
+PERSIST_BATCH_ITEMS = 5000
+CHECKPOINT_MAX_AGE = 7 * 24 * 3600
+
+
+def parse_drive_time(value):
+    if not value:
+        return 0
+    try:
+        return int(datetime.fromisoformat(value.rstrip('Z')).timestamp())
+    except ValueError:
+        return int(datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%fZ").timestamp())
 
 
 class DriveSync(QObject):
@@ -26,15 +45,23 @@ class DriveSync(QObject):
     finished = pyqtSignal()
     metadata_fusion_completed = pyqtSignal(int)
 
-    def __init__(self, service, db_name='data/file_index.db', selected_folders=None):
+    def __init__(self, service, db_name='data/file_index.db', selected_folders=None, full_resync=False,
+                 fields_profile=DEFAULT_FIELD_PROFILE):
         super().__init__()
         self.service = service
         self.drive_service = DriveService(service)
         self.db_name = db_name
         self.is_running = True
         self.selected_folders = selected_folders
+        self.full_resync = full_resync
+        self.fields_profile = fields_profile
         self._sync_completed = False
         self._sync_failed = False
+        self.match_index = None
+        self.key_pool = None
+        self.hash_service = None
+        self.fusion_telemetry = None
+        self.matching_stats = {}
 
     def terminate(self):
         self.is_running = False
@@ -57,79 +84,87 @@ class DriveSync(QObject):
     def _get_all_subfolders_recursive(self, folder_id, shared_drive_id=None):
         if not self.is_running:
             return [folder_id]
-        return self.drive_service.get_all_subfolders_recursive(folder_id, shared_drive_id)
+        indexer = FileIndexer(self.db_name)
+        try:
+            return DriveFolderCache(indexer, self.drive_service).get_all_subfolders(
+                folder_id, shared_drive_id)
+        finally:
+            indexer.close()
 
-    def _count_total_files(self, base_q, is_shared_drive_sync, shared_drive_id, recursive_folders=None, specific_folder_filter=None):
-        if not self.is_running:
-            return 0
+    def _resolve_sync_scope(self):
+        is_shared_drive_sync = False
+        shared_drive_id = None
 
-        logging.info(
-            f"🔢 Delegando contagem para DriveService com query: {base_q}")
-        self.update_status.emit("Contando arquivos no Drive...")
+        recursive_folders = []
+        specific_folder_filter = None
 
-        try:
-            if recursive_folders and specific_folder_filter:
-                total = self.drive_service.count_files_in_folders(
-                    recursive_folders, shared_drive_id
-                )
+        if self.selected_folders and len(self.selected_folders) == 1:
+            folder_id = self.selected_folders[0]
+            if folder_id.startswith('0') and len(folder_id) > 15:
+                is_shared_drive_sync = True
+                shared_drive_id = folder_id
+                logging.info(
+                    f"🏢 Detectado Shared Drive raiz: {shared_drive_id}")
             else:
-                total = 0
-                page_token = None
-                max_pages = 200
-
-                for page_count in range(1, max_pages + 1):
-                    if not self.is_running:
+                logging.info(f"📁 Detectada pasta específica: {folder_id}")
+                from src.utils.utils import load_settings
+                settings = load_settings()
+                drive_folders = settings.get('drive_folders', [])
+                parent_shared_drive = None
+
+                for drive_folder in drive_folders:
+                    if drive_folder.startswith('0') and len(drive_folder) > 15:
+                        parent_shared_drive = drive_folder
                         break
 
-                    try:
-                        response = self.drive_service.list_files_paginated(
-                            base_q=base_q,
-                            is_shared_drive_sync=is_shared_drive_sync,
-                            shared_drive_id=shared_drive_id,
-                            page_token=page_token,
-                            page_size=1000,
-                            recursive_folders=recursive_folders,
-                            fields_override="nextPageToken, files(id, parents)" if specific_folder_filter else "nextPageToken, files(id)"
-                        )
-
-                        files_page = response.get('files', [])
-
-                        if specific_folder_filter and recursive_folders:
-                            filtered_files = []
-                            for file in files_page:
-                                file_parent = file.get('parents', [''])[
-                                    0] if file.get('parents') else ''
-                                if file_parent in recursive_folders:
-                                    filtered_files.append(file)
-                            files_page = filtered_files
-
-                        page_count_files = len(files_page)
-                        total += page_count_files
-
-                        if total % 5000 == 0 or page_count_files < 1000:
-                            status_msg = f"Contados {total:,} arquivos no Drive..."
-                            self.update_status.emit(status_msg)
-                            logging.info(f"📢 {status_msg}")
-
-                        page_token = response.get('nextPageToken', None)
-                        if not page_token or not files_page:
-                            break
-
-                    except Exception as e:
-                        logging.error(f"❌ Erro na página {page_count}: {e}")
-                        if page_count >= 5:  # Após 5 tentativas, para
-                            break
-                        time.sleep(2)
-
-            final_msg = f"Contagem finalizada: {total:,} arquivos"
-            self.update_status.emit(final_msg)
-            logging.info(f"✅ {final_msg}")
-            return total
+                if parent_shared_drive:
+                    is_shared_drive_sync = True
+                    shared_drive_id = parent_shared_drive
+                    specific_folder_filter = folder_id
+                    logging.info(
+                        f"🚀 Usando API eficiente do Shared Drive {parent_shared_drive}")
+                    logging.info(
+                        f"🎯 Filtrando por pasta específica: {folder_id}")
 
-        except Exception as e:
-            logging.error(f"❌ Erro na contagem: {e}")
-            self.update_status.emit("Erro na contagem de arquivos")
-            return 0
+                    recursive_folders = self._get_all_subfolders_recursive(
+                        folder_id, parent_shared_drive)
+                    logging.info(
+                        f"📁 Encontradas {len(recursive_folders)} pastas para filtro")
+                else:
+                    logging.warning(
+                        "⚠️ Shared Drive pai não encontrado, usando método manual")
+                    recursive_folders = self._get_all_subfolders_recursive(
+                        folder_id, None)
+                    logging.info(
+                        f"📁 Encontradas {len(recursive_folders)} pastas para sincronização recursiva")
+
+        if is_shared_drive_sync:
+            base_q = "trashed = false"
+            logging.info(f"🔍 Query da API (Shared Drive): {base_q}")
+            logging.info(
+                f"🏢 Usando corpora='drive', driveId='{shared_drive_id}'")
+        elif recursive_folders:
+            # As condições por pasta são montadas em blocos pelo planejador de listagem.
+            base_q = "trashed = false"
+            logging.info(
+                f"🔍 Query recursiva para {len(recursive_folders)} pastas")
+        else:
+            base_q = "(trashed = false) or (sharedWithMe = true and trashed = false)"
+            if self.selected_folders:
+                conditions = []
+                for folder_id in self.selected_folders:
+                    if folder_id == 'root':
+                        conditions.append("'root' in parents")
+                    elif any(c.isalpha() for c in folder_id[:10]):
+                        conditions.append(f"driveId = '{folder_id}'")
+                    else:
+                        conditions.append(f"'{folder_id}' in parents")
+                base_q += f" and ({' or '.join(conditions)})"
+                logging.info(
+                    f"📁 Filtrando por pastas específicas: {self.selected_folders}")
+            logging.info(f"🔍 Query da API: {base_q}")
+
+        return base_q, is_shared_drive_sync, shared_drive_id, recursive_folders, specific_folder_filter
 
     def run(self):
         try:
@@ -155,93 +190,10 @@ class DriveSync(QObject):
             self.sync_failed.emit(error_msg)
             return
 
-        matching_stats = {
-            'total_matches': 0,
-            'exact_matches': 0,
-            'normalized_matches': 0,
-            'aggressive_matches': 0,
-            'similarity_matches': 0,
-            'no_matches': 0,
-            'total_matching_time': 0
-        }
+        self.fusion_telemetry = FusionTelemetry()
 
         try:
-
-            page_token = None
-
-            is_shared_drive_sync = False
-            shared_drive_id = None
-
-            recursive_folders = []
-            specific_folder_filter = None
-
-            if self.selected_folders and len(self.selected_folders) == 1:
-                folder_id = self.selected_folders[0]
-                if folder_id.startswith('0') and len(folder_id) > 15:
-                    is_shared_drive_sync = True
-                    shared_drive_id = folder_id
-                    logging.info(
-                        f"🏢 Detectado Shared Drive raiz: {shared_drive_id}")
-                else:
-                    logging.info(f"📁 Detectada pasta específica: {folder_id}")
-                    from src.utils.utils import load_settings
-                    settings = load_settings()
-                    drive_folders = settings.get('drive_folders', [])
-                    parent_shared_drive = None
-
-                    for drive_folder in drive_folders:
-                        if drive_folder.startswith('0') and len(drive_folder) > 15:
-                            parent_shared_drive = drive_folder
-                            break
-
-                    if parent_shared_drive:
-                        is_shared_drive_sync = True
-                        shared_drive_id = parent_shared_drive
-                        specific_folder_filter = folder_id
-                        logging.info(
-                            f"🚀 Usando API eficiente do Shared Drive {parent_shared_drive}")
-                        logging.info(
-                            f"🎯 Filtrando por pasta específica: {folder_id}")
-
-                        recursive_folders = self._get_all_subfolders_recursive(
-                            folder_id, parent_shared_drive)
-                        logging.info(
-                            f"📁 Encontradas {len(recursive_folders)} pastas para filtro")
-                    else:
-                        logging.warning(
-                            "⚠️ Shared Drive pai não encontrado, usando método manual")
-                        recursive_folders = self._get_all_subfolders_recursive(
-                            folder_id, None)
-                        logging.info(
-                            f"📁 Encontradas {len(recursive_folders)} pastas para sincronização recursiva")
-
-            if is_shared_drive_sync:
-                base_q = "trashed = false"
-                logging.info(f"🔍 Query da API (Shared Drive): {base_q}")
-                logging.info(
-                    f"🏢 Usando corpora='drive', driveId='{shared_drive_id}'")
-            elif recursive_folders:
-                base_q = "trashed = false"
-                conditions = [
-                    f"'{folder_id}' in parents" for folder_id in recursive_folders]
-                base_q += f" and ({' or '.join(conditions)})"
-                logging.info(
-                    f"🔍 Query recursiva para {len(recursive_folders)} pastas: {base_q[:200]}...")
-            else:
-                base_q = "(trashed = false) or (sharedWithMe = true and trashed = false)"
-                if self.selected_folders:
-                    conditions = []
-                    for folder_id in self.selected_folders:
-                        if folder_id == 'root':
-                            conditions.append("'root' in parents")
-                        elif any(c.isalpha() for c in folder_id[:10]):
-                            conditions.append(f"driveId = '{folder_id}'")
-                        else:
-                            conditions.append(f"'{folder_id}' in parents")
-                    base_q += f" and ({' or '.join(conditions)})"
-                    logging.info(
-                        f"📁 Filtrando por pastas específicas: {self.selected_folders}")
-                logging.info(f"🔍 Query da API: {base_q}")
+            base_q, is_shared_drive_sync, shared_drive_id, recursive_folders, specific_folder_filter = self._resolve_sync_scope()
             logging.info(f"🔐 Service disponível: {self.service is not None}")
 
             try:
@@ -251,41 +203,58 @@ class DriveSync(QObject):
             except Exception as test_e:
                 logging.error(f"❌ Erro no teste da API: {test_e}")
                 raise test_e
-            logging.info("🔢 Iniciando contagem de arquivos no Drive...")
-            try:
-                total_files_in_drive = self._count_total_files(
-                    base_q, is_shared_drive_sync, shared_drive_id, recursive_folders, specific_folder_filter)
-                logging.info(
-                    f"✅ Contagem concluída: {total_files_in_drive:,} arquivos")
-            except Exception as count_error:
-                logging.error(f"❌ Erro na contagem: {count_error}")
-                total_files_in_drive = 0
+
+            indexer = FileIndexer(self.db_name)
+            self.match_index = None
+            changes_key = self._scope_state_key(
+                'drive_changes_token', shared_drive_id)
+            fusion_key = self._scope_state_key(
+                'drive_fusion_generation', shared_drive_id)
+            local_generation = indexer.get_local_generation()
+            saved_changes_token = None if self.full_resync else indexer.get_state(
+                changes_key)
+            if saved_changes_token:
+                incremental_result = self._run_incremental_sync(
+                    indexer, saved_changes_token, changes_key, shared_drive_id,
+                    self._changes_scope_filter(is_shared_drive_sync, recursive_folders))
+                if incremental_result is not None:
+                    if self.is_running:
+                        total_files_processed, fusion_count = incremental_result
+                        fusion_count += self._fuse_new_local_files(
+                            indexer, fusion_key)
+                        self._complete_sync(
+                            indexer, total_files_processed, fusion_count)
+                    return
+                logging.warning(
+                    "⚠️ Token de alterações inválido ou expirado - executando sincronização COMPLETA")
+
+            start_page_token = self.drive_service.get_start_page_token(
+                shared_drive_id)
+            count_key = self._scope_state_key(
+                'drive_sync_count', shared_drive_id)
+            total_files_in_drive = self._estimate_total_files(
+                indexer, count_key)
 
             if not self.is_running:
-                logging.info("🛑 Cancelado durante contagem")
+                logging.info("🛑 Cancelado antes da listagem")
                 self._emit_finish_signal(
-                    success=False, error_msg="Cancelado durante contagem")
+                    success=False, error_msg="Cancelado antes da listagem")
                 return
 
             self.total_files_found.emit(total_files_in_drive)
             logging.info(
-                f"📊 Total de arquivos no Drive: {total_files_in_drive:,}")
+                f"📊 Estimativa de arquivos no Drive: {total_files_in_drive:,}")
 
             logging.info("🔄 Iniciando loop de busca de arquivos...")
             page_count = 0
             total_files_processed = 0
             fusion_count = 0
-            max_pages = 300
-            consecutive_errors = 0
-            max_consecutive_errors = 10
-
-            indexer = FileIndexer(self.db_name)
 
             if total_files_in_drive > 0:
                 self.progress_update.emit(
-                    0, f"Processando {total_files_in_drive:,} arquivos do Drive...")
+                    0, f"Processando ~{total_files_in_drive:,} arquivos do Drive...")
             else:
-                logging.warning("⚠️ Contagem falhou, usando modo estimativa")
+                logging.info("ℹ️ Sem sincronização anterior, progresso estimado durante a listagem")
                 self.progress_update.emit(
                     0, "Processando arquivos do Drive (modo estimativa)...")
 
@@ -294,177 +263,121 @@ class DriveSync(QObject):
             logging.info(
                 f"🔄 [FUSÃO] Iniciando processo de fusão otimizado com índices")
 
-            empty_pages_count = 0
-            max_empty_pages = 3
-            same_token_count = 0
-            last_page_token = None
-
-            while (self.is_running and
-                   page_count < max_pages and
-                   consecutive_errors < max_consecutive_errors and
-                   empty_pages_count < max_empty_pages and
-                   same_token_count < 5):
-
-                page_count += 1
-                page_start_time = time.perf_counter()
-
-                if page_token == last_page_token and page_token is not None:
-                    same_token_count += 1
-                    logging.warning(
-                        f"⚠️ Token repetido #{same_token_count}: {page_token}")
-                    if same_token_count >= 5:
-                        logging.error(
-                            "🚨 Token repetido 5x - FORÇANDO SAÍDA para evitar loop infinito!")
+            partitions, parent_filter = self._plan_listing(
+                indexer, base_q, is_shared_drive_sync, shared_drive_id, recursive_folders,
+                specific_folder_filter, total_files_in_drive, PAGE_SIZE)
+            seen_ids = set() if len(partitions) > 1 else None
+
+            checkpoint_signature = self._checkpoint_signature(
+                partitions, parent_filter, PAGE_SIZE)
+            saved_checkpoints = indexer.get_sync_checkpoints(
+                checkpoint_signature, CHECKPOINT_MAX_AGE)
+            checkpoints = {partition: [page_token, completed, files, fusions]
+                           for partition, (page_token, completed, files, fusions, _) in saved_checkpoints.items()}
+            resume_tokens = {partition: None if completed else page_token
+                             for partition, (page_token, completed, _, _) in checkpoints.items()}
+            if checkpoints:
+                total_files_processed = sum(
+                    checkpoint[2] for checkpoint in checkpoints.values())
+                fusion_count = sum(checkpoint[3]
+                                   for checkpoint in checkpoints.values())
+                start_page_token = next(iter(saved_checkpoints.values()))[
+                    4] or start_page_token
+                logging.info(
+                    f"⏯️ Retomando sincronização interrompida: {len(checkpoints)}/{len(partitions)} partições com progresso, "
+                    f"{total_files_processed:,} arquivos já gravados")
+                self.progress_update.emit(
+                    0, f"Retomando a partir de {total_files_processed:,} arquivos já processados...")
+
+            def write_checkpoints():
+                if checkpoints:
+                    indexer.save_sync_checkpoints(
+                        checkpoint_signature, checkpoints, start_page_token)
+
+            lister = ConcurrentLister(
+                self.service, fields_profile=self.fields_profile)
+            match_reader = FileIndexer.open_reader(self.db_name)
+            match_hashes = HashService(match_reader.conn, persist=False)
+            pipeline = StagedPipeline(
+                lister.stream(partitions, PAGE_SIZE, resume_tokens),
+                [('transform', lambda files_page: files_page.derive(
+                    self._transform_page(files_page, parent_filter, seen_ids))),
+                 ('match', lambda page_items: self._match_page(page_items, match_reader, match_hashes))],
+                on_stop=lister.stop)
+            persist_metrics = pipeline.stage('persist')
+            pending_saves = []
+            unflushed_items = 0
+            try:
+                for page_items, match_result, hash_rows in pipeline:
+                    if not self.is_running:
                         break
-                else:
-                    same_token_count = 0
-
-                last_page_token = page_token
-
-                if page_count % 10 == 1:
+                    page_count += 1
+                    with pipeline.timed(persist_metrics, len(page_items)):
+                        page_fusions = self._persist_page(
+                            page_items, match_result, hash_rows, indexer, pending_saves)
+                        fusion_count += page_fusions
+                        checkpoint = checkpoints.setdefault(
+                            page_items.partition, [None, False, 0, 0])
+                        checkpoint[0] = page_items.next_page_token
+                        checkpoint[1] = page_items.next_page_token is None
+                        checkpoint[2] += len(page_items)
+                        checkpoint[3] += page_fusions
+                        unflushed_items += len(page_items)
+                        if unflushed_items >= PERSIST_BATCH_ITEMS:
+                            self._flush_drive_saves(
+                                pending_saves, indexer, write_checkpoints)
+                            unflushed_items = 0
+                    total_files_processed += len(page_items)
+
+                    if total_files_processed >= total_files_in_drive:
+                        total_files_in_drive = total_files_processed + PAGE_SIZE
+                    status_msg = f"Processados {total_files_processed:,}/~{total_files_in_drive:,} arquivos | Fusionados: {fusion_count:,}"
+                    self.update_status.emit(status_msg)
+                    self.progress_update.emit(
+                        min(90, int(90 * total_files_processed / total_files_in_drive)), status_msg)
+
+                with pipeline.timed(persist_metrics, 0):
+                    self._flush_drive_saves(
+                        pending_saves, indexer, write_checkpoints)
+            finally:
+                match_hashes.shutdown()
+                match_reader.close()
+            logging.info(f"⏱️ [PIPELINE] {pipeline.summary()}")
+            logging.info(f"📡 [API] {self.drive_service.executor.summary()}")
+
+            listing_complete = lister.complete and self.is_running
+            if listing_complete:
+                logging.info("🔚 Fim de todas as páginas.")
+
+            if listing_complete and self.is_running:
+                indexer.set_state(
+                    count_key, total_files_processed, commit=False)
+                indexer.clear_sync_checkpoints(
+                    checkpoint_signature, commit=False)
+                if start_page_token:
+                    indexer.set_state(
+                        changes_key, start_page_token, commit=False)
                     logging.info(
-                        f"🔄 Buscando página {page_count}, page_token: {page_token}")
-
-                try:
-                    response = self.drive_service.list_files_paginated(
-                        base_q=base_q,
-                        is_shared_drive_sync=is_shared_drive_sync,
-                        shared_drive_id=shared_drive_id,
-                        page_token=page_token,
-                        page_size=PAGE_SIZE,
-                        recursive_folders=recursive_folders
-                    )
-                    consecutive_errors = 0
-                except Exception as api_error:
-                    consecutive_errors += 1
-                    logging.error(
-                        f"❌ Erro na API do Google Drive (página {page_count}, tentativa {consecutive_errors}): {api_error}")
-                    if consecutive_errors >= max_consecutive_errors:
-                        logging.error(
-                            "🚨 Muitos erros consecutivos na API, abortando sincronização")
-                        break
-                    time.sleep(min(consecutive_errors * 2, 10))
-                    continue
-
-                files_page = response.get('files', [])
-                api_time = (time.perf_counter() - page_start_time) * 1000
-                if page_count % 10 == 1:
-                    logging.info(
-                        f"📄 [PÁGINA {page_count}] {len(files_page)} arquivos | API: {api_time:.1f}ms")
-
-                if not files_page:
-                    empty_pages_count += 1
-                    logging.info(
-                        f"📭 Página vazia #{empty_pages_count}/{max_empty_pages}")
-                    if empty_pages_count >= max_empty_pages:
-                        logging.info(
-                            "🔚 Muitas páginas vazias consecutivas - FINALIZANDO para evitar loop")
-                        break
-                else:
-                    empty_pages_count = 0
-
-                processed_items_page = []
-                for idx, file in enumerate(files_page):
-                    if specific_folder_filter and recursive_folders:
-                        file_parent = file.get('parents', [''])[
-                            0] if file.get('parents') else ''
-
-                        selected_folder_ids = [
-                            f for f in self.selected_folders if f != 'root']
-                        if selected_folder_ids and 'root' not in self.selected_folders:
-                            if file_parent not in recursive_folders:
-                                continue
-
-                    item = {
-                        'id': file.get('id'),
-                        'name': file.get('name'),
-                        'mimeType': file.get('mimeType'),
-                        'source': 'drive',
-                        'description': file.get('description', ''),
-                        'thumbnailLink': file.get('thumbnailLink', ''),
-                        'thumbnailPath': '',
-                        'size': int(file.get('size', 0)) if file.get('size') else 0,
-                        'modifiedTime': int(datetime.strptime(file.get('modifiedTime'), "%Y-%m-%dT%H:%M:%S.%fZ").timestamp()) if file.get('modifiedTime') else 0,
-                        'createdTime': int(datetime.strptime(file.get('createdTime'), "%Y-%m-%dT%H:%M:%S.%fZ").timestamp()) if file.get('createdTime') else 0,
-                        'parentId': file.get('parents', [''])[0] if file.get('parents') else '',
-                        'path': None,
-                        'webContentLink': file.get('webViewLink', ''),
-                    }
-                    processed_items_page.append(item)
-                    if (idx + 1) % 100 == 0 or (idx + 1) == len(files_page):
-                        current_processed = total_files_processed + idx + 1
-                        if total_files_in_drive > 0:
-                            percent = min(
-                                70, int(70 * current_processed / total_files_in_drive))
-                        else:
-                            percent = min(
-                                70, int(70 * current_processed / max(1, 100000)))
-                        self.progress_update.emit(
-                            percent, f"Processando {current_processed:,}/{total_files_in_drive:,} arquivos...")
-                        QCoreApplication.processEvents()
-
-                if processed_items_page:
-                    page_fusion_start = time.perf_counter()
-                    page_fusion_count, matched_drive_ids = self.fuse_page_data(
-                        processed_items_page, indexer)
-                    fusion_count += page_fusion_count
-                    page_fusion_time = (
-                        time.perf_counter() - page_fusion_start) * 1000
-
-                    unfused_items = [
-                        item for item in processed_items_page if item['id'] not in matched_drive_ids]
-                    if unfused_items:
-                        indexer.save_files_in_batch(
-                            unfused_items, source='drive')
-
-                    total_files_processed += len(processed_items_page)
-                    indexer.conn.commit()
-
-                    if page_count % 10 == 1:
-                        logging.info(
-                            f"🔗 Página {page_count}: {page_fusion_count} fusões em {page_fusion_time:.1f}ms")
-
-                status_msg = f"Processados {total_files_processed:,} arquivos | Fusionados: {fusion_count:,}"
-                self.update_status.emit(status_msg)
-                progress_percent = min(
-                    90, int(70 + (20 * total_files_processed / max(total_files_in_drive, 1))))
-                self.progress_update.emit(progress_percent, status_msg)
-
-                page_token = response.get('nextPageToken', None)
-                if not page_token:
-                    if page_count % 10 == 1:
-                        logging.info("🔚 Fim de todas as páginas.")
-                    break
-
-                QCoreApplication.processEvents()
-
-            self.update_status.emit("Finalizando sincronização...")
-            self.progress_update.emit(
-                95, f"Finalização: {fusion_count:,} fusões realizadas")
-
-            logging.info(
-                f"🧹 Limpeza final: {fusion_count:,} fusões de metadados concluídas")
-
-            self.metadata_fusion_completed.emit(fusion_count)
+                        "💾 Token de alterações salvo para a próxima sincronização incremental")
+                indexer.set_state(fusion_key, local_generation, commit=False)
+                indexer.conn.commit()
+            elif checkpoints:
+                logging.info(
+                    "⏸️ Listagem incompleta: progresso salvo para retomar na próxima sincronização")
 
-            logging.info(
-                f"✅ Sincronização concluída. Total processado: {total_files_processed}, Total fusionado: {fusion_count}")
-            self.update_status.emit(
-                f"Sincronização concluída: {total_files_processed} arquivos. Fusionados: {fusion_count}.")
-            self.progress_update.emit(100, "Sincronização concluída.")
-            self._emit_finish_signal(success=True)
-            if indexer:
-                try:
-                    indexer.close()
-                except Exception:
-                    pass
-            self.finished.emit()
+            self._complete_sync(indexer, total_files_processed, fusion_count)
 
         except Exception as e:
             self._emit_finish_signal(
                 success=False, error_msg=f"Erro na sincronização do Drive: {e}")
             logging.error(f"Erro detalhado: {e}", exc_info=True)
         finally:
+            if self.key_pool is not None:
+                self.key_pool.shutdown()
+                self.key_pool = None
+            if self.hash_service is not None:
+                self.hash_service.shutdown()
+                self.hash_service = None
             if not self._sync_completed and not self._sync_failed:
                 if self.is_running:
                     logging.info("✅ FINALLY: Finalizando normalmente")
@@ -474,41 +387,416 @@ class DriveSync(QObject):
                     self._emit_finish_signal(
                         success=False, error_msg="Cancelado pelo usuário")
 
-    def fuse_page_data(self, page_items, indexer):
-        fusion_count = 0
-        matched_drive_ids = []
+    def _complete_sync(self, indexer, total_files_processed, fusion_count):
+        self.update_status.emit("Finalizando sincronização...")
+        self.progress_update.emit(
+            95, f"Finalização: {fusion_count:,} fusões realizadas")
+
+        logging.info(
+            f"🧹 Limpeza final: {fusion_count:,} fusões de metadados concluídas")
+
+        self._finish_fusion_telemetry(indexer)
+        self.metadata_fusion_completed.emit(fusion_count)
 
-        valid_items = [
-            item for item in page_items
-            if item.get('size', 0) > 0 and
-            (item.get('description') or item.get(
-                'thumbnailLink') or item.get('webContentLink'))
-        ]
+        logging.info(
+            f"✅ Sincronização concluída. Total processado: {total_files_processed}, Total fusionado: {fusion_count}")
+        self.update_status.emit(
+            f"Sincronização concluída: {total_files_processed} arquivos. Fusionados: {fusion_count}.")
+        self.progress_update.emit(100, "Sincronização concluída.")
+        self._emit_finish_signal(success=True)
+        if indexer:
+            try:
+                indexer.close()
+            except Exception:
+                pass
+        self.finished.emit()
+
+    @staticmethod
+    def _drive_file_to_item(file):
+        return {
+            'id': file.get('id'),
+            'name': file.get('name'),
+            'mimeType': file.get('mimeType'),
+            'source': 'drive',
+            'description': file.get('description', ''),
+            # Sem os links na listagem (perfil enxuto) ficam None e são hidratados sob demanda.
+            'thumbnailLink': file.get('thumbnailLink'),
+            'thumbnailPath': '',
+            'size': int(file.get('size', 0)) if file.get('size') else 0,
+            'modifiedTime': parse_drive_time(file.get('modifiedTime')),
+            'createdTime': parse_drive_time(file.get('createdTime')),
+            'parentId': file.get('parents', [''])[0] if file.get('parents') else '',
+            'path': None,
+            'webContentLink': file.get('webViewLink'),
+            'md5Checksum': file.get('md5Checksum', ''),
+        }
 
+    def _parent_filter(self, specific_folder_filter, recursive_folders):
+        if not (specific_folder_filter and recursive_folders and self.selected_folders):
+            return None
+        if 'root' in self.selected_folders or not any(f != 'root' for f in self.selected_folders):
+            return None
+        return set(recursive_folders)
+
+    def _transform_page(self, files_page, parent_filter, seen_ids=None):
+        if parent_filter is not None:
+            files_page = [file for file in files_page
+                          if any(parent in parent_filter for parent in file.get('parents') or [])]
+        if seen_ids is not None:
+            # Um arquivo com vários pais pode aparecer em mais de uma partição.
+            unique_files = []
+            for file in files_page:
+                if file['id'] not in seen_ids:
+                    seen_ids.add(file['id'])
+                    unique_files.append(file)
+            files_page = unique_files
+        return [self._drive_file_to_item(file) for file in files_page]
+
+    def _match_page(self, page_items, match_reader, match_hashes):
+        """Etapa só de leitura: os hashes calculados voltam junto para a gravação no escritor."""
+        valid_items = [item for item in page_items if self._is_fusable(item)]
         if not valid_items:
-            return 0, []
+            return page_items, None, []
+        match_result = self._match_pending(valid_items, match_reader, match_hashes)
+        return page_items, match_result, match_hashes.pop_pending()
+
+    def _persist_page(self, page_items, match_result, hash_rows, indexer, pending_saves):
+        fusion_count = 0
+        matched_drive_ids = set()
+        if hash_rows:
+            self._writer_hash_service(indexer).save_rows(hash_rows)
+        if match_result:
+            pending_items, matches, matched_ids, local_generation, _, events = match_result
+            if pending_items:
+                fusion_count = self._apply_fusions(
+                    pending_items, matches, matched_ids, local_generation, indexer, events)
+            matched_drive_ids = set(matched_ids)
+        pending_saves.extend(
+            item for item in page_items if item['id'] not in matched_drive_ids)
+        return fusion_count
+
+    @staticmethod
+    def _flush_drive_saves(pending_saves, indexer, write_checkpoints=None):
+        # O checkpoint é gravado antes: save_files_in_batch faz o commit (with self.conn) da
+        # transação inteira, então ele entra ou sai junto com os dados das páginas que cobre.
+        if write_checkpoints:
+            write_checkpoints()
+        if pending_saves:
+            indexer.save_files_in_batch(pending_saves, source='drive')
+            pending_saves.clear()
+        indexer.conn.commit()
+
+    @staticmethod
+    def _checkpoint_signature(partitions, parent_filter, page_size):
+        signature = json.dumps([partitions, sorted(parent_filter or []), page_size])
+        return hashlib.md5(signature.encode('utf-8')).hexdigest()
+
+    def _store_drive_page(self, page_items, indexer):
+        page_fusion_count, matched_drive_ids = self.fuse_page_data(
+            page_items, indexer)
+        matched_drive_ids = set(matched_drive_ids)
+        unfused_items = [
+            item for item in page_items if item['id'] not in matched_drive_ids]
+        if unfused_items:
+            indexer.save_files_in_batch(unfused_items, source='drive')
+        return page_fusion_count
+
+    def _plan_listing(self, indexer, base_q, is_shared_drive_sync, shared_drive_id, recursive_folders,
+                      specific_folder_filter, scope_estimate, page_size):
+        """Escolhe entre blocos de pastas em paralelo e a listagem do acervo inteiro com filtro local."""
+        parent_filter = self._parent_filter(
+            specific_folder_filter, recursive_folders)
+        if not recursive_folders:
+            return [(base_q, is_shared_drive_sync, shared_drive_id)], parent_filter
+
+        queries = partition_folder_queries(recursive_folders)
+        chunked_pages = max(len(queries), -(-scope_estimate // page_size))
+        chunked_rounds = -(-chunked_pages // MAX_LISTING_WORKERS)
+
+        corpus_key = self._scope_state_key(
+            'drive_sync_count', shared_drive_id,
+            [shared_drive_id] if shared_drive_id else [])
+        corpus_estimate = int(indexer.get_state(corpus_key, 0) or 0)
+        corpus_pages = -(-corpus_estimate // page_size)
+
+        if corpus_estimate and corpus_pages < chunked_rounds:
+            logging.info(
+                f"🧭 Plano de listagem: acervo inteiro (~{corpus_pages} páginas) com filtro local de "
+                f"{len(recursive_folders)} pastas, em vez de {len(queries)} blocos (~{chunked_rounds} rodadas)")
+            return ([("trashed = false", is_shared_drive_sync, shared_drive_id)],
+                    set(recursive_folders))
+
+        logging.info(
+            f"🧭 Plano de listagem: {len(recursive_folders)} pastas em {len(queries)} blocos paralelos")
+        return ([(query, is_shared_drive_sync, shared_drive_id) for query in queries],
+                parent_filter)
+
+    def _scope_state_key(self, prefix, shared_drive_id, folders=None):
+        if folders is None:
+            folders = self.selected_folders
+        scope = ','.join(sorted(folders or []))
+        scope_hash = hashlib.md5(scope.encode('utf-8')).hexdigest()[:12]
+        return f"{prefix}:{shared_drive_id or 'user'}:{scope_hash}"
+
+    @staticmethod
+    def _estimate_total_files(indexer, count_key):
+        previous_count = int(indexer.get_state(count_key, 0) or 0)
+        if previous_count:
+            return previous_count
+        try:
+            indexer.cursor.execute(
+                "SELECT (SELECT COUNT(*) FROM files WHERE source = 'drive') + (SELECT COUNT(*) FROM fusion_state WHERE local_id IS NOT NULL)")
+            return indexer.cursor.fetchone()[0]
+        except Exception as e:
+            logging.warning(f"⚠️ Falha ao estimar arquivos do Drive: {e}")
+            return 0
 
-        for drive_item in valid_items:
+    def _changes_scope_filter(self, is_shared_drive_sync, recursive_folders):
+        if recursive_folders:
+            return set(recursive_folders), set(), True
+        if is_shared_drive_sync or not self.selected_folders:
+            return None
+        parent_ids = set()
+        drive_ids = set()
+        for folder_id in self.selected_folders:
+            if folder_id == 'root':
+                root_id = self.drive_service.get_root_folder_id()
+                if root_id:
+                    parent_ids.add(root_id)
+            elif any(c.isalpha() for c in folder_id[:10]):
+                drive_ids.add(folder_id)
+            else:
+                parent_ids.add(folder_id)
+        return parent_ids, drive_ids, False
+
+    @staticmethod
+    def _in_changes_scope(file, scope_filter):
+        if scope_filter is None:
+            return True
+        parent_ids, drive_ids, recursive = scope_filter
+        if file.get('driveId') in drive_ids:
+            return True
+        if not any(parent in parent_ids for parent in file.get('parents', [])):
+            return False
+        if recursive and file.get('mimeType') == 'application/vnd.google-apps.folder':
+            parent_ids.add(file.get('id'))
+        return True
+
+    @staticmethod
+    def _is_invalid_token_error(error):
+        status = getattr(getattr(error, 'resp', None), 'status', None)
+        return status in (400, 404, 410)
+
+    def _run_incremental_sync(self, indexer, page_token, changes_key, shared_drive_id, scope_filter):
+        logging.info(
+            "⚡ [DRIVE SYNC] Sincronização INCREMENTAL via Changes API")
+        status_msg = "Buscando alterações no Drive..."
+        self.update_status.emit(status_msg)
+        self.progress_update.emit(0, status_msg)
+
+        start_time = time.perf_counter()
+        page_count = 0
+        total_files_processed = 0
+        total_removed = 0
+        fusion_count = 0
+        while self.is_running:
+            page_count += 1
             try:
-                matches = find_local_matches(drive_item, indexer.cursor)
-                if matches:
-                    for local_id in matches:
-                        indexer.update_description(
-                            local_id,
-                            drive_item.get('description', ''),
-                            drive_item.get('thumbnailLink', ''),
-                            drive_item.get('webContentLink', ''),
-                            commit=False,
-                        )
-                        fusion_count += 1
-                    matched_drive_ids.append(drive_item['id'])
+                response = self.drive_service.list_changes(
+                    page_token, shared_drive_id, fields_profile=self.fields_profile)
+            except Exception as e:
+                if self._is_invalid_token_error(e):
+                    logging.warning(
+                        f"⚠️ Changes API recusou o token salvo: {e}")
+                    indexer.set_state(changes_key, None)
+                    return None
+                raise
+
+            changed_items = []
+            removed_ids = []
+            for change in response.get('changes', []):
+                file = change.get('file') or {}
+                file_id = change.get('fileId') or file.get('id')
+                if change.get('removed') or file.get('trashed') or not self._in_changes_scope(file, scope_filter):
+                    removed_ids.append(file_id)
+                    continue
+                changed_items.append(self._drive_file_to_item(file))
+
+            if changed_items:
+                fusion_count += self._store_drive_page(changed_items, indexer)
+            indexer.delete_files(removed_ids, source='drive', commit=False)
+            total_files_processed += len(changed_items)
+            total_removed += len(removed_ids)
+
+            page_token = response.get('nextPageToken')
+            next_token = page_token or response.get('newStartPageToken')
+            if next_token:
+                indexer.set_state(changes_key, next_token, commit=False)
+            indexer.conn.commit()
+
+            status_msg = f"Alterações aplicadas: {total_files_processed:,} atualizados, {total_removed:,} removidos"
+            self.update_status.emit(status_msg)
+            self.progress_update.emit(min(90, page_count * 10), status_msg)
+            if not page_token:
+                break
+
+        logging.info(
+            f"⚡ Sincronização incremental: {page_count} páginas, {total_files_processed:,} atualizados, "
+            f"{total_removed:,} removidos, {fusion_count:,} fusões em {time.perf_counter() - start_time:.1f}s")
+        return total_files_processed, fusion_count
+
+    def _writer_hash_service(self, indexer):
+        if self.hash_service is None or self.hash_service.conn is not indexer.conn:
+            if self.hash_service is not None:
+                self.hash_service.shutdown()
+            self.hash_service = HashService(indexer.conn)
+        return self.hash_service
+
+    def _match_drive_items(self, drive_items, indexer, hash_service=None):
+        if self.match_index is None:
+            try:
+                self.match_index = LocalMatchIndex.build(indexer.cursor) or False
             except Exception as e:
                 logging.warning(
-                    f"⚠️ Fusão falhou para {drive_item.get('name', 'unknown')}: {str(e)[:100]}")
+                    f"⚠️ Falha ao montar índice de matching em memória: {e}")
+                self.match_index = False
+        if self.match_index:
+            if self.key_pool is None:
+                self.key_pool = MatchKeyPool()
+            return self.match_index.match_many(
+                drive_items, indexer.cursor, self.key_pool, hash_service)
+        return find_local_matches_bulk(drive_items, indexer.cursor, hash_service)
+
+    @staticmethod
+    def _fusion_input_hash(drive_item):
+        fusion_input = '\x00'.join(str(drive_item.get(key) or '') for key in (
+            'name', 'size', 'description', 'md5Checksum'))
+        return hashlib.md5(fusion_input.encode('utf-8')).hexdigest()
+
+    def _split_unchanged_fusions(self, drive_items, indexer):
+        local_generation = indexer.get_local_generation()
+        states = indexer.get_fusion_states(item['id'] for item in drive_items)
+        pending_items = []
+        unchanged_matched_ids = []
+        for drive_item in drive_items:
+            state = states.get(drive_item['id'])
+            if (state and state[1] == (drive_item.get('modifiedTime') or 0)
+                    and state[2] == self._fusion_input_hash(drive_item)
+                    and state[3] == local_generation):
+                if state[0]:
+                    unchanged_matched_ids.append(drive_item['id'])
                 continue
+            pending_items.append(drive_item)
+        return pending_items, unchanged_matched_ids, local_generation
 
+    def _finish_fusion_telemetry(self, indexer):
+        if self.fusion_telemetry is None:
+            return
+        self.matching_stats = self.fusion_telemetry.matching_stats()
+        logging.info(self.fusion_telemetry.summary())
+        try:
+            FusionTelemetry.prune_events(indexer.cursor)
+            indexer.conn.commit()
+        except Exception as e:
+            logging.warning(f"⚠️ Falha ao gravar eventos de fusão: {e}")
+
+    def _match_pending(self, drive_items, indexer, hash_service=None):
+        pending_items, matched_drive_ids, local_generation = self._split_unchanged_fusions(
+            drive_items, indexer)
+        skipped = len(drive_items) - len(pending_items)
+        if not pending_items:
+            return [], {}, matched_drive_ids, local_generation, skipped, []
+
+        if self.fusion_telemetry is None:
+            self.fusion_telemetry = FusionTelemetry()
+        matching_start = time.perf_counter()
+        try:
+            matches = self._match_drive_items(pending_items, indexer, hash_service)
+        except Exception as e:
+            logging.warning(f"⚠️ Matching em lote falhou: {str(e)[:100]}")
+            return [], {}, matched_drive_ids, local_generation, skipped, []
+        # Os eventos seguem com o resultado: a etapa de matching roda páginas à frente da gravação.
+        events = self.fusion_telemetry.record_page(
+            pending_items, matches, (time.perf_counter() - matching_start) * 1000,
+            skipped=skipped)
+        return pending_items, matches, matched_drive_ids, local_generation, skipped, events
+
+    def _apply_fusions(self, pending_items, matches, matched_drive_ids, local_generation, indexer,
+                       events=()):
+        first_new_match = len(matched_drive_ids)
+        description_rows = []
+        state_rows = []
+        for drive_item in pending_items:
+            match = matches.get(drive_item['id'])
+            local_id = match[0] if match else None
+            if local_id:
+                description_rows.append((
+                    local_id,
+                    drive_item.get('description', ''),
+                    drive_item.get('thumbnailLink', ''),
+                    drive_item.get('webContentLink', ''),
+                ))
+                matched_drive_ids.append(drive_item['id'])
+            state_rows.append((
+                drive_item['id'],
+                local_id,
+                drive_item.get('modifiedTime') or 0,
+                self._fusion_input_hash(drive_item),
+                local_generation,
+            ))
+        try:
+            indexer.update_descriptions(description_rows)
+        except Exception as e:
+            logging.warning(
+                f"⚠️ Fusão em lote falhou para {len(description_rows)} itens: {str(e)[:100]}")
+            del matched_drive_ids[first_new_match:]
+            return 0
+        indexer.save_fusion_states(state_rows)
+        FusionTelemetry.write_events(indexer.cursor, events)
+        return len(description_rows)
+
+    def _fuse_items(self, drive_items, indexer):
+        pending_items, matches, matched_drive_ids, local_generation, skipped, events = self._match_pending(
+            drive_items, indexer, self._writer_hash_service(indexer))
+        fusion_count = 0
+        if pending_items:
+            fusion_count = self._apply_fusions(
+                pending_items, matches, matched_drive_ids, local_generation, indexer, events)
+        return fusion_count, matched_drive_ids, skipped
+
+    @staticmethod
+    def _is_fusable(item):
+        if item.get('size', 0) <= 0:
+            return False
+        # No perfil enxuto o link não vem na listagem (None), mas existe e é hidratado depois.
+        return item.get('webContentLink') is None or bool(
+            item.get('description') or item.get('thumbnailLink') or item.get('webContentLink'))
+
+    def fuse_page_data(self, page_items, indexer):
+        valid_items = [item for item in page_items if self._is_fusable(item)]
+
+        if not valid_items:
+            return 0, []
+
+        fusion_count, matched_drive_ids, skipped = self._fuse_items(
+            valid_items, indexer)
+        if skipped:
+            logging.debug(
+                f"⏭️ {skipped}/{len(valid_items)} itens sem alterações desde a última fusão")
         return fusion_count, matched_drive_ids
 
+    def _fuse_new_local_files(self, indexer, fusion_key):
+        """Refaz a fusão das linhas do Drive quando uma varredura local rodou desde a última fusão."""
+        local_generation = indexer.get_local_generation()
+        if int(indexer.get_state(fusion_key, -1)) == local_generation:
+            return 0
+        logging.info(
+            "🔁 Arquivos locais mudaram desde a última fusão - fundindo de novo as linhas do Drive")
+        fusion_count = self.fuse_all_data(indexer)
+        if self.is_running:
+            indexer.set_state(fusion_key, local_generation)
+        return fusion_count
+
     def fuse_all_data(self, indexer, batch_size=1000):
         cursor = indexer.cursor
         try:
@@ -516,49 +804,50 @@ class DriveSync(QObject):
             total_drive = cursor.fetchone()[0]
         except Exception:
             total_drive = 0
+        if total_drive >= PARALLEL_MATCH_MIN_ITEMS * 4:
+            batch_size = max(batch_size, PARALLEL_MATCH_MIN_ITEMS * 4)
 
         processed = 0
         total_fusions = 0
+        total_skipped = 0
         matched_to_delete = []
 
-        offset = 0
-        while True:
+        last_file_id = ''
+        while self.is_running:
             cursor.execute(
                 """
-                SELECT file_id, name, size, description, thumbnailLink, webContentLink
-                FROM files WHERE source='drive' LIMIT ? OFFSET ?
+                SELECT file_id, name, size, description, thumbnailLink, webContentLink, md5Checksum, modifiedTime
+                FROM files WHERE source='drive' AND file_id > ?
+                ORDER BY file_id LIMIT ?
                 """,
-                (batch_size, offset)
+                (last_file_id, batch_size)
             )
             rows = cursor.fetchall()
             if not rows:
                 break
+            last_file_id = rows[-1][0]
 
-            for file_id, name, size, description, thumbnailLink, webContentLink in rows:
-                drive_item = {
+            drive_items = [
+                {
                     'id': file_id,
                     'name': name or '',
                     'size': size or 0,
                     'description': description or '',
-                    'thumbnailLink': thumbnailLink or '',
-                    'webContentLink': webContentLink or ''
+                    # None mantém os links já gravados na linha local (perfil enxuto).
+                    'thumbnailLink': thumbnailLink,
+                    'webContentLink': webContentLink,
+                    'md5Checksum': md5Checksum or '',
+                    'modifiedTime': modifiedTime or 0
                 }
-                matches = find_local_matches(drive_item, cursor)
-                if matches:
-                    for local_id in matches:
-                        try:
-                            indexer.update_description(
-                                local_id,
-                                drive_item['description'],
-                                drive_item.get('thumbnailLink'),
-                                drive_item.get('webContentLink'),
-                                commit=False,
-                            )
-                            total_fusions += 1
-                        except Exception as e:
-                            logging.error(
-                                f"❌ Erro ao fusionar metadados (ID local: {local_id}) a partir do Drive {file_id}: {e}")
-                    matched_to_delete.append(file_id)
+                for file_id, name, size, description, thumbnailLink, webContentLink, md5Checksum, modifiedTime in rows
+            ]
+            drive_items = [
+                item for item in drive_items if self._is_fusable(item)]
+            fusions, matched_drive_ids, skipped = self._fuse_items(
+                drive_items, indexer)
+            total_fusions += fusions
+            total_skipped += skipped
+            matched_to_delete.extend(matched_drive_ids)
 
             processed += len(rows)
             indexer.conn.commit()
@@ -567,13 +856,13 @@ class DriveSync(QObject):
                 self.progress_update.emit(
                     pct, f"Fusão em andamento... {processed}/{total_drive}")
 
-            offset += batch_size
-
         if matched_to_delete:
             self.delete_in_batches(cursor, 'files', matched_to_delete)
             self.delete_in_batches(cursor, 'search_index', matched_to_delete)
             indexer.conn.commit()
 
+        logging.info(
+            f"🔗 Fusão completa: {total_fusions} fusões, {total_skipped}/{processed} itens sem alterações")
         return total_fusions
 
     def delete_in_batches(self, cursor, table, id_list, batch_size=500):
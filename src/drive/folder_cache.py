@@ -0,0 +1,174 @@
+"""
+Módulo folder_cache
+
+Este módulo guarda no banco (tabela drive_folders) a árvore de pastas do Google Drive
+descoberta pelo VoxImago.MB. A descoberta completa só roda quando o cache não existe
+ou passou de FOLDER_CACHE_MAX_AGE. Fora isso, uma única consulta busca as pastas com
+modifiedTime posterior ao último visto (novas, renomeadas, movidas ou enviadas para a
+lixeira) e aplica a diferença. As subpastas saem de uma CTE recursiva local.
+O diálogo de seleção de pastas lê o mesmo cache (picker_tree) e o revalida em segundo plano.
+"""
+
+import json
+import logging
+import time
+
+FOLDER_CACHE_MAX_AGE = 24 * 3600
+PICKER_CACHE_KEY = 'picker'
+ROOT_FOLDER_STATE = 'drive_root_folder_id'
+SHARED_DRIVES_STATE = 'drive_shared_drives'
+
+
+class DriveFolderCache:
+
+    def __init__(self, indexer, drive_service):
+        self.indexer = indexer
+        self.drive_service = drive_service
+
+    @staticmethod
+    def _synced_key(root_id):
+        return f"drive_folders_synced_at:{root_id}"
+
+    @staticmethod
+    def _cursor_key(root_id):
+        return f"drive_folders_cursor:{root_id}"
+
+    def _upsert(self, records, drive_id):
+        rows = []
+        removed = []
+        now = int(time.time())
+        for record in records:
+            if record.get('trashed'):
+                removed.append((record['id'],))
+                continue
+            parents = record.get('parents') or ['']
+            rows.append((record['id'], record.get('name', ''), parents[0],
+                         record.get('driveId') or drive_id, record.get('modifiedTime', ''), now))
+        cursor = self.indexer.cursor
+        if rows:
+            cursor.executemany('''
+                INSERT OR REPLACE INTO drive_folders (folder_id, name, parent_id, drive_id, modified_time, synced_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+        if removed:
+            cursor.executemany(
+                "DELETE FROM drive_folders WHERE folder_id = ?", removed)
+        return max((row[4] for row in rows), default='')
+
+    def _save_state(self, root_id, latest_modified):
+        previous = self.indexer.get_state(self._cursor_key(root_id)) or ''
+        self.indexer.set_state(self._cursor_key(
+            root_id), max(previous, latest_modified), commit=False)
+        self.indexer.set_state(self._synced_key(
+            root_id), int(time.time()), commit=False)
+        self.indexer.conn.commit()
+
+    def subfolders(self, root_id):
+        self.indexer.cursor.execute('''
+            WITH RECURSIVE tree(folder_id) AS (
+                SELECT ?
+                UNION
+                SELECT f.folder_id FROM drive_folders f JOIN tree t ON f.parent_id = t.folder_id
+            )
+            SELECT folder_id FROM tree
+        ''', (root_id,))
+        return [row[0] for row in self.indexer.cursor.fetchall()]
+
+    def children(self, parent_id):
+        self.indexer.cursor.execute(
+            "SELECT folder_id, name FROM drive_folders WHERE parent_id = ? ORDER BY name COLLATE NOCASE",
+            (parent_id,))
+        return [{'id': folder_id, 'name': name} for folder_id, name in self.indexer.cursor.fetchall()]
+
+    def is_cached(self, root_id, max_age=FOLDER_CACHE_MAX_AGE):
+        synced_at = int(self.indexer.get_state(self._synced_key(root_id), 0) or 0)
+        return synced_at > 0 and time.time() - synced_at < max_age
+
+    def refresh_changed(self, root_id, shared_drive_id=None):
+        modified_since = self.indexer.get_state(self._cursor_key(root_id))
+        if not modified_since:
+            return False
+        changed = self.drive_service.list_folders_modified_since(
+            modified_since, shared_drive_id)
+        latest_modified = self._upsert(changed, shared_drive_id)
+        self._save_state(root_id, latest_modified)
+        if changed:
+            logging.info(
+                f"📁 Cache de pastas: {len(changed)} pastas alteradas desde {modified_since}")
+        return True
+
+    def discover(self, root_id, shared_drive_id=None):
+        # Pastas criadas durante a descoberta entram na próxima revalidação.
+        started_at = time.strftime(
+            '%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(time.time() - 300))
+        records = []
+        folders = self.drive_service.get_all_subfolders_recursive(
+            root_id, shared_drive_id, folder_records=records)
+        self.indexer.cursor.execute(
+            "DELETE FROM drive_folders WHERE folder_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(self.subfolders(root_id)[1:]),))
+        latest_modified = self._upsert(records, shared_drive_id)
+        self._save_state(root_id, max(latest_modified, started_at))
+        return folders
+
+    def picker_tree(self):
+        """Árvore do diálogo (Meu Drive e Shared Drives com as pastas de primeiro nível) ou None sem cache."""
+        root_id = self.indexer.get_state(ROOT_FOLDER_STATE)
+        shared_drives = self.indexer.get_state(SHARED_DRIVES_STATE)
+        if not root_id or shared_drives is None:
+            return None
+        return {
+            'root_id': root_id,
+            'personal': self.children(root_id),
+            'shared_drives': [dict(drive, folders=self.children(drive['id']))
+                              for drive in json.loads(shared_drives)],
+        }
+
+    def refresh_picker(self, max_age=FOLDER_CACHE_MAX_AGE):
+        """Revalida o cache do diálogo: diferença por modifiedTime ou nova leitura do primeiro nível."""
+        shared_drives = [{'id': drive['id'], 'name': drive['name']}
+                         for drive in self.drive_service.get_shared_drives()]
+        self.indexer.set_state(
+            SHARED_DRIVES_STATE, json.dumps(shared_drives), commit=False)
+        if self.is_cached(PICKER_CACHE_KEY, max_age) and self.indexer.get_state(ROOT_FOLDER_STATE):
+            try:
+                if self.refresh_changed(PICKER_CACHE_KEY):
+                    return
+            except Exception as e:
+                logging.warning(
+                    f"⚠️ Falha ao revalidar pastas do diálogo, relendo o primeiro nível: {e}")
+
+        root_id = self.drive_service.get_root_folder_id()
+        if not root_id:
+            raise RuntimeError("Não foi possível obter a pasta raiz do Drive")
+        started_at = time.strftime(
+            '%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(time.time() - 300))
+        top_level = self.drive_service.list_top_level_folders(
+            ['root'] + [drive['id'] for drive in shared_drives])
+        parents = {'root': root_id}
+        records = []
+        for parent_id, folders in top_level.items():
+            parent_id = parents.get(parent_id, parent_id)
+            self.indexer.cursor.execute(
+                "DELETE FROM drive_folders WHERE parent_id = ? AND folder_id NOT IN (SELECT value FROM json_each(?))",
+                (parent_id, json.dumps([folder['id'] for folder in folders])))
+            records.extend(folders)
+        self.indexer.set_state(ROOT_FOLDER_STATE, root_id, commit=False)
+        latest_modified = self._upsert(records, None)
+        self._save_state(PICKER_CACHE_KEY, max(latest_modified, started_at))
+        logging.info(
+            f"📁 Cache do diálogo atualizado: {len(records)} pastas em {len(top_level)} drives")
+
+    def get_all_subfolders(self, root_id, shared_drive_id=None, max_age=FOLDER_CACHE_MAX_AGE):
+        """Pasta raiz e todas as subpastas, do cache quando possível."""
+        if self.is_cached(root_id, max_age):
+            try:
+                if self.refresh_changed(root_id, shared_drive_id):
+                    folders = self.subfolders(root_id)
+                    logging.info(
+                        f"📁 {len(folders)} pastas lidas do cache (pasta {root_id})")
+                    return folders
+            except Exception as e:
+                logging.warning(
+                    f"⚠️ Falha ao revalidar cache de pastas, refazendo a descoberta: {e}")
+        return self.discover(root_id, shared_drive_id)
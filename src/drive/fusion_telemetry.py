@@ -0,0 +1,99 @@
+"""
+Módulo fusion_telemetry
+
+Este módulo coleta a telemetria da fusão entre arquivos do Drive e arquivos locais no
+VoxImago.MB: contadores por fase de matching, histograma da latência por página e uma
+amostra dos eventos de fusão gravada na tabela fusion_events para consulta posterior.
+Substitui o log por arquivo, que sozinho pesava no tempo da sincronização.
+"""
+
+import time
+import zlib
+
+MATCH_PHASES = ('exact', 'normalized', 'aggressive', 'prefix')
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+MAX_FUSION_EVENTS = 50000
+
+
+class FusionTelemetry:
+
+    def __init__(self, sample_rate=0.05):
+        self.sample_rate = sample_rate
+        self.phase_counts = {phase: 0 for phase in MATCH_PHASES}
+        self.no_matches = 0
+        self.skipped_unchanged = 0
+        self.pages = 0
+        self.items = 0
+        self.matching_ms = 0.0
+        self.page_histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def _sampled(self, drive_id):
+        return (zlib.crc32(drive_id.encode('utf-8')) % 10000) < self.sample_rate * 10000
+
+    def record_page(self, drive_items, matches, matching_ms, skipped=0):
+        """Atualiza os contadores e devolve os eventos amostrados da página, gravados junto com ela."""
+        self.pages += 1
+        self.items += len(drive_items) + skipped
+        self.skipped_unchanged += skipped
+        self.matching_ms += matching_ms
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS_MS) and matching_ms > LATENCY_BUCKETS_MS[bucket]:
+            bucket += 1
+        self.page_histogram[bucket] += 1
+
+        item_ms = matching_ms / len(drive_items) if drive_items else 0.0
+        now = int(time.time())
+        events = []
+        for drive_item in drive_items:
+            drive_id = drive_item['id']
+            match = matches.get(drive_id)
+            if match:
+                local_id, phase = match
+                self.phase_counts[phase] = self.phase_counts.get(phase, 0) + 1
+            else:
+                local_id, phase = None, 'no_match'
+                self.no_matches += 1
+            if self._sampled(drive_id):
+                events.append(
+                    (drive_id, local_id, phase, round(item_ms, 4), now))
+        return events
+
+    @staticmethod
+    def write_events(cursor, events):
+        if not events:
+            return
+        cursor.executemany(
+            "INSERT INTO fusion_events (drive_id, local_id, phase, ms, created_at) VALUES (?, ?, ?, ?, ?)",
+            events)
+
+    @staticmethod
+    def prune_events(cursor, keep=MAX_FUSION_EVENTS):
+        cursor.execute(
+            "DELETE FROM fusion_events WHERE event_id <= (SELECT MAX(event_id) FROM fusion_events) - ?", (keep,))
+
+    def matching_stats(self):
+        total_matches = sum(self.phase_counts.values())
+        return {
+            'total_matches': total_matches,
+            'exact_matches': self.phase_counts.get('exact', 0),
+            'normalized_matches': self.phase_counts.get('normalized', 0),
+            'aggressive_matches': self.phase_counts.get('aggressive', 0),
+            'prefix_matches': self.phase_counts.get('prefix', 0),
+            'no_matches': self.no_matches,
+            'skipped_unchanged': self.skipped_unchanged,
+            'total_matching_time': round(self.matching_ms, 1),
+        }
+
+    def histogram(self):
+        labels = [f"<={limit}ms" for limit in LATENCY_BUCKETS_MS] + \
+            [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {label: count for label, count in zip(labels, self.page_histogram) if count}
+
+    def summary(self):
+        stats = self.matching_stats()
+        return (
+            f"📈 [FUSÃO] {self.items:,} itens em {self.pages} páginas | "
+            f"exato {stats['exact_matches']:,}, normalizado {stats['normalized_matches']:,}, "
+            f"agressivo {stats['aggressive_matches']:,}, prefixo {stats['prefix_matches']:,}, "
+            f"sem match {stats['no_matches']:,}, sem alterações {stats['skipped_unchanged']:,} | "
+            f"matching {stats['total_matching_time']:.0f}ms | páginas {self.histogram()}")
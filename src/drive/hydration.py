@@ -0,0 +1,105 @@
+"""
+Módulo hydration
+
+Este módulo completa sob demanda os metadados do Google Drive que a listagem enxuta
+do VoxImago.MB não traz (thumbnailLink e webViewLink). Quando um item é selecionado,
+os ids do Drive correspondentes (o próprio arquivo ou, para arquivos locais fundidos,
+o arquivo do Drive registrado em fusion_state) são consultados com files().get em lote
+e os links são gravados no banco, tanto na linha do Drive quanto na linha local fundida.
+O thumbnailLink do Drive expira, então links hidratados há mais de THUMBNAIL_LINK_MAX_AGE
+segundos são buscados de novo.
+"""
+
+import json
+import logging
+import time
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from src.database.database import FileIndexer
+from .drive_service import DriveService
+from .concurrent_listing import build_thread_service
+
+
+THUMBNAIL_LINK_MAX_AGE = 3600
+
+
+def needs_hydration(file_item, indexer):
+    """Itens com arquivo no Drive (locais só se fundidos) cujos links nunca foram hidratados ou venceram."""
+    if not file_item or file_item.get('source') not in ('drive', 'local'):
+        return False
+    if file_item.get('source') == 'local' and not indexer.get_fused_drive_id(file_item.get('id')):
+        return False
+    hydrated_at = indexer.get_links_hydrated_at(file_item.get('id'))
+    return hydrated_at is None or time.time() - hydrated_at > THUMBNAIL_LINK_MAX_AGE
+
+
+class DriveMetadataHydrator:
+
+    def __init__(self, indexer, drive_service):
+        self.indexer = indexer
+        self.drive_service = drive_service
+
+    def _drive_ids(self, file_items):
+        """Mapeia id do Drive -> ids das linhas que recebem os links."""
+        targets = {}
+        local_ids = []
+        for item in file_items:
+            if item.get('source') == 'drive':
+                targets.setdefault(item['id'], []).append(item['id'])
+            else:
+                local_ids.append(item['id'])
+        if local_ids:
+            self.indexer.cursor.execute(
+                "SELECT drive_id, local_id FROM fusion_state WHERE local_id IN (SELECT value FROM json_each(?))",
+                (json.dumps(local_ids),))
+            for drive_id, local_id in self.indexer.cursor.fetchall():
+                targets.setdefault(drive_id, []).append(local_id)
+        return targets
+
+    def hydrate(self, file_items):
+        """Devolve {id do item: {'thumbnailLink', 'webContentLink'}} e grava os links no banco."""
+        self.indexer.ensure_conn()
+        targets = self._drive_ids(
+            [item for item in file_items if needs_hydration(item, self.indexer)])
+        if not targets:
+            return {}
+        metadata = self.drive_service.get_files_metadata(list(targets))
+        links = {}
+        rows = []
+        for drive_id, file_metadata in metadata.items():
+            item_links = {'thumbnailLink': file_metadata.get('thumbnailLink'),
+                          'webContentLink': file_metadata.get('webViewLink')}
+            for file_id in dict.fromkeys([drive_id] + targets[drive_id]):
+                links[file_id] = item_links
+                rows.append((file_id, item_links['thumbnailLink'],
+                             item_links['webContentLink']))
+        self.indexer.update_links(rows)
+        logging.info(
+            f"💧 Metadados hidratados para {len(metadata)}/{len(targets)} arquivos do Drive")
+        return links
+
+
+class MetadataHydrationWorker(QThread):
+    hydrated = pyqtSignal(dict)
+
+    def __init__(self, service, db_name, file_items):
+        super().__init__()
+        self.service = service
+        self.db_name = db_name
+        self.file_items = file_items
+
+    def run(self):
+        indexer = None
+        try:
+            indexer = FileIndexer.open_writer(self.db_name)
+            drive_service = DriveService(build_thread_service(self.service))
+            links = DriveMetadataHydrator(
+                indexer, drive_service).hydrate(self.file_items)
+            if links:
+                self.hydrated.emit(links)
+        except Exception as e:
+            logging.warning(f"⚠️ Falha ao hidratar metadados do Drive: {e}")
+        finally:
+            if indexer is not None:
+                indexer.close()
@@ -6,42 +6,15 @@ entre o sistema local e o Google Drive no VoxImago.MB. Fornece utilitários para
 arquivos duplicados, verificar similaridade, e auxiliar nos processos de sincronização e fusão.
 """
 
-from src.database.search import SearchEngine
+from src.services.hashing import HashService
+from src.utils.normalization import normalize_aggressive, normalize_name_only, normalize_text
 import os
 import string
-import unicodedata
 
 DRIVE_SHORTCUT_EXTENSIONS = [
     '.gdoc', '.gsheet', '.gslides', '.gdraw', '.gform']
 
 
-def normalize_aggressive(name):
-    if not name:
-        return ''
-
-    name_wo_ext, ext = os.path.splitext(name)
-    base_name = name_wo_ext
-
-    name_norm = unicodedata.normalize('NFD', base_name)
-    name_no_accents = ''.join(
-        c for c in name_norm if unicodedata.category(c) != 'Mn')
-    table = str.maketrans('', '', string.punctuation + string.whitespace)
-    return name_no_accents.translate(table).lower()
-
-
-def normalize_name_only(name):
-    if not name:
-        return ''
-
-    name_base = os.path.splitext(name)[0]
-
-    name_norm = unicodedata.normalize('NFD', name_base)
-    name_clean = ''.join(
-        c for c in name_norm if unicodedata.category(c) != 'Mn')
-    table = str.maketrans('', '', string.punctuation + string.whitespace)
-    return name_clean.translate(table).lower()
-
-
 def find_local_matches(drive_file, local_files_cursor):
     import logging
     import time
@@ -58,11 +31,10 @@ def find_local_matches(drive_file, local_files_cursor):
 
     start_time = time.perf_counter()
 
-    logging.info(
+    logging.debug(
         f"🔍 [OTIMIZADO] Matching para: '{drive_name}' (ID: {drive_id[:8]}..., {drive_size} bytes)")
 
-    search_engine = SearchEngine(None)
-    drive_name_normalized = search_engine.normalize_text(drive_name)
+    drive_name_normalized = normalize_text(drive_name)
     drive_name_aggressive = normalize_aggressive(drive_name)
 
     phase_start = time.perf_counter()
@@ -76,7 +48,7 @@ def find_local_matches(drive_file, local_files_cursor):
     if exact_match:
         total_time = (time.perf_counter() - start_time) * 1000
         matches.append(exact_match[0])
-        logging.info(
+        logging.debug(
             f"✅ [FASE 1] Match EXATO: '{exact_match[1]}' (ID: {exact_match[0][:8]}...) | {phase_time:.2f}ms | Total: {total_time:.2f}ms")
         return matches
     else:
@@ -95,7 +67,7 @@ def find_local_matches(drive_file, local_files_cursor):
         if normalized_match:
             total_time = (time.perf_counter() - start_time) * 1000
             matches.append(normalized_match[0])
-            logging.info(
+            logging.debug(
                 f"✅ [FASE 2] Match NORMALIZADO: '{normalized_match[1]}' (ID: {normalized_match[0][:8]}...) | '{drive_name}' → '{drive_name_normalized}' | {phase_time:.2f}ms | Total: {total_time:.2f}ms")
             return matches
         else:
@@ -114,7 +86,7 @@ def find_local_matches(drive_file, local_files_cursor):
         if aggressive_match:
             total_time = (time.perf_counter() - start_time) * 1000
             matches.append(aggressive_match[0])
-            logging.info(
+            logging.debug(
                 f"✅ [FASE 3] Match AGRESSIVO: '{aggressive_match[1]}' (ID: {aggressive_match[0][:8]}...) | '{drive_name}' → '{drive_name_aggressive}' | {phase_time:.2f}ms | Total: {total_time:.2f}ms")
             return matches
         else:
@@ -135,7 +107,7 @@ def find_local_matches(drive_file, local_files_cursor):
             if name_only_match:
                 total_time = (time.perf_counter() - start_time) * 1000
                 matches.append(name_only_match[0])
-                logging.info(
+                logging.debug(
                     f"✅ [FASE 4] Match NOME-ONLY: '{name_only_match[1]}' (ID: {name_only_match[0][:8]}...) | '{drive_name}' → '{drive_name_only}' | {phase_time:.2f}ms | Total: {total_time:.2f}ms")
                 return matches
             else:
@@ -144,7 +116,7 @@ def find_local_matches(drive_file, local_files_cursor):
 
     if not matches:
         total_time = (time.perf_counter() - start_time) * 1000
-        logging.warning(
+        logging.debug(
             f"❌ [SEM MATCH] '{drive_name}' (ID: {drive_id[:8]}..., {drive_size} bytes) | Tempo total: {total_time:.2f}ms")
 
         if logging.getLogger().isEnabledFor(logging.DEBUG):
@@ -157,3 +129,325 @@ def find_local_matches(drive_file, local_files_cursor):
                 logging.debug(f"Exemplos locais: {', '.join(exemplos)}")
 
     return matches
+
+
+MATCH_PHASES = (
+    ('exact', "files f", "f.name = match_keys.name COLLATE NOCASE"),
+    ('normalized', "files f", "f.name_normalized = match_keys.name_normalized"),
+    ('aggressive', "files f", "f.name_aggressive = match_keys.name_aggressive"),
+    ('prefix', "files f INDEXED BY idx_files_name_aggressive",
+     "f.name_aggressive >= match_keys.prefix_low AND f.name_aggressive < match_keys.prefix_high"),
+)
+MAX_RANKED_CANDIDATES = 50
+
+
+def _prefix_upper_bound(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def rank_local_candidates(drive_item, candidates, hash_service=None):
+    """Escolhe entre candidatos (file_id, size, path) com o mesmo nome: tamanho igual, depois MD5."""
+    drive_size = drive_item.get('size') or 0
+    same_size = [c for c in candidates if drive_size and c[1] == drive_size]
+    if len(same_size) == 1:
+        return same_size[0][0]
+    drive_md5 = drive_item.get('md5Checksum')
+    if drive_md5 and len(same_size) > 1 and hash_service is not None:
+        hashes = hash_service.hash_files([path for _, _, path in same_size])
+        for file_id, _, path in same_size:
+            if hashes.get(path) == drive_md5:
+                return file_id
+    return (same_size or candidates)[0][0]
+
+
+def find_local_matches_bulk(drive_items, local_files_cursor, hash_service=None):
+    import logging
+    import time
+
+    start_time = time.perf_counter()
+    key_rows = []
+    items_by_id = {}
+    for drive_item in drive_items:
+        drive_name = drive_item.get('name', '')
+        drive_id = drive_item.get('id', '')
+        if not drive_name or not drive_id:
+            continue
+        name_only = normalize_name_only(drive_name)
+        items_by_id[drive_id] = drive_item
+        key_rows.append((
+            drive_id,
+            drive_name,
+            normalize_text(drive_name) or None,
+            normalize_aggressive(drive_name) or None,
+            name_only or None,
+            _prefix_upper_bound(name_only) if name_only else None,
+            drive_item.get('size') or 0,
+        ))
+
+    if not key_rows:
+        return {}
+
+    local_files_cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS match_keys (
+            drive_id TEXT PRIMARY KEY,
+            name TEXT,
+            name_normalized TEXT,
+            name_aggressive TEXT,
+            prefix_low TEXT,
+            prefix_high TEXT,
+            size INTEGER,
+            local_id TEXT,
+            phase TEXT
+        )
+    ''')
+    local_files_cursor.execute("DELETE FROM temp.match_keys")
+    local_files_cursor.executemany(
+        "INSERT OR IGNORE INTO temp.match_keys (drive_id, name, name_normalized, name_aggressive, prefix_low, prefix_high, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        key_rows)
+
+    for phase, files_source, condition in MATCH_PHASES:
+        local_files_cursor.execute(
+            f"UPDATE temp.match_keys SET local_id = (SELECT f.file_id FROM {files_source} WHERE {condition} AND f.source = 'local' LIMIT 1) WHERE local_id IS NULL")
+        local_files_cursor.execute(
+            "UPDATE temp.match_keys SET phase = ? WHERE local_id IS NOT NULL AND phase IS NULL",
+            (phase,))
+
+    local_files_cursor.execute(
+        "SELECT drive_id, local_id, phase FROM temp.match_keys WHERE local_id IS NOT NULL")
+    matches = {drive_id: (local_id, phase)
+               for drive_id, local_id, phase in local_files_cursor.fetchall()}
+
+    candidates = {}
+    for phase, files_source, condition in MATCH_PHASES:
+        local_files_cursor.execute(f'''
+            SELECT drive_id, file_id, size, path FROM (
+                SELECT match_keys.drive_id, f.file_id, f.size, f.path,
+                       ROW_NUMBER() OVER (PARTITION BY match_keys.drive_id) AS rn
+                FROM temp.match_keys JOIN {files_source} ON {condition} AND f.source = 'local'
+                WHERE match_keys.phase = ? AND match_keys.size > 0
+            ) WHERE rn <= ?
+        ''', (phase, MAX_RANKED_CANDIDATES))
+        for drive_id, file_id, size, path in local_files_cursor.fetchall():
+            candidates.setdefault(drive_id, []).append((file_id, size, path))
+    local_files_cursor.execute("DELETE FROM temp.match_keys")
+
+    disambiguated = 0
+    owns_hash_service = hash_service is None
+    if owns_hash_service:
+        hash_service = HashService(local_files_cursor.connection)
+    try:
+        for drive_id, drive_candidates in candidates.items():
+            if len(drive_candidates) < 2:
+                continue
+            local_id, phase = matches[drive_id]
+            drive_candidates.sort(key=lambda c: c[0] != local_id)
+            best_id = rank_local_candidates(
+                items_by_id[drive_id], drive_candidates, hash_service)
+            if best_id != local_id:
+                matches[drive_id] = (best_id, phase)
+                disambiguated += 1
+    finally:
+        if owns_hash_service:
+            hash_service.shutdown()
+
+    phase_counts = {}
+    for _, phase in matches.values():
+        phase_counts[phase] = phase_counts.get(phase, 0) + 1
+    total_time = (time.perf_counter() - start_time) * 1000
+    logging.debug(
+        f"🔍 [BULK] {len(matches)}/{len(key_rows)} arquivos do Drive com match local {phase_counts}, {disambiguated} desambiguados | {total_time:.2f}ms")
+    return matches
+
+
+ASCII_LOWER_TABLE = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+PARALLEL_MATCH_MIN_ITEMS = 5000
+PARALLEL_MATCH_CHUNK_SIZE = 2000
+
+
+def compute_match_keys(names):
+    return [
+        (
+            name.translate(ASCII_LOWER_TABLE),
+            normalize_text(name),
+            normalize_aggressive(name),
+            normalize_name_only(name),
+        ) if name else None
+        for name in names
+    ]
+
+
+class MatchKeyPool:
+    """Normaliza nomes do Drive em processos paralelos; as buscas e escritas ficam no processo principal."""
+
+    def __init__(self, max_workers=None, min_items=PARALLEL_MATCH_MIN_ITEMS, chunk_size=PARALLEL_MATCH_CHUNK_SIZE):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_items = min_items
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    def compute(self, names):
+        if self.max_workers <= 1 or len(names) < self.min_items:
+            return compute_match_keys(names)
+        import logging
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunks = [names[i:i + self.chunk_size]
+                  for i in range(0, len(names), self.chunk_size)]
+        try:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers)
+            keys = []
+            for chunk_keys in self._executor.map(compute_match_keys, chunks):
+                keys.extend(chunk_keys)
+            return keys
+        except Exception as e:
+            logging.warning(
+                f"⚠️ Normalização paralela indisponível, usando processo único: {e}")
+            self.shutdown()
+            self.max_workers = 1
+            return compute_match_keys(names)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+class LocalMatchIndex:
+    """Índice em memória dos arquivos locais para a fusão com o Drive, sem SQL por item."""
+
+    def __init__(self, max_entries=1000000, batch_size=5000):
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.by_name = {}
+        self.by_normalized = {}
+        self.by_aggressive = {}
+        self.prefix_keys = []
+        self.prefix_ids = []
+        self.size = 0
+
+    @staticmethod
+    def _add(mapping, key, file_id):
+        existing = mapping.get(key)
+        if existing is None:
+            mapping[key] = file_id
+        elif isinstance(existing, list):
+            if len(existing) < MAX_RANKED_CANDIDATES:
+                existing.append(file_id)
+        else:
+            mapping[key] = [existing, file_id]
+
+    @classmethod
+    def build(cls, local_files_cursor, max_entries=1000000, batch_size=5000):
+        import logging
+        import time
+
+        start_time = time.perf_counter()
+        index = cls(max_entries, batch_size)
+        local_files_cursor.execute(
+            "SELECT file_id, name, name_normalized, name_aggressive FROM files WHERE source='local'")
+        prefix_pairs = []
+        while True:
+            rows = local_files_cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            index.size += len(rows)
+            if index.size > max_entries:
+                logging.warning(
+                    f"⚠️ Mais de {max_entries:,} arquivos locais, índice de matching em memória desativado")
+                return None
+            for file_id, name, name_normalized, name_aggressive in rows:
+                if name:
+                    cls._add(index.by_name, name.translate(
+                        ASCII_LOWER_TABLE), file_id)
+                if name_normalized:
+                    cls._add(index.by_normalized, name_normalized, file_id)
+                if name_aggressive:
+                    cls._add(index.by_aggressive, name_aggressive, file_id)
+                    prefix_pairs.append((name_aggressive, file_id))
+
+        prefix_pairs.sort()
+        index.prefix_keys = [key for key, _ in prefix_pairs]
+        index.prefix_ids = [file_id for _, file_id in prefix_pairs]
+        logging.info(
+            f"🧠 Índice de matching em memória: {index.size:,} arquivos locais em {(time.perf_counter() - start_time) * 1000:.1f}ms")
+        return index
+
+    def _match_prefix(self, prefix):
+        from bisect import bisect_left
+
+        pos = bisect_left(self.prefix_keys, prefix)
+        matched = []
+        while (pos < len(self.prefix_keys) and len(matched) < MAX_RANKED_CANDIDATES
+               and self.prefix_keys[pos].startswith(prefix)):
+            matched.append(self.prefix_ids[pos])
+            pos += 1
+        return matched
+
+    def match_keys(self, keys):
+        if not keys:
+            return None
+        exact_key, name_normalized, name_aggressive, name_only = keys
+        lookups = (
+            ('exact', self.by_name, exact_key),
+            ('normalized', self.by_normalized, name_normalized),
+            ('aggressive', self.by_aggressive, name_aggressive),
+        )
+        for phase, mapping, key in lookups:
+            found = key and mapping.get(key)
+            if found:
+                return (found if isinstance(found, list) else [found]), phase
+        found = name_only and self._match_prefix(name_only)
+        if found:
+            return found, 'prefix'
+        return None
+
+    def match(self, drive_name):
+        return self.match_keys(compute_match_keys([drive_name])[0])
+
+    def match_many(self, drive_items, local_files_cursor=None, key_pool=None, hash_service=None):
+        matches = {}
+        ambiguous = {}
+        names = [drive_item.get('name', '') for drive_item in drive_items]
+        all_keys = key_pool.compute(
+            names) if key_pool else compute_match_keys(names)
+        for drive_item, keys in zip(drive_items, all_keys):
+            drive_id = drive_item.get('id', '')
+            if not drive_id:
+                continue
+            match = self.match_keys(keys)
+            if not match:
+                continue
+            candidate_ids, phase = match
+            matches[drive_id] = (candidate_ids[0], phase)
+            if len(candidate_ids) > 1 and drive_item.get('size'):
+                ambiguous[drive_id] = (drive_item, candidate_ids)
+
+        if ambiguous and local_files_cursor is not None:
+            needed = list({file_id for _, ids in ambiguous.values()
+                          for file_id in ids})
+            details = {}
+            for i in range(0, len(needed), 500):
+                batch = needed[i:i + 500]
+                placeholders = ','.join('?' for _ in batch)
+                local_files_cursor.execute(
+                    f"SELECT file_id, size, path FROM files WHERE file_id IN ({placeholders})", batch)
+                for file_id, size, path in local_files_cursor.fetchall():
+                    details[file_id] = (file_id, size, path)
+            owns_hash_service = hash_service is None
+            if owns_hash_service:
+                hash_service = HashService(local_files_cursor.connection)
+            try:
+                for drive_id, (drive_item, candidate_ids) in ambiguous.items():
+                    candidates = [details[file_id]
+                                  for file_id in candidate_ids if file_id in details]
+                    if candidates:
+                        matches[drive_id] = (rank_local_candidates(
+                            drive_item, candidates, hash_service), matches[drive_id][1])
+            finally:
+                if owns_hash_service:
+                    hash_service.shutdown()
+        return matches
@@ -0,0 +1,172 @@
+"""
+Módulo pipeline
+
+Este módulo encadeia as etapas da sincronização do Drive no VoxImago.MB em threads
+ligadas por filas limitadas: a fonte (busca das páginas na API) e as etapas
+intermediárias (conversão e matching) rodam em paralelo, e a última etapa (gravação
+no banco) é consumida por quem itera o pipeline. Assim rede, CPU e disco se sobrepõem
+em vez de se alternar. Cada etapa registra lotes, itens, tempo ocupado e tempo de espera.
+"""
+
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+PIPELINE_QUEUE_SIZE = 4
+_END = object()
+
+
+class StageMetrics:
+
+    def __init__(self, name):
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self.busy_ms = 0.0
+        self.wait_ms = 0.0
+
+    def record(self, items, busy_ms):
+        self.batches += 1
+        self.items += items
+        self.busy_ms += busy_ms
+
+    def summary(self):
+        return (f"{self.name}: {self.batches} lotes, {self.items:,} itens, "
+                f"ocupado {self.busy_ms / 1000:.1f}s, esperando {self.wait_ms / 1000:.1f}s")
+
+
+def _batch_len(batch):
+    try:
+        return len(batch)
+    except TypeError:
+        return 1
+
+
+class StagedPipeline:
+
+    def __init__(self, source, stages, source_name='fetch', queue_size=PIPELINE_QUEUE_SIZE, on_stop=None):
+        self.source = source
+        self.on_stop = on_stop
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics = [StageMetrics(source_name)] + \
+            [StageMetrics(name) for name, _ in stages]
+        self.stop_event = threading.Event()
+        self.error = None
+        self._threads = []
+
+    def _put(self, target, item):
+        while not self.stop_event.is_set():
+            try:
+                target.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, source):
+        while not self.stop_event.is_set():
+            try:
+                return source.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(self, stage_name, error):
+        logging.error(f"❌ Erro na etapa '{stage_name}' do pipeline: {error}")
+        if self.error is None:
+            self.error = error
+        self.stop_event.set()
+
+    def _run_source(self, output, metrics):
+        iterator = iter(self.source)
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                try:
+                    batch = next(iterator)
+                except StopIteration:
+                    break
+                metrics.record(_batch_len(batch),
+                               (time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                if not self._put(output, batch):
+                    break
+                metrics.wait_ms += (time.perf_counter() - start) * 1000
+        except Exception as e:
+            self._fail(metrics.name, e)
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+            self._put(output, _END)
+
+    def _run_stage(self, func, source, output, metrics):
+        try:
+            while True:
+                start = time.perf_counter()
+                batch = self._get(source)
+                metrics.wait_ms += (time.perf_counter() - start) * 1000
+                if batch is _END:
+                    break
+                start = time.perf_counter()
+                result = func(batch)
+                metrics.record(_batch_len(batch),
+                               (time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                if not self._put(output, result):
+                    break
+                metrics.wait_ms += (time.perf_counter() - start) * 1000
+        except Exception as e:
+            self._fail(metrics.name, e)
+        finally:
+            self._put(output, _END)
+
+    def stage(self, name):
+        metrics = StageMetrics(name)
+        self.metrics.append(metrics)
+        return metrics
+
+    @contextmanager
+    def timed(self, metrics, items):
+        start = time.perf_counter()
+        yield
+        metrics.record(items, (time.perf_counter() - start) * 1000)
+
+    def __iter__(self):
+        queues = [queue.Queue(maxsize=self.queue_size)
+                  for _ in range(len(self.stages) + 1)]
+        self._threads = [threading.Thread(
+            target=self._run_source, args=(queues[0], self.metrics[0]),
+            name=f"pipeline-{self.metrics[0].name}", daemon=True)]
+        for index, (name, func) in enumerate(self.stages):
+            self._threads.append(threading.Thread(
+                target=self._run_stage,
+                args=(func, queues[index], queues[index + 1],
+                      self.metrics[index + 1]),
+                name=f"pipeline-{name}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(queues[-1])
+                if item is _END:
+                    break
+                yield item
+        finally:
+            self.stop_event.set()
+            if self.on_stop:
+                self.on_stop()
+            for thread in self._threads:
+                thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        self.stop_event.set()
+
+    def summary(self):
+        return " | ".join(metrics.summary() for metrics in self.metrics)
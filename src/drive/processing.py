@@ -9,6 +9,7 @@ de arquivos durante operações de sincronização, upload, download e fusão.
 import logging
 from .drive_sync import DriveSync
 from .drive_dialog import DriveFolderDialog
+from .drive_service import DEFAULT_FIELD_PROFILE
 from PyQt6.QtCore import QThread, QTimer
 from PyQt6.QtWidgets import QProgressDialog, QMessageBox
 
@@ -54,7 +55,9 @@ def start_drive_folder_processing(parent, service, indexer, force_dialog=False):
             logging.info(f"📁 Usando configurações salvas: {selected_folders}")
     thread = QThread()
     worker = DriveSync(service, db_name=indexer.db_name,
-                       selected_folders=selected_folders)
+                       selected_folders=selected_folders,
+                       full_resync=load_settings().get('drive_full_resync', False),
+                       fields_profile=load_settings().get('drive_fields_profile', DEFAULT_FIELD_PROFILE))
     worker.moveToThread(thread)
     progress = QProgressDialog(
         "Sincronizando arquivos...", "Cancelar", 0, 100, parent)
@@ -0,0 +1,215 @@
+"""
+Módulo request_executor
+
+Este módulo centraliza a execução das requisições à API do Google Drive no VoxImago.MB.
+Todas as chamadas passam por um token bucket compartilhado entre threads, ajustado à
+cota do Drive: a taxa cai pela metade quando a API responde com limite excedido e volta
+a subir aos poucos a cada sucesso. Erros transitórios (429, 403 de cota, 5xx, falhas de
+rede) são repetidos com backoff exponencial com jitter completo, respeitando Retry-After.
+Cada endpoint acumula chamadas, erros, repetições e latência.
+"""
+
+import json
+import logging
+import random
+import socket
+import threading
+import time
+
+DRIVE_QUOTA_PER_MINUTE = 12000
+QUOTA_SAFETY_FACTOR = 0.8
+MIN_REQUESTS_PER_SECOND = 1.0
+MAX_RETRIES = 6
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 64.0
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+RETRYABLE_REASONS = RATE_LIMIT_REASONS | {'backendError', 'internalError'}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def _error_reasons(error):
+    details = getattr(error, 'error_details', None)
+    if not isinstance(details, list):
+        try:
+            details = json.loads(getattr(error, 'content', b'').decode(
+                'utf-8'))['error'].get('errors', [])
+        except (ValueError, KeyError, TypeError, AttributeError):
+            details = []
+    return {detail.get('reason') for detail in details if isinstance(detail, dict)}
+
+
+def classify_error(error):
+    """Devolve (repetível, limite_de_taxa, retry_after em segundos ou None)."""
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    if status is None:
+        retryable = isinstance(
+            error, (ConnectionError, TimeoutError, socket.timeout))
+        return retryable, False, None
+
+    retry_after = None
+    try:
+        retry_after = float(resp.get('retry-after'))
+    except (TypeError, ValueError, AttributeError):
+        pass
+    reasons = _error_reasons(error)
+    rate_limited = status == 429 or (
+        status == 403 and bool(reasons & RATE_LIMIT_REASONS))
+    retryable = status in RETRYABLE_STATUS or rate_limited or (
+        status == 403 and bool(reasons & RETRYABLE_REASONS))
+    return retryable, rate_limited, retry_after
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens +
+                          (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, tokens=1):
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def throttle(self):
+        with self.lock:
+            self._refill()
+            self.rate = max(MIN_REQUESTS_PER_SECOND, self.rate / 2)
+            self.tokens = min(self.tokens, 0)
+            return self.rate
+
+    def recover(self):
+        if self.rate >= self.max_rate:
+            return
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 100)
+
+
+class EndpointMetrics:
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, elapsed_ms, failed=False):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        if failed:
+            self.errors += 1
+
+    def summary(self):
+        average = self.total_ms / self.calls if self.calls else 0.0
+        return (f"{self.name}: {self.calls} chamadas, {self.errors} erros, {self.retries} repetições, "
+                f"{self.rate_limited} limitadas, média {average:.0f}ms, máx {self.max_ms:.0f}ms")
+
+
+class DriveRequestExecutor:
+
+    def __init__(self, requests_per_second=None, max_retries=MAX_RETRIES, base_backoff=BASE_BACKOFF,
+                 max_backoff=MAX_BACKOFF, clock=time.monotonic, sleep=time.sleep):
+        if requests_per_second is None:
+            requests_per_second = DRIVE_QUOTA_PER_MINUTE * QUOTA_SAFETY_FACTOR / 60
+        self.bucket = TokenBucket(
+            requests_per_second, clock=clock, sleep=sleep)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    def endpoint(self, name):
+        with self._metrics_lock:
+            metrics = self.metrics.get(name)
+            if metrics is None:
+                metrics = self.metrics[name] = EndpointMetrics(name)
+            return metrics
+
+    def backoff_delay(self, attempt, retry_after=None):
+        delay = random.uniform(
+            0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+        return max(delay, retry_after or 0)
+
+    def report_failure(self, error, metrics):
+        """Registra um erro e devolve (repetível, espera sugerida) sem dormir."""
+        retryable, rate_limited, retry_after = classify_error(error)
+        if rate_limited:
+            with self._metrics_lock:
+                metrics.rate_limited += 1
+            rate = self.bucket.throttle()
+            logging.warning(
+                f"🐢 Limite de taxa do Drive em {metrics.name}: reduzindo para {rate:.1f} req/s")
+        return retryable, retry_after
+
+    def execute(self, request, endpoint, tokens=1):
+        """Executa request.execute() com limite de taxa e repetição dos erros transitórios."""
+        return self.call(request.execute, endpoint, tokens)
+
+    def call(self, func, endpoint, tokens=1):
+        metrics = self.endpoint(endpoint)
+        attempt = 0
+        while True:
+            self.bucket.acquire(tokens)
+            start = self.clock()
+            try:
+                response = func()
+            except Exception as e:
+                with self._metrics_lock:
+                    metrics.record((self.clock() - start) * 1000, failed=True)
+                retryable, retry_after = self.report_failure(e, metrics)
+                if not retryable or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt, retry_after)
+                attempt += 1
+                with self._metrics_lock:
+                    metrics.retries += 1
+                logging.warning(
+                    f"🔁 {endpoint}: tentativa {attempt}/{self.max_retries} em {delay:.1f}s ({e})")
+                self.sleep(delay)
+                continue
+            with self._metrics_lock:
+                metrics.record((self.clock() - start) * 1000)
+            self.bucket.recover()
+            return response
+
+    def summary(self):
+        with self._metrics_lock:
+            return " | ".join(metrics.summary() for metrics in self.metrics.values())
+
+
+_default_executor = None
+_default_lock = threading.Lock()
+
+
+def get_default_executor():
+    """Executor compartilhado: a cota do Drive é por usuário, não por thread."""
+    global _default_executor
+    with _default_lock:
+        if _default_executor is None:
+            _default_executor = DriveRequestExecutor()
+        return _default_executor
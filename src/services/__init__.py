@@ -6,3 +6,6 @@
 # Módulos deste pacote:
 # - workers.py: Workers e tarefas assíncronas (download, scan, sync).
 # - profiling.py: Ferramentas de profiling de memória e CPU.
+# - hashing.py: Hash de conteúdo (MD5 completo e amostrado) com cache persistente em file_hashes.
+# - perceptual_hash.py: Hashes perceptuais (aHash/dHash/pHash) das miniaturas e busca de imagens semelhantes.
+# - duplicates.py: Busca em streaming de duplicatas locais (tamanho → hash amostrado → MD5) e do Drive.
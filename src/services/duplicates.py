@@ -0,0 +1,134 @@
+"""
+Módulo duplicates do VoxImago.MB
+
+Responsável por:
+- Encontrar arquivos locais duplicados em etapas: tamanho (SQL), hash amostrado e MD5 completo
+- Encontrar duplicatas do Drive agrupando o md5Checksum já gravado no banco
+- Entregar os grupos em streaming, com memória limitada ao lote de hashing em andamento
+"""
+
+import logging
+import time
+from itertools import groupby
+
+from src.services.hashing import SAMPLE_SIZE, HashService
+
+HASH_BATCH_FILES = 2000
+
+
+class DuplicateFinder:
+
+    def __init__(self, indexer, disk_concurrency=2, fetch_size=5000):
+        self.indexer = indexer
+        self.indexer.ensure_conn()
+        self.hash_service = HashService(indexer.conn, disk_concurrency)
+        self.fetch_size = fetch_size
+        self.stats = {}
+
+    def _stream_rows(self, query, params=()):
+        cursor = self.indexer.conn.cursor()
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(self.fetch_size)
+            if not rows:
+                break
+            yield from rows
+
+    def _local_size_groups(self, min_size):
+        rows = self._stream_rows('''
+            SELECT size, file_id, path FROM files
+            WHERE source = 'local' AND mimeType != 'folder' AND size IN (
+                SELECT size FROM files
+                WHERE source = 'local' AND mimeType != 'folder' AND size >= ?
+                GROUP BY size HAVING COUNT(*) > 1
+            )
+            ORDER BY size DESC
+        ''', (min_size,))
+        for size, group in groupby(rows, key=lambda row: row[0]):
+            yield size, [(file_id, path) for _, file_id, path in group]
+
+    @staticmethod
+    def _split_by_hash(group, hashes):
+        buckets = {}
+        for file_id, path in group:
+            value = hashes.get(path)
+            if value:
+                buckets.setdefault(value, []).append((file_id, path))
+        return [bucket for bucket in buckets.values() if len(bucket) > 1]
+
+    def _resolve_batch(self, size_groups):
+        sample_hashes = self.hash_service.hash_files(
+            [path for _, group in size_groups for _, path in group], 'sample')
+        self.stats['sample_hashed'] += len(sample_hashes)
+
+        confirmed = []
+        needs_full = []
+        for size, group in size_groups:
+            for bucket in self._split_by_hash(group, sample_hashes):
+                # Até 2 * SAMPLE_SIZE o hash amostrado já cobre o arquivo inteiro.
+                if size <= 2 * SAMPLE_SIZE:
+                    confirmed.append((size, bucket))
+                else:
+                    needs_full.append((size, bucket))
+
+        if needs_full:
+            full_hashes = self.hash_service.hash_files(
+                [path for _, bucket in needs_full for _, path in bucket], 'full')
+            self.stats['full_hashed'] += len(full_hashes)
+            for size, bucket in needs_full:
+                confirmed.extend((size, match)
+                                 for match in self._split_by_hash(bucket, full_hashes))
+        self.indexer.conn.commit()
+        return confirmed
+
+    def iter_local_duplicates(self, min_size=1):
+        """Gera (tamanho, [(file_id, path), ...]) para cada grupo de arquivos locais idênticos."""
+        start_time = time.perf_counter()
+        self.stats = {'size_groups': 0, 'candidates': 0, 'sample_hashed': 0,
+                      'full_hashed': 0, 'duplicate_groups': 0, 'wasted_bytes': 0}
+        pending = []
+        pending_files = 0
+        try:
+            for size, group in self._local_size_groups(min_size):
+                self.stats['size_groups'] += 1
+                self.stats['candidates'] += len(group)
+                pending.append((size, group))
+                pending_files += len(group)
+                if pending_files < HASH_BATCH_FILES:
+                    continue
+                for size_bucket in self._resolve_batch(pending):
+                    self._count_group(*size_bucket)
+                    yield size_bucket
+                pending = []
+                pending_files = 0
+            if pending:
+                for size_bucket in self._resolve_batch(pending):
+                    self._count_group(*size_bucket)
+                    yield size_bucket
+        finally:
+            self.hash_service.shutdown()
+        logging.info(
+            f"🧮 Duplicatas locais: {self.stats['duplicate_groups']:,} grupos entre {self.stats['candidates']:,} candidatos "
+            f"({self.stats['sample_hashed']:,} hashes amostrados, {self.stats['full_hashed']:,} completos) "
+            f"em {time.perf_counter() - start_time:.1f}s")
+
+    def _count_group(self, size, group):
+        self.stats['duplicate_groups'] += 1
+        self.stats['wasted_bytes'] += size * (len(group) - 1)
+
+    def iter_drive_duplicates(self):
+        """Gera (md5Checksum, [(file_id, path), ...]) para arquivos do Drive com o mesmo conteúdo."""
+        self.stats = {'duplicate_groups': 0, 'wasted_bytes': 0}
+        rows = self._stream_rows('''
+            SELECT md5Checksum, file_id, path, size FROM files
+            WHERE source = 'drive' AND md5Checksum IN (
+                SELECT md5Checksum FROM files
+                WHERE source = 'drive' AND md5Checksum IS NOT NULL
+                GROUP BY md5Checksum HAVING COUNT(*) > 1
+            )
+            ORDER BY md5Checksum
+        ''')
+        for md5, group in groupby(rows, key=lambda row: row[0]):
+            group = list(group)
+            self._count_group(group[0][3] or 0, group)
+            yield md5, [(file_id, path) for _, file_id, path, _ in group]
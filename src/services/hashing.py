@@ -0,0 +1,186 @@
+"""
+Módulo hashing do VoxImago.MB
+
+Responsável por:
+- Calcular o MD5 completo de arquivos locais com leitura via mmap ou buffers grandes
+- Calcular um hash amostrado (início + fim + tamanho) para filtrar candidatos rapidamente
+- Persistir os hashes na tabela file_hashes, recalculando só quando tamanho ou mtime mudam
+- Distribuir o trabalho em um pool de processos limitado pela concorrência do disco
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+MMAP_CHUNK_SIZE = 64 * 1024 * 1024
+SAMPLE_SIZE = 1024 * 1024
+INLINE_HASH_LIMIT = 2
+
+
+def md5_file(path):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                for offset in range(0, len(mapped), MMAP_CHUNK_SIZE):
+                    md5.update(view[offset:offset + MMAP_CHUNK_SIZE])
+                view.release()
+                return md5.hexdigest()
+        except (ValueError, OSError):
+            f.seek(0)
+        buffer = bytearray(READ_BUFFER_SIZE)
+        view = memoryview(buffer)
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            md5.update(view[:read])
+    return md5.hexdigest()
+
+
+def sample_hash_file(path, size=None, sample_size=SAMPLE_SIZE):
+    if size is None:
+        size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(size).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(sample_size))
+        if size > sample_size:
+            f.seek(max(sample_size, size - sample_size))
+            digest.update(f.read(sample_size))
+    return digest.hexdigest()
+
+
+def _hash_worker(args):
+    path, mode = args
+    try:
+        stat = os.stat(path)
+        if mode == 'sample':
+            return path, stat.st_size, stat.st_mtime, None, sample_hash_file(path, stat.st_size)
+        return path, stat.st_size, stat.st_mtime, md5_file(path), None
+    except OSError:
+        return path, None, None, None, None
+
+
+class HashService:
+
+    def __init__(self, conn, disk_concurrency=2, persist=True):
+        self.conn = conn
+        self.disk_concurrency = max(1, disk_concurrency)
+        # Com persist=False (conexão só de leitura) as linhas ficam pendentes para outra conexão gravar.
+        self.persist = persist
+        self.pending_rows = []
+        self._pool = None
+
+    def _load_cached(self, paths):
+        cached = {}
+        cursor = self.conn.cursor()
+        for i in range(0, len(paths), 500):
+            batch = paths[i:i + 500]
+            placeholders = ','.join('?' for _ in batch)
+            cursor.execute(
+                f"SELECT path, size, mtime, md5, sample_hash FROM file_hashes WHERE path IN ({placeholders})", batch)
+            for path, size, mtime, md5, sample_hash in cursor.fetchall():
+                cached[path] = (size, mtime, md5, sample_hash)
+        return cached
+
+    def _store(self, results):
+        now = int(time.time())
+        rows = []
+        for path, size, mtime, md5, sample_hash in results:
+            if size is None:
+                continue
+            rows.append((path, size, mtime, md5, sample_hash, now))
+        if not self.persist:
+            self.pending_rows.extend(rows)
+            return
+        self.save_rows(rows)
+
+    def pop_pending(self):
+        rows, self.pending_rows = self.pending_rows, []
+        return rows
+
+    def save_rows(self, rows):
+        if not rows:
+            return
+        self.conn.executemany('''
+            INSERT INTO file_hashes (path, size, mtime, md5, sample_hash, hashed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET
+                md5 = CASE WHEN file_hashes.size = excluded.size AND file_hashes.mtime = excluded.mtime
+                           THEN COALESCE(excluded.md5, file_hashes.md5) ELSE excluded.md5 END,
+                sample_hash = CASE WHEN file_hashes.size = excluded.size AND file_hashes.mtime = excluded.mtime
+                           THEN COALESCE(excluded.sample_hash, file_hashes.sample_hash) ELSE excluded.sample_hash END,
+                size = excluded.size,
+                mtime = excluded.mtime,
+                hashed_at = excluded.hashed_at
+        ''', rows)
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.disk_concurrency)
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def hash_files(self, paths, mode='full'):
+        """Retorna {path: hash} usando o cache; mode='full' para MD5 e 'sample' para início+fim+tamanho.
+
+        Os hashes novos são gravados sem commit: a transação pertence a quem chamou.
+        """
+        paths = list(dict.fromkeys(p for p in paths if p))
+        if not paths:
+            return {}
+        column = 2 if mode == 'full' else 3
+        cached = self._load_cached(paths)
+        hashes = {}
+        missing = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entry = cached.get(path)
+            if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime and entry[column]:
+                hashes[path] = entry[column]
+            else:
+                missing.append(path)
+
+        if not missing:
+            return hashes
+
+        start_time = time.perf_counter()
+        jobs = [(path, mode) for path in missing]
+        if len(jobs) <= INLINE_HASH_LIMIT or self.disk_concurrency == 1:
+            results = [_hash_worker(job) for job in jobs]
+        else:
+            try:
+                results = list(self._get_pool().map(_hash_worker, jobs))
+            except Exception as e:
+                self.shutdown()
+                logging.warning(
+                    f"⚠️ Pool de processos indisponível para hashing, calculando em série: {e}")
+                results = [_hash_worker(job) for job in jobs]
+
+        self._store(results)
+        for path, size, _, md5, sample_hash in results:
+            value = md5 if mode == 'full' else sample_hash
+            if value:
+                hashes[path] = value
+        logging.info(
+            f"#️⃣ {len(results)} hashes ({mode}) calculados em {(time.perf_counter() - start_time) * 1000:.1f}ms")
+        return hashes
+
+    def md5(self, path):
+        return self.hash_files([path], 'full').get(path)
+
+    def sample_hash(self, path):
+        return self.hash_files([path], 'sample').get(path)
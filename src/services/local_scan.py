@@ -1,5 +1,6 @@
 import sys
 import time
+import hashlib
 import os
 import logging
 from datetime import datetime, timezone
@@ -191,6 +192,7 @@ class LocalScan(QObject):
             count, min_name, max_name = self.indexer.cursor.fetchone()
             logging.info(
                 f"✅ Scan local concluído: {count} arquivos locais. Min: {min_name}, Max: {max_name}")
+            self._update_local_generation()
         except Exception as e:
             logging.error(f"Erro ao contar arquivos locais: {e}")
         end_time = time.time()
@@ -210,6 +212,33 @@ class LocalScan(QObject):
 
         self.finished.emit()
 
+    def _local_files_signature(self):
+        """Soma dos hashes de cada linha (id, nome, tamanho, mtime): renomear ou trocar um arquivo muda o valor."""
+        cursor = self.indexer.conn.cursor()
+        cursor.execute(
+            "SELECT file_id, name, size, modifiedTime FROM files WHERE source='local'")
+        count = 0
+        total = 0
+        while True:
+            rows = cursor.fetchmany(5000)
+            if not rows:
+                break
+            for row in rows:
+                digest = hashlib.blake2b(
+                    '\x00'.join(str(value) for value in row).encode('utf-8'), digest_size=8).digest()
+                total = (total + int.from_bytes(digest, 'little')) & 0xFFFFFFFFFFFFFFFF
+            count += len(rows)
+        return f"{count}|{total:016x}"
+
+    def _update_local_generation(self):
+        signature = self._local_files_signature()
+        if signature != self.indexer.get_state('local_scan_signature'):
+            self.indexer.set_state(
+                'local_scan_signature', signature, commit=False)
+            generation = self.indexer.bump_local_generation()
+            logging.info(
+                f"🔁 Arquivos locais alterados, geração do scan: {generation}")
+
     def _flush_batch(self, items_batch):
         if not items_batch:
             return
@@ -0,0 +1,288 @@
+"""
+Módulo perceptual_hash do VoxImago.MB
+
+Responsável por:
+- Calcular aHash, dHash e pHash (64 bits) a partir da miniatura de 256px das imagens
+- Reaproveitar os decodificadores do ThumbnailManager (QImage, rawpy, pillow-heif)
+- Persistir os hashes na tabela image_hashes, invalidando quando path/mtime/size mudam
+- Responder consultas por distância de Hamming com multi-index hashing (4 blocos de 16 bits)
+  e agrupar quase-duplicatas em clusters
+"""
+
+import logging
+import os
+import time
+from itertools import combinations, islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HASH_BITS = 64
+CHUNK_BITS = 16
+CHUNK_COUNT = HASH_BITS // CHUNK_BITS
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+# Limite de elementos por bloco de comparação: baldes grandes (fotos escuras, em branco) não explodem a memória.
+PAIR_BLOCK_ELEMENTS = 1 << 20
+HASH_KINDS = ('ahash', 'dhash', 'phash')
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp', '.heic', '.heif',
+                    '.raw', '.cr2', '.nef', '.arw', '.dng', '.orf', '.rw2', '.pef', '.srw', '.raf'}
+
+
+def _to_signed(value):
+    return value - (1 << HASH_BITS) if value >= (1 << (HASH_BITS - 1)) else value
+
+
+def _to_unsigned(value):
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bool(bit))
+    return value
+
+
+def hamming_distance(a, b):
+    return (a ^ b).bit_count()
+
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)],
+                           dtype=np.uint8) if np is not None else None
+
+
+def _popcount64(values):
+    return _POPCOUNT_TABLE[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1)
+
+
+def compute_image_hashes(image):
+    """Recebe uma imagem PIL e devolve {'ahash', 'dhash', 'phash'} como inteiros de 64 bits."""
+    from PIL import Image
+
+    gray = image.convert('L')
+    small = list(gray.resize((8, 8), Image.LANCZOS).getdata())
+    mean = sum(small) / len(small)
+    ahash = _bits_to_int(pixel > mean for pixel in small)
+
+    wide = list(gray.resize((9, 8), Image.LANCZOS).getdata())
+    dhash = _bits_to_int(
+        wide[row * 9 + col] > wide[row * 9 + col + 1] for row in range(8) for col in range(8))
+
+    phash = None
+    if np is not None:
+        pixels = np.asarray(gray.resize(
+            (32, 32), Image.LANCZOS), dtype=np.float64)
+        n = np.arange(32)
+        dct_matrix = np.cos(np.pi * (2 * n[None, :] + 1) * n[:, None] / 64)
+        low_freq = (dct_matrix @ pixels @ dct_matrix.T)[:8, :8]
+        phash = _bits_to_int((low_freq > np.median(low_freq)).flatten())
+    return {'ahash': ahash, 'dhash': dhash, 'phash': phash}
+
+
+def hash_thumbnail(file_item):
+    from PIL import Image
+    from src.ui.thumbnails import ThumbnailManager
+
+    thumbnail_path = ThumbnailManager.generate_local_thumbnail(file_item)
+    if not thumbnail_path:
+        return None
+    with Image.open(thumbnail_path) as image:
+        return compute_image_hashes(image)
+
+
+class PerceptualHashIndex:
+    """Multi-index hashing: um hash a até r bits de distância coincide em algum bloco a até r // 4 bits."""
+
+    def __init__(self, file_ids, hashes):
+        self.file_ids = list(file_ids)
+        self.hashes = list(hashes)
+        self.tables = [{} for _ in range(CHUNK_COUNT)]
+        for position, value in enumerate(self.hashes):
+            for chunk, table in enumerate(self.tables):
+                table.setdefault(
+                    (value >> (chunk * CHUNK_BITS)) & CHUNK_MASK, []).append(position)
+
+    @classmethod
+    def from_db(cls, cursor, hash_kind='phash', source='local'):
+        if hash_kind not in HASH_KINDS:
+            raise ValueError(f"Tipo de hash inválido: {hash_kind}")
+        cursor.execute(f'''
+            SELECT h.file_id, h.{hash_kind} FROM image_hashes h
+            JOIN files f ON f.file_id = h.file_id
+            WHERE h.{hash_kind} IS NOT NULL AND (? IS NULL OR f.source = ?)
+        ''', (source, source))
+        rows = cursor.fetchall()
+        return cls((row[0] for row in rows), (_to_unsigned(row[1]) for row in rows))
+
+    @staticmethod
+    def _chunk_neighbors(value, radius):
+        yield value
+        for distance in range(1, radius + 1):
+            for bits in combinations(range(CHUNK_BITS), distance):
+                flipped = value
+                for bit in bits:
+                    flipped ^= 1 << bit
+                yield flipped
+
+    def query(self, value, max_distance=10):
+        chunk_radius = max_distance // CHUNK_COUNT
+        seen = set()
+        results = []
+        for chunk, table in enumerate(self.tables):
+            chunk_value = (value >> (chunk * CHUNK_BITS)) & CHUNK_MASK
+            for probe in self._chunk_neighbors(chunk_value, chunk_radius):
+                for position in table.get(probe, ()):
+                    if position in seen:
+                        continue
+                    seen.add(position)
+                    distance = hamming_distance(value, self.hashes[position])
+                    if distance <= max_distance:
+                        results.append((self.file_ids[position], distance))
+        results.sort(key=lambda item: item[1])
+        return results
+
+    def _candidate_pairs(self, max_distance):
+        if max_distance >= CHUNK_COUNT:
+            for position, value in enumerate(self.hashes):
+                for file_id, _ in self.query(value, max_distance):
+                    yield position, file_id
+            return
+        # Com distância < 4, pares próximos sempre coincidem em um bloco inteiro.
+        hashes = np.array(self.hashes, dtype=np.uint64) if np is not None else None
+        for table in self.tables:
+            for positions in table.values():
+                if len(positions) < 2:
+                    continue
+                if hashes is not None:
+                    yield from self._bucket_pairs(hashes, np.array(positions), max_distance)
+                else:
+                    for a, b in combinations(positions, 2):
+                        if hamming_distance(self.hashes[a], self.hashes[b]) <= max_distance:
+                            yield a, self.file_ids[b]
+
+    def _bucket_pairs(self, hashes, idx, max_distance):
+        """Compara o balde em blocos de linhas contra as seguintes, com memória limitada."""
+        bucket = hashes[idx]
+        size = len(idx)
+        block = max(1, PAIR_BLOCK_ELEMENTS // size)
+        for start in range(0, size - 1, block):
+            stop = min(start + block, size - 1)
+            rows = bucket[start:stop]
+            cols = bucket[start + 1:]
+            close = _popcount64(rows[:, None] ^ cols[None, :]) <= max_distance
+            # A coluna c é o elemento start + 1 + c: só vale acima da diagonal (c >= linha).
+            close &= np.arange(len(cols))[None, :] >= np.arange(len(rows))[:, None]
+            for row, col in zip(*np.nonzero(close)):
+                yield int(idx[start + row]), self.file_ids[int(idx[start + 1 + col])]
+
+    def clusters(self, max_distance=3, min_size=2):
+        start_time = time.perf_counter()
+        position_of = {file_id: position for position,
+                       file_id in enumerate(self.file_ids)}
+        parent = list(range(len(self.file_ids)))
+
+        def find(position):
+            while parent[position] != position:
+                parent[position] = parent[parent[position]]
+                position = parent[position]
+            return position
+
+        for position, other_id in self._candidate_pairs(max_distance):
+            root_a, root_b = find(position), find(position_of[other_id])
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+        groups = {}
+        for position, file_id in enumerate(self.file_ids):
+            groups.setdefault(find(position), []).append(file_id)
+        result = [group for group in groups.values() if len(group) >= min_size]
+        logging.info(
+            f"🖼️ {len(result)} grupos de imagens semelhantes entre {len(self.file_ids):,} em {(time.perf_counter() - start_time) * 1000:.0f}ms")
+        return result
+
+
+class PerceptualHashService:
+
+    def __init__(self, indexer):
+        self.indexer = indexer
+
+    @staticmethod
+    def _file_key(file_item):
+        return f"{file_item.get('path', '')}|{file_item.get('modifiedTime', '')}|{file_item.get('size', '')}"
+
+    def local_image_items(self, batch_size=5000):
+        self.indexer.ensure_conn()
+        cursor = self.indexer.conn.cursor()
+        cursor.execute(
+            "SELECT file_id, name, path, size, modifiedTime FROM files WHERE source = 'local' AND mimeType != 'folder'")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for file_id, name, path, size, modified in rows:
+                if os.path.splitext(name or '')[1].lower() in IMAGE_EXTENSIONS:
+                    yield {'id': file_id, 'name': name, 'path': path, 'size': size,
+                           'modifiedTime': modified, 'source': 'local'}
+
+    def update_hashes(self, file_items, batch_size=200):
+        """Calcula e grava os hashes que faltam ou mudaram; devolve quantos foram calculados."""
+        self.indexer.ensure_conn()
+        cursor = self.indexer.conn.cursor()
+        iterator = iter(file_items)
+        computed = 0
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            placeholders = ','.join('?' for _ in batch)
+            cursor.execute(
+                f"SELECT file_id, file_key FROM image_hashes WHERE file_id IN ({placeholders})",
+                [item['id'] for item in batch])
+            known = dict(cursor.fetchall())
+            pending = []
+            for item in batch:
+                file_key = self._file_key(item)
+                if known.get(item['id']) == file_key:
+                    continue
+                try:
+                    hashes = hash_thumbnail(item)
+                except Exception as e:
+                    logging.warning(
+                        f"⚠️ Falha ao calcular hash perceptual de {item.get('path')}: {e}")
+                    continue
+                if not hashes:
+                    continue
+                pending.append((
+                    item['id'], file_key,
+                    _to_signed(hashes['ahash']), _to_signed(hashes['dhash']),
+                    _to_signed(hashes['phash']) if hashes['phash'] is not None else None,
+                    int(time.time())))
+            if pending:
+                cursor.executemany(
+                    "INSERT OR REPLACE INTO image_hashes (file_id, file_key, ahash, dhash, phash, hashed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    pending)
+                self.indexer.conn.commit()
+                computed += len(pending)
+        return computed
+
+    def find_similar(self, file_id, max_distance=10, hash_kind='phash', index=None):
+        if hash_kind not in HASH_KINDS:
+            raise ValueError(f"Tipo de hash inválido: {hash_kind}")
+        self.indexer.ensure_conn()
+        self.indexer.cursor.execute(
+            f"SELECT {hash_kind} FROM image_hashes WHERE file_id = ?", (file_id,))
+        row = self.indexer.cursor.fetchone()
+        if not row or row[0] is None:
+            return []
+        index = index or PerceptualHashIndex.from_db(
+            self.indexer.cursor, hash_kind, None)
+        return [(other_id, distance) for other_id, distance in index.query(_to_unsigned(row[0]), max_distance)
+                if other_id != file_id]
+
+    def duplicate_clusters(self, max_distance=3, hash_kind='phash', source='local'):
+        self.indexer.ensure_conn()
+        index = PerceptualHashIndex.from_db(
+            self.indexer.cursor, hash_kind, source)
+        return index.clusters(max_distance)
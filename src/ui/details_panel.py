@@ -3,6 +3,7 @@
 import os
 import sys
 import subprocess
+import time
 import webbrowser
 from datetime import datetime
 from PyQt6.QtWidgets import (
@@ -12,6 +13,7 @@ from PyQt6.QtGui import QPixmap, QFont
 from PyQt6.QtCore import Qt
 from src.utils.utils import format_size
 from src.ui.thumbnails import ThumbnailCache, ThumbnailManager
+from src.drive.hydration import MetadataHydrationWorker, needs_hydration, THUMBNAIL_LINK_MAX_AGE
 
 
 class FileDetailsPanel(QFrame):
@@ -90,6 +92,8 @@ class FileDetailsPanel(QFrame):
         self.current_file_item = None
         self.parent_app = parent
         self.temp_download_widget = None
+        self.hydration_workers = set()
+        self.hydration_attempted = {}
 
         self.hide()
 
@@ -142,6 +146,7 @@ class FileDetailsPanel(QFrame):
             self.open_drive_button.setVisible(True)
         else:
             self.open_drive_button.setVisible(False)
+        self._request_hydration(file_item)
 
         self.thumbnail_label.setPixmap(ThumbnailManager.get_generic_thumbnail(
             file_item.get('mimeType'), size=(400, 400)))
@@ -194,6 +199,39 @@ class FileDetailsPanel(QFrame):
         else:
             self.open_folder_button.setVisible(False)
 
+    def _request_hydration(self, file_item):
+        service = getattr(self.parent_app, 'service', None)
+        indexer = getattr(self.parent_app, 'indexer', None)
+        if not service or not indexer:
+            return
+        attempted_at = self.hydration_attempted.get(file_item.get('id'))
+        if attempted_at is not None and time.monotonic() - attempted_at < THUMBNAIL_LINK_MAX_AGE:
+            return
+        try:
+            if not needs_hydration(file_item, indexer):
+                return
+        except Exception:
+            return
+        self.hydration_attempted[file_item.get('id')] = time.monotonic()
+        worker = MetadataHydrationWorker(
+            service, indexer.db_name, [dict(file_item)])
+        worker.hydrated.connect(self.on_metadata_hydrated)
+        worker.finished.connect(
+            lambda: self.hydration_workers.discard(worker))
+        self.hydration_workers.add(worker)
+        worker.start()
+
+    def on_metadata_hydrated(self, links):
+        if not self.current_file_item:
+            return
+        item_links = links.get(self.current_file_item.get('id'))
+        if not item_links:
+            return
+        self.current_file_item.update(
+            {key: value for key, value in item_links.items() if value})
+        if self.current_file_item.get('source') == 'local' and self.current_file_item.get('webContentLink'):
+            self.open_drive_button.setVisible(True)
+
     def open_folder(self):
         file_path = self.current_file_item.get('path')
         if not file_path or not os.path.exists(file_path):
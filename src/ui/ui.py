@@ -817,12 +817,6 @@ class DriveFileGalleryApp(QMainWindow):
             suggestions = self.search_engine.get_search_suggestions(
                 text, self.is_authenticated)
 
-            normalized_text = self.search_engine.normalize_text(text)
-            if normalized_text != text.lower():
-                normalized_suggestions = self.search_engine.get_search_suggestions(
-                    normalized_text, self.is_authenticated)
-                suggestions = list(set(suggestions + normalized_suggestions))
-
             self.completer_model.setStringList(suggestions[:10])
         except Exception as e:
             QMessageBox.critical(
@@ -1432,8 +1426,8 @@ class DriveFileGalleryApp(QMainWindow):
                 print(f"   {source}: {count:,} arquivos")
 
             self.indexer.cursor.execute('''
-                SELECT name, normalized_name FROM search_index 
-                WHERE name != normalized_name 
+                SELECT name, name_normalized FROM files
+                WHERE LOWER(name) != name_normalized
                 LIMIT 5
             ''')
             accent_samples = self.indexer.cursor.fetchall()
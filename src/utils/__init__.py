@@ -5,4 +5,5 @@
 
 # Módulos deste pacote:
 # - utils.py: Funções gerais de utilidade (configuração, formatação, busca de arquivos, helpers diversos).
+# - normalization.py: Normalização de nomes e termos (acentos, chaves de busca e de matching) com memoização.
 # - .py: Função para gerar avatar padrão (imagem circular simples) para perfis sem foto.
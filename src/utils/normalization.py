@@ -0,0 +1,96 @@
+# normalization.py - Normalização de nomes e termos do Vox Imago
+#
+# Responsável por:
+# - Remover acentos (NFD sem marcas combinantes) com tabelas pré-computadas na importação
+# - Gerar as chaves usadas na busca (normalize_text) e no matching (normalize_aggressive)
+# - Memoizar nomes repetidos e oferecer API em lote (normalize_many)
+#
+# Caminhos, do mais rápido ao mais lento: texto ASCII não passa por unicodedata; texto
+# com letras latinas acentuadas vira NFD e descarta as marcas via encode('ascii');
+# o resto remove as marcas (categoria Mn) com uma expressão regular. Todos geram o
+# mesmo resultado do antigo loop por caractere com unicodedata.category.
+
+import os
+import re
+import string
+import unicodedata
+from functools import lru_cache
+
+NORMALIZATION_CACHE_SIZE = 131072
+_AGGRESSIVE_DELETED = string.punctuation + string.whitespace
+_AGGRESSIVE_TABLE = str.maketrans('', '', _AGGRESSIVE_DELETED)
+
+
+def _is_mark(char):
+    return unicodedata.category(char) == 'Mn'
+
+
+def _build_latin_safe_chars():
+    candidates = list(range(0x250)) + list(range(0x1E00, 0x1F00))
+    return frozenset(
+        chr(cp) for cp in candidates
+        if all(ord(c) < 128 or _is_mark(c) for c in unicodedata.normalize('NFD', chr(cp))))
+
+
+def _build_marks_pattern():
+    ranges = []
+    start = prev = None
+    for cp in range(0x300, 0x10000):
+        if not _is_mark(chr(cp)):
+            continue
+        if prev is not None and cp == prev + 1:
+            prev = cp
+            continue
+        if start is not None:
+            ranges.append((start, prev))
+        start = prev = cp
+    ranges.append((start, prev))
+    char_class = ''.join(
+        re.escape(chr(a)) if a == b else f"{re.escape(chr(a))}-{re.escape(chr(b))}" for a, b in ranges)
+    return re.compile(f"[{char_class}]+")
+
+
+_LATIN_SAFE_CHARS = _build_latin_safe_chars()
+_MARKS_PATTERN = _build_marks_pattern()
+_BMP_LIMIT = '￿'
+
+
+def strip_marks(text):
+    """NFD sem marcas combinantes; texto já em ASCII é devolvido como está."""
+    if text.isascii():
+        return text
+    if _LATIN_SAFE_CHARS.issuperset(text):
+        return unicodedata.normalize('NFD', text).encode('ascii', 'ignore').decode('ascii')
+    if max(text) > _BMP_LIMIT:
+        return ''.join(c for c in unicodedata.normalize('NFD', text) if not _is_mark(c))
+    return _MARKS_PATTERN.sub('', unicodedata.normalize('NFD', text))
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def normalize_text(text):
+    """Minúsculas, sem espaços nas pontas e sem acentos (chave da busca e de name_normalized)."""
+    if not text:
+        return ""
+    return strip_marks(text.lower().strip())
+
+
+@lru_cache(maxsize=NORMALIZATION_CACHE_SIZE)
+def normalize_aggressive(name):
+    """Nome sem extensão, acentos, pontuação e espaços, em minúsculas (chave de matching)."""
+    if not name:
+        return ''
+    base_name = strip_marks(os.path.splitext(name)[0])
+    return base_name.translate(_AGGRESSIVE_TABLE).lower()
+
+normalize_name_only = normalize_aggressive
+
+_NORMALIZERS = {
+    'text': normalize_text,
+    'aggressive': normalize_aggressive,
+    'name_only': normalize_name_only,
+}
+
+
+def normalize_many(names, kind='text'):
+    normalizer = _NORMALIZERS[kind]
+    return [normalizer(name) for name in names]